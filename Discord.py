@@ -3,12 +3,45 @@ from discord import app_commands, Interaction
 from discord.ext import commands, tasks
 import json
 import os
+import sys
 import random
 import asyncio
-from typing import Optional, List, Dict
+import functools
+import glob
+import hashlib
+import heapq
+import io
+import math
+import mmap
+import multiprocessing
+import sqlite3
+import struct
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from bisect import bisect_left, insort
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import accumulate, islice
+from typing import Callable, Optional, List, Dict
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+import map_image
+import metrics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 load_dotenv()
 
 # ---------------- CONFIG ----------------
@@ -16,6 +49,48 @@ TOKEN = os.getenv("DISCORD_TOKEN")
 GUILD_ID = int(os.getenv("GUILD_ID", "1443109274904563817"))
 LOG_CHANNEL_ID = int(os.getenv("LOG_CHANNEL_ID", "1443188048467853383"))
 DATA_FILE = "nations_data.json"
+# With MULTI_GUILD=1 commands sync globally and every guild gets its own world
+# under WORLDS_DIR; GUILD_ID's world keeps using the top-level data files
+MULTI_GUILD = os.getenv("MULTI_GUILD", "0") == "1"
+WORLDS_DIR = os.getenv("WORLDS_DIR", "worlds")
+WORLD_IDLE_SECONDS = int(os.getenv("WORLD_IDLE_SECONDS", "3600"))  # idle worlds are saved and unloaded
+# "guild_id:channel_id,..." log channels for other guilds' worlds
+GUILD_LOG_CHANNELS = {
+    int(guild): int(channel)
+    for guild, channel in (pair.split(":") for pair in os.getenv("GUILD_LOG_CHANNELS", "").split(",") if pair)
+}
+GUILD_LOG_CHANNELS.setdefault(GUILD_ID, LOG_CHANNEL_ID)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")  # "json" or "sqlite"
+SQLITE_FILE = os.getenv("SQLITE_FILE", "nations_data.db")
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "json")  # "json", "binary" or "indexed", json backend only
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "zlib")  # "none", "zlib" or "zstd"
+BINARY_DATA_FILE = os.getenv("BINARY_DATA_FILE", "nations_data.pax")
+INDEXED_DATA_FILE = os.getenv("INDEXED_DATA_FILE", "nations_data.paxi")
+SNAPSHOT_FILE = {"binary": BINARY_DATA_FILE, "indexed": INDEXED_DATA_FILE}.get(SNAPSHOT_FORMAT, DATA_FILE)
+# Indexed snapshots keep at most this many nations' history, infrastructure and
+# units in memory once they are saved; the rest are read from disk on first use
+HYDRATION_CACHE_SIZE = int(os.getenv("HYDRATION_CACHE_SIZE", "1000"))
+HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", "100"))  # 0 keeps every entry in memory
+HISTORY_ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", "history_archive")
+HISTORY_SEGMENT_SIZE = 100
+HISTORY_PAGE_SIZE = 15
+MAP_IMAGE_WORKERS = int(os.getenv("MAP_IMAGE_WORKERS", "1"))
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "0") == "1"  # json backend only
+JOURNAL_COMPACT_SECONDS = int(os.getenv("JOURNAL_COMPACT_SECONDS", "300"))
+ECONOMY_ENGINE = os.getenv("ECONOMY_ENGINE", "dict")  # "dict", "numpy" or "lazy"
+INCOME_CACHE_DEBUG = os.getenv("INCOME_CACHE_DEBUG", "0") == "1"
+# Hash of the last synced command tree; startup skips the sync while it matches
+COMMAND_FINGERPRINT_FILE = os.getenv("COMMAND_FINGERPRINT_FILE", "command_tree.json")
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "0") == "1"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the Prometheus exporter
+TICK_SECONDS = 1.0
+TICK_MAX_CATCHUP = int(os.getenv("TICK_MAX_CATCHUP", "300"))  # ticks replayed after a loaded world stalls, the rest is dropped
+SAVE_INTERVAL_SECONDS = 30.0
+UPKEEP_SECONDS = 300.0  # passive_growth_loop period
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "3"))
+LOG_QUEUE_LIMIT = int(os.getenv("LOG_QUEUE_LIMIT", "500"))
+LOG_MESSAGES_PER_FLUSH = int(os.getenv("LOG_MESSAGES_PER_FLUSH", "3"))
 # ---------------------------------------
 
 intents = discord.Intents.default()
@@ -56,6 +131,16 @@ ALL_UNITS = {**GROUND_UNITS, **NAVAL_UNITS, **AIR_UNITS}
 # Add Nuclear Missile
 ALL_UNITS["Nuclear Missile"] = {"cost": 5000, "power": 10000, "upkeep": 200, "manpower": 50, "type": "strategic"}
 
+# Per-nation military totals kept by the bot's ledger; military_power is derived
+# from these so it cannot drift from the unit roster
+MILITARY_DOMAINS = ("ground", "naval", "air", "strategic")
+# Every nation starts with this much power before any units
+BASE_MILITARY_POWER = 50
+MILITARY_TACTICS_BONUS = 1.2
+ADVANCED_LOGISTICS_DISCOUNT = 0.8
+BATTLE_GROUND_DOMAINS = ("ground", "strategic")
+SIMULATION_MAX_RUNS = 100000
+
 # ---------------- WORLD MAP ----------------
 MAP_WIDTH = 50
 MAP_HEIGHT = 30
@@ -64,6 +149,8 @@ TERRAIN_OCEAN = "🌊"
 TERRAIN_LAND = "🟩"
 TERRAIN_MOUNTAIN = "🏔️"
 TERRAIN_DESERT = "🏜️"
+NATION_SYMBOLS = "🔴🔵🟢🟡🟣🟠🟤⚫⚪"
+TERRAIN_CODES = {TERRAIN_OCEAN: 0, TERRAIN_LAND: 1, TERRAIN_MOUNTAIN: 2, TERRAIN_DESERT: 3}
 
 WORLD_REGIONS = {
     "Northern Highlands": {
@@ -259,6 +346,27 @@ BUILDINGS = {
     },
 }
 
+# ---------------- ECONOMY ----------------
+RESOURCE_CAPS = {
+    "resources": 999999,
+    "manpower": 999999,
+    "research_points": 99999,
+    "political_points": 99999,
+    "population": 9999999,
+}
+RESOURCE_KEYS = list(RESOURCE_CAPS)
+
+# ---------------- LEADERBOARDS ----------------
+LEADERBOARD_CATEGORIES = {
+    "power": ("military_power", "⚔️ Military Power"),
+    "population": ("population", "👥 Population"),
+    "resources": ("resources", "💰 Resources"),
+    "territories": ("territories", "🗺️ Territories"),
+}
+# Each re-ranked nation shifts the sorted list, so past this share of dirty
+# nations one full sort is cheaper (about 5% at 100k nations)
+LEADERBOARD_REBUILD_FRACTION = 0.05
+
 # ---------------- RANDOM EVENTS ----------------
 RANDOM_EVENTS = [
     {"name": "Golden Age", "effect": "resources", "value": 100, "chance": 0.05},
@@ -269,55 +377,2029 @@ RANDOM_EVENTS = [
     {"name": "Scientific Breakthrough", "effect": "research_points", "value": 20, "chance": 0.04},
 ]
 
+# Each event window rolls the events in order and stops at the first hit, so a
+# nation sees some event with probability EVENT_ANY_CHANCE per window and the
+# gap between events is geometric. Which event fired follows EVENT_CUM_WEIGHTS.
+EVENT_CUM_WEIGHTS = list(accumulate(
+    event["chance"] * math.prod(1 - earlier["chance"] for earlier in RANDOM_EVENTS[:idx])
+    for idx, event in enumerate(RANDOM_EVENTS)
+))
+EVENT_ANY_CHANCE = EVENT_CUM_WEIGHTS[-1]
+
+
+def sample_event_gap(rng: random.Random = random) -> int:
+    # Windows until the next event, >= 1
+    if EVENT_ANY_CHANCE >= 1:
+        return 1
+    return 1 + int(math.log(1.0 - rng.random()) / math.log(1.0 - EVENT_ANY_CHANCE))
+
+
+def sample_event(rng: random.Random = random) -> dict:
+    return rng.choices(RANDOM_EVENTS, cum_weights=EVENT_CUM_WEIGHTS)[0]
+
+
+# ---------------- PERSISTENCE ----------------
+def copy_json(value):
+    if isinstance(value, dict):
+        return {k: copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_json(v) for v in value]
+    return value
+
+
+def read_data_file(path: str) -> dict:
+    with open(path, "rb") as f:
+        raw = f.read()
+    if raw.startswith(SNAPSHOT_MAGIC):
+        return decode_snapshot(raw)
+    if raw.startswith(INDEXED_MAGIC):
+        return decode_indexed(raw)
+    return json.loads(raw)
+
+
+def fsync_directory(path: str) -> None:
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def write_data_file(path: str, data: dict, binary: bool = SNAPSHOT_FORMAT == "binary") -> None:
+    # Write to a temp file and rename over the original so a crash mid-write
+    # never leaves a truncated data file behind.
+    tmp_path = f"{path}.tmp"
+    if binary:
+        with open(tmp_path, "wb") as f:
+            f.write(encode_snapshot(data))
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(path)
+
+
+def convert_snapshot(src: str, dst: str) -> None:
+    data = read_data_file(src)
+    if dst.endswith(".paxi"):
+        write_indexed_file(dst, data)
+    else:
+        write_data_file(dst, data, binary=not dst.endswith(".json"))
+    print(f"Converted {len(data.get('nations', {}))} nations: "
+          f"{src} ({os.path.getsize(src):,} bytes) -> {dst} ({os.path.getsize(dst):,} bytes)")
+
+
+# ---------------- HISTORY ARCHIVE ----------------
+# History beyond HISTORY_LIMIT moves to <dir>/<uid>/<segment>.jsonl, one JSON
+# string per line and HISTORY_SEGMENT_SIZE lines per segment. A nation's
+# "history_archived" counts the entries archived so far, so the in-memory list
+# continues at that global index.
+def history_segment_path(directory: str, uid: str, segment: int) -> str:
+    return os.path.join(directory, uid, f"{segment:06d}.jsonl")
+
+
+def read_history_archive(directory: str, uid: str, start: int, end: int) -> List[str]:
+    lines = []
+    if end <= start:
+        return lines
+    for segment in range(start // HISTORY_SEGMENT_SIZE, (end - 1) // HISTORY_SEGMENT_SIZE + 1):
+        segment_start = segment * HISTORY_SEGMENT_SIZE
+        try:
+            with open(history_segment_path(directory, uid, segment), "r", encoding="utf-8") as f:
+                segment_lines = [json.loads(line) for line in f]
+        except FileNotFoundError:
+            segment_lines = []
+        lines.extend(segment_lines[max(start - segment_start, 0):end - segment_start])
+    return lines
+
+
+def write_history_archive(directory: str, archive: Dict[str, list]) -> None:
+    # archive maps uid -> [first global index, entries]. Segments are rewritten
+    # from that index on, so lines left by an interrupted earlier write are dropped.
+    for uid, (start, entries) in archive.items():
+        os.makedirs(os.path.join(directory, uid), exist_ok=True)
+        pos = 0
+        while pos < len(entries):
+            index = start + pos
+            segment = index // HISTORY_SEGMENT_SIZE
+            segment_start = segment * HISTORY_SEGMENT_SIZE
+            take = min(len(entries) - pos, segment_start + HISTORY_SEGMENT_SIZE - index)
+            path = history_segment_path(directory, uid, segment)
+            kept = []
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    kept = [line for _, line in zip(range(index - segment_start), f)]
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(kept)
+                f.writelines(json.dumps(entry) + "\n" for entry in entries[pos:pos + take])
+            os.replace(tmp_path, path)
+            pos += take
+
+
+# ---------------- BINARY SNAPSHOTS ----------------
+# Layout: magic, u16 version, u8 compression, then a (compressed) run of
+# u64-length-prefixed sections: JSON meta, string table lengths, string table
+# blob, and per-field column blocks. Every string (uids, names, unit, building,
+# technology and region names, history lines) is stored once in the table and
+# referenced by index. Fields that are not columnar for every nation are kept as
+# one small JSON document per nation.
+SNAPSHOT_MAGIC = b"PAXS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COMPRESSORS = {"none": 0, "zlib": 1, "zstd": 2}
+SNAPSHOT_STRING_FIELDS = ["name"]
+SNAPSHOT_NUMERIC_FIELDS = [
+    "population", "resources", "manpower", "research_points", "political_points",
+    "military_power", "territory", "last_accrued_at",
+]
+SNAPSHOT_STRING_LIST_FIELDS = ["territories", "technologies", "history"]
+SNAPSHOT_COUNT_FIELDS = ["units", "buildings"]
+# What a damaged payload can raise before the structure checks catch it
+SNAPSHOT_DECODE_ERRORS = (zlib.error, struct.error, StopIteration, IndexError) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+
+def _is_snapshot_number(value) -> bool:
+    if type(value) is int:
+        return -2 ** 53 <= value <= 2 ** 53
+    return type(value) is float
+
+
+def _is_string_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _is_count_dict(value) -> bool:
+    return isinstance(value, dict) and all(type(v) is int and -2 ** 63 <= v < 2 ** 63 for v in value.values())
+
+
+def _pack_array(typecode: str, values) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_array(typecode: str, raw: bytes) -> array:
+    unpacked = array(typecode)
+    unpacked.frombytes(raw)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked
+
+
+def encode_snapshot(data: dict, compression: str = SNAPSHOT_COMPRESSION) -> bytes:
+    nations = data.get("nations", {})
+    records = list(nations.values())
+    table: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        return table.setdefault(text, len(table))
+
+    def columnar(fields: List[str], check) -> List[str]:
+        return [field for field in fields if all(field in r and check(r[field]) for r in records)]
+
+    string_fields = columnar(SNAPSHOT_STRING_FIELDS, lambda v: isinstance(v, str))
+    numeric_fields = columnar(SNAPSHOT_NUMERIC_FIELDS, _is_snapshot_number)
+    list_fields = columnar(SNAPSHOT_STRING_LIST_FIELDS, _is_string_list)
+    count_fields = columnar(SNAPSHOT_COUNT_FIELDS, _is_count_dict)
+    columns = set(string_fields + numeric_fields + list_fields + count_fields)
+
+    blocks = [_pack_array("I", [intern(uid) for uid in nations])]
+    for field in string_fields:
+        blocks.append(_pack_array("I", [intern(r[field]) for r in records]))
+    for field in numeric_fields:
+        values = [r[field] for r in records]
+        blocks.append(_pack_array("d", values))
+        blocks.append(bytes(type(v) is int for v in values))
+    for field in list_fields:
+        lists = [r[field] for r in records]
+        blocks.append(_pack_array("I", map(len, lists)))
+        blocks.append(_pack_array("I", [intern(item) for items in lists for item in items]))
+    for field in count_fields:
+        dicts = [r[field] for r in records]
+        blocks.append(_pack_array("I", map(len, dicts)))
+        blocks.append(_pack_array("I", [intern(key) for counts in dicts for key in counts]))
+        blocks.append(_pack_array("q", [value for counts in dicts for value in counts.values()]))
+    blocks.append(_pack_array("I", [
+        intern(json.dumps({k: v for k, v in r.items() if k not in columns}, separators=(",", ":")))
+        for r in records
+    ]))
+
+    meta = {
+        "nations": len(records),
+        "string_fields": string_fields,
+        "numeric_fields": numeric_fields,
+        "list_fields": list_fields,
+        "count_fields": count_fields,
+        "rest": {k: v for k, v in data.items() if k != "nations"},
+    }
+    strings = list(table)
+    sections = [
+        json.dumps(meta, separators=(",", ":")).encode("utf-8"),
+        _pack_array("I", map(len, strings)),
+        "".join(strings).encode("utf-8", "surrogatepass"),
+        *blocks,
+    ]
+    payload = b"".join(struct.pack("<Q", len(section)) + section for section in sections)
+
+    if compression == "zstd" and zstandard is None:
+        compression = "zlib"
+    if compression == "zstd":
+        payload = zstandard.ZstdCompressor().compress(payload)
+    elif compression == "zlib":
+        payload = zlib.compress(payload, 6)
+    return SNAPSHOT_MAGIC + struct.pack("<HB", SNAPSHOT_VERSION, SNAPSHOT_COMPRESSORS[compression]) + payload
+
+
+def decode_snapshot(raw: bytes) -> dict:
+    # Any damage surfaces as ValueError, like a bad magic or version
+    try:
+        return _decode_snapshot(raw)
+    except SNAPSHOT_DECODE_ERRORS as e:
+        raise ValueError(f"Corrupt binary nation snapshot: {e!r}") from e
+
+
+def _decode_snapshot(raw: bytes) -> dict:
+    if not raw.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("Not a binary nation snapshot")
+    version, compression = struct.unpack_from("<HB", raw, len(SNAPSHOT_MAGIC))
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    payload = raw[len(SNAPSHOT_MAGIC) + 3:]
+    if compression == SNAPSHOT_COMPRESSORS["zstd"]:
+        if zstandard is None:
+            raise ValueError("Snapshot is zstd-compressed but zstandard is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif compression == SNAPSHOT_COMPRESSORS["zlib"]:
+        payload = zlib.decompress(payload)
+
+    def read_sections():
+        pos = 0
+        view = memoryview(payload)
+        while pos < len(payload):
+            (length,) = struct.unpack_from("<Q", payload, pos)
+            pos += 8
+            if pos + length > len(payload):
+                raise ValueError("Truncated binary nation snapshot")
+            yield view[pos:pos + length]
+            pos += length
+
+    sections = read_sections()
+    meta = json.loads(bytes(next(sections)))
+    offsets = list(accumulate(_unpack_array("I", next(sections)), initial=0))
+    text = bytes(next(sections)).decode("utf-8", "surrogatepass")
+    strings = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def read_strings() -> List[str]:
+        return [strings[i] for i in _unpack_array("I", next(sections))]
+
+    uids = read_strings()
+    records = [{} for _ in uids]
+    for field in meta["string_fields"]:
+        for record, value in zip(records, read_strings()):
+            record[field] = value
+    for field in meta["numeric_fields"]:
+        values = _unpack_array("d", next(sections))
+        for record, value, is_int in zip(records, values, bytes(next(sections))):
+            record[field] = int(value) if is_int else value
+    for field in meta["list_fields"]:
+        counts = _unpack_array("I", next(sections))
+        items = read_strings()
+        pos = 0
+        for record, count in zip(records, counts):
+            record[field] = items[pos:pos + count]
+            pos += count
+    for field in meta["count_fields"]:
+        counts = _unpack_array("I", next(sections))
+        keys = read_strings()
+        values = _unpack_array("q", next(sections)).tolist()
+        pos = 0
+        for record, count in zip(records, counts):
+            record[field] = dict(zip(keys[pos:pos + count], values[pos:pos + count]))
+            pos += count
+    for record, extras in zip(records, read_strings()):
+        record.update(json.loads(extras))
+
+    data = {"nations": dict(zip(uids, records))}
+    data.update(meta["rest"])
+    return data
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nations (uid TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS alliances (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS wars (position INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS trade_offers (position INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+# Top-level state values kept in the meta table
+STATE_META_KEYS = ["map_seed"]
+
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SQLITE_SCHEMA)
+    return conn
+
+
+def read_sqlite(path: str) -> dict:
+    conn = open_sqlite(path)
+    try:
+        return {
+            "nations": {uid: json.loads(data) for uid, data in conn.execute("SELECT uid, data FROM nations")},
+            "alliances": {name: json.loads(data) for name, data in conn.execute("SELECT name, data FROM alliances")},
+            "wars": [json.loads(data) for (data,) in conn.execute("SELECT data FROM wars ORDER BY position")],
+            "trade_offers": [
+                json.loads(data) for (data,) in conn.execute("SELECT data FROM trade_offers ORDER BY position")
+            ],
+            **{key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")},
+        }
+    finally:
+        conn.close()
+
+
+def write_sqlite_changes(path: str, changes: dict) -> None:
+    # changes["nations"] holds (uid, json) rows to upsert; the small tables are
+    # replaced wholesale and left as None when they did not change.
+    conn = open_sqlite(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO nations (uid, data) VALUES (?, ?) "
+                "ON CONFLICT(uid) DO UPDATE SET data = excluded.data",
+                changes["nations"]
+            )
+            if changes["alliances"] is not None:
+                conn.execute("DELETE FROM alliances")
+                conn.executemany("INSERT INTO alliances (name, data) VALUES (?, ?)", changes["alliances"])
+            for table in ("wars", "trade_offers"):
+                if changes[table] is not None:
+                    conn.execute(f"DELETE FROM {table}")
+                    conn.executemany(f"INSERT INTO {table} (position, data) VALUES (?, ?)", changes[table])
+            if changes["meta"] is not None:
+                conn.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    changes["meta"]
+                )
+    finally:
+        conn.close()
+
+
+def sqlite_changes_from_state(data: dict, nation_uids=None,
+                              tables=("alliances", "wars", "trade_offers", "meta")) -> dict:
+    nations = data["nations"]
+    uids = nations if nation_uids is None else nation_uids
+    changes = {"nations": [(uid, json.dumps(nations[uid])) for uid in uids if uid in nations]}
+    changes["alliances"] = (
+        [(name, json.dumps(alliance)) for name, alliance in data["alliances"].items()]
+        if "alliances" in tables else None
+    )
+    for table in ("wars", "trade_offers"):
+        changes[table] = list(enumerate(map(json.dumps, data[table]))) if table in tables else None
+    changes["meta"] = (
+        [(key, json.dumps(data[key])) for key in STATE_META_KEYS if data.get(key) is not None]
+        if "meta" in tables else None
+    )
+    return changes
+
+
+def sqlite_table_fingerprints(data: dict) -> Dict[str, str]:
+    # Serialized small tables; a table is rewritten when its text changes
+    return {
+        "alliances": json.dumps(data["alliances"]),
+        "wars": json.dumps(data["wars"]),
+        "trade_offers": json.dumps(data["trade_offers"]),
+        "meta": json.dumps(data.get("map_seed")),
+    }
+
+
+def write_sqlite_snapshot(path: str, snapshot: dict) -> Dict[str, str]:
+    # snapshot["nations"] only holds the nations to upsert; the small tables are
+    # compared with snapshot["fingerprints"] from the last save. Runs in the save
+    # thread and returns the new fingerprints.
+    fingerprints = sqlite_table_fingerprints(snapshot)
+    known = snapshot["fingerprints"]
+    changed_tables = [table for table, text in fingerprints.items() if known.get(table) != text]
+    write_sqlite_changes(path, sqlite_changes_from_state(snapshot, tables=changed_tables))
+    return fingerprints
+
+
+def import_json_to_sqlite(json_path: str, sqlite_path: str) -> int:
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for key, default in (("nations", {}), ("alliances", {}), ("wars", []), ("trade_offers", [])):
+        data.setdefault(key, default)
+    write_sqlite_changes(sqlite_path, sqlite_changes_from_state(data))
+    return len(data["nations"])
+
+
+# ---------------- INDEXED SNAPSHOTS ----------------
+# Layout: magic, u16 version, u64 header length, a JSON header, then one compact
+# JSON document per nation holding its COLD_FIELDS. The header has every
+# nation's other fields, the uid -> (offset, length) index into the documents
+# and the military ledger, so loading never parses history or rosters. The
+# documents are not compressed so they can be sliced straight out of an mmap.
+INDEXED_MAGIC = b"PAXI"
+INDEXED_VERSION = 1
+INDEXED_PREFIX = struct.Struct("<HQ")
+COLD_FIELDS = ("history", "infrastructure", "units")
+
+
+def write_indexed_file(path: str, data: dict) -> tuple:
+    # Nations listed in data["cold_refs"] were never loaded; their documents are
+    # copied byte for byte from data["cold_source"], the (mmap, documents start)
+    # of the previous file. Returns the new file's (documents start, index).
+    data = dict(data)
+    refs = data.pop("cold_refs", {})
+    source, source_start = data.pop("cold_source", (None, 0))
+    nations = data.pop("nations", {})
+    military = data.pop("military", None)
+    if military is None:
+        # Converted from a full state, so every roster is at hand
+        military = {uid: calculate_military_by_type(nation) for uid, nation in nations.items()}
+    hot, index, documents = {}, {}, []
+    offset = 0
+    for uid, nation in nations.items():
+        if uid in refs:
+            start, length = refs[uid]
+            document = source[source_start + start:source_start + start + length]
+        else:
+            cold = {field: nation[field] for field in COLD_FIELDS if field in nation}
+            document = json.dumps(cold, separators=(",", ":")).encode("utf-8")
+        hot[uid] = {key: value for key, value in nation.items() if key not in COLD_FIELDS}
+        index[uid] = (offset, len(document))
+        documents.append(document)
+        offset += len(document)
+    header = json.dumps(
+        {"nations": hot, "index": index, "military": military, "rest": data}, separators=(",", ":")
+    ).encode("utf-8")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(INDEXED_MAGIC + INDEXED_PREFIX.pack(INDEXED_VERSION, len(header)))
+        f.write(header)
+        f.writelines(documents)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(path)
+    return len(INDEXED_MAGIC) + INDEXED_PREFIX.size + len(header), index
+
+
+def read_indexed_header(raw) -> tuple:
+    # raw is bytes or an mmap; returns (header, documents start)
+    if raw[:len(INDEXED_MAGIC)] != INDEXED_MAGIC:
+        raise ValueError("Not an indexed nation snapshot")
+    version, length = INDEXED_PREFIX.unpack_from(raw, len(INDEXED_MAGIC))
+    if version != INDEXED_VERSION:
+        raise ValueError(f"Unsupported indexed snapshot version {version}")
+    start = len(INDEXED_MAGIC) + INDEXED_PREFIX.size
+    return json.loads(raw[start:start + length]), start + length
+
+
+def decode_indexed(raw: bytes) -> dict:
+    # Fully hydrated state, for conversions and other one-off readers
+    header, documents_start = read_indexed_header(raw)
+    nations = header["nations"]
+    for uid, (offset, length) in header["index"].items():
+        nations[uid].update(json.loads(raw[documents_start + offset:documents_start + offset + length]))
+    data = {"nations": nations}
+    data.update(header["rest"])
+    return data
+
+
+def is_indexed_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(INDEXED_MAGIC)) == INDEXED_MAGIC
+
+
+class NationColdStore:
+    # Tracks which nations' cold fields live only in the mmapped snapshot and
+    # which are loaded, least recently used first. A loaded nation can only be
+    # dropped back to disk once a save has written it and nothing has touched it
+    # since that save's snapshot was taken.
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.file = None
+        self.map: Optional[mmap.mmap] = None
+        self.documents_start = 0
+        self.index: Dict[str, tuple] = {}
+        self.cold: set = set()
+        self.loaded: OrderedDict = OrderedDict()
+        self.touched: set = set()
+
+    def load(self, path: str) -> dict:
+        self.close()
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        header, self.documents_start = read_indexed_header(self.map)
+        self.index = {uid: tuple(entry) for uid, entry in header["index"].items()}
+        self.cold = set(self.index)
+        self.loaded.clear()
+        self.touched.clear()
+        data = {"nations": header["nations"], "military": header["military"]}
+        data.update(header["rest"])
+        return data
+
+    def attach(self, path: str, documents_start: int, index: Dict[str, tuple]) -> None:
+        # Switch to a file just written from this store's state
+        self.close()
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.documents_start = documents_start
+        self.index = index
+
+    def fetch(self, uid: str) -> dict:
+        offset, length = self.index[uid]
+        start = self.documents_start + offset
+        return json.loads(self.map[start:start + length])
+
+    def touch(self, uid: str) -> None:
+        self.loaded[uid] = None
+        self.loaded.move_to_end(uid)
+        self.touched.add(uid)
+
+    def begin_save(self, snapshot: dict) -> None:
+        snapshot["cold_refs"] = {uid: self.index[uid] for uid in self.cold}
+        snapshot["cold_source"] = (self.map, self.documents_start)
+        self.touched = set()
+
+    def evictable(self) -> List[str]:
+        excess = len(self.loaded) - self.capacity
+        victims = []
+        for uid in self.loaded:
+            if len(victims) >= excess:
+                break
+            if uid not in self.touched and uid in self.index:
+                victims.append(uid)
+        return victims
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# ---------------- MUTATION JOURNAL ----------------
+# Every mutation appends one JSON line holding the absolute values of the fields it
+# changed, plus "tick" markers (with a step count after catch-up) for economy
+# ticks and a "map_seed" entry for a new world, so replay is deterministic.
+# Segments are named <prefix>.<first seq>; a snapshot records the last seq it
+# contains and the segments it fully covers are deleted once it is on disk.
+JOURNAL_ECONOMY_KEYS = RESOURCE_KEYS + ["last_accrued_at"]
+
+
+class MutationJournal:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.seq = 0
+        self.file = None
+
+    def segments(self) -> List[str]:
+        return sorted(glob.glob(glob.escape(self.prefix) + ".*"))
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in self.segments())
+
+    def read_entries(self, after_seq: int) -> List[dict]:
+        entries = []
+        for path in self.segments():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn line from a crash mid-append
+                    self.seq = max(self.seq, entry["seq"])
+                    if entry["seq"] > after_seq:
+                        entries.append(entry)
+        self.seq = max(self.seq, after_seq)
+        return entries
+
+    def open_segment(self) -> None:
+        if self.file is not None:
+            self.file.close()
+        self.file = open(f"{self.prefix}.{self.seq + 1:012d}", "a", encoding="utf-8")
+
+    def append(self, entry: dict) -> None:
+        if self.file is None:
+            self.open_segment()
+        self.seq += 1
+        entry["seq"] = self.seq
+        self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+    def rotate(self) -> int:
+        self.open_segment()
+        return self.seq
+
+    def drop_through(self, seq: int) -> int:
+        removed = 0
+        current = self.file.name if self.file is not None else None
+        for path in self.segments():
+            if path != current and int(path.rsplit(".", 1)[1]) <= seq:
+                removed += os.path.getsize(path)
+                os.remove(path)
+        return removed
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# ---------------- ECONOMY ENGINE ----------------
+# Resource counters and per-second rates live in arrays, one row per nation.
+# While a nation is attached its row is authoritative; checkout() copies the row
+# back into the nation dict and detaches it so commands can mutate the dict, and
+# the next tick reloads detached rows (values and rates) from their dicts.
+class EconomyEngine:
+    def __init__(self, bot: "PaxHistoriaBot"):
+        self.bot = bot
+        self.caps = np.array([RESOURCE_CAPS[key] for key in RESOURCE_KEYS], dtype=np.float64)
+        self.uids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.values = np.zeros((0, len(RESOURCE_KEYS)), dtype=np.float64)
+        self.rates = np.zeros((0, len(RESOURCE_KEYS)), dtype=np.float64)
+        self.detached: set = set()
+
+    def rebuild(self) -> None:
+        nations = self.bot.nations
+        self.uids = list(nations)
+        self.rows = {uid: row for row, uid in enumerate(self.uids)}
+        self.values = np.array(
+            [[nations[uid].get(key, 0) for key in RESOURCE_KEYS] for uid in self.uids],
+            dtype=np.float64
+        ).reshape(-1, len(RESOURCE_KEYS))
+        self.rates = np.array(
+            [self._income_row(uid) for uid in self.uids],
+            dtype=np.float64
+        ).reshape(-1, len(RESOURCE_KEYS))
+        self.detached.clear()
+
+    def _income_row(self, uid: str) -> list:
+        income = self.bot.get_income(uid)
+        return [income[key] for key in RESOURCE_KEYS]
+
+    def _write_row(self, uid: str, row: int) -> None:
+        nation = self.bot.nations[uid]
+        for key, value in zip(RESOURCE_KEYS, self.values[row].tolist()):
+            nation[key] = value
+
+    def checkout(self, uid: str) -> None:
+        row = self.rows.get(uid)
+        if row is None or uid in self.detached:
+            return
+        self._write_row(uid, row)
+        self.detached.add(uid)
+
+    def flush(self) -> None:
+        for uid, row in self.rows.items():
+            if uid not in self.detached:
+                self._write_row(uid, row)
+
+    def reattach(self, keep: frozenset = frozenset()) -> None:
+        # Nations in keep stay checked out: a transaction is still writing them
+        if len(self.rows) != len(self.bot.nations):
+            self.flush()
+            self.rebuild()
+            self.detached = {uid for uid in keep if uid in self.rows}
+            return
+
+        nations = self.bot.nations
+        for uid in self.detached - keep:
+            row = self.rows[uid]
+            nation = nations[uid]
+            self.values[row] = [nation.get(key, 0) for key in RESOURCE_KEYS]
+            self.rates[row] = self._income_row(uid)
+        self.detached &= keep
+
+    def charge(self, key: str, amount_of, keep: frozenset = frozenset()) -> List[str]:
+        # Rows that can pay amount_of(uid) are charged; the uids that cannot are
+        # returned untouched. Rows in keep are neither charged nor returned.
+        self.reattach(keep)
+        amounts = np.array([0 if uid in keep else amount_of(uid) for uid in self.uids], dtype=np.float64)
+        column = self.values[:, RESOURCE_KEYS.index(key)]
+        paid = column >= amounts
+        column[paid] -= amounts[paid]
+        return [self.uids[row] for row in np.flatnonzero(~paid & (amounts > 0)).tolist()]
+
+    def tick(self, steps: int = 1, keep: frozenset = frozenset()) -> None:
+        # Checked-out rows in keep also advance here, but are reloaded from their
+        # dicts on reattach, so their ticks have to be paid separately
+        self.reattach(keep)
+        self.values += self.rates * steps
+        np.minimum(self.values, self.caps, out=self.values)
+
+
+# ---------------- LEADERBOARD INDEX ----------------
+# Keys are (-value, uid) kept sorted, so the best nation comes first, top-N is a
+# slice and a rank is one bisect.
+class LeaderboardIndex:
+    def __init__(self, sort_key: str):
+        self.sort_key = sort_key
+        self.keys: List[tuple] = []
+        self.key_of: Dict[str, tuple] = {}
+
+    def value_of(self, nation: dict):
+        if self.sort_key == "territories":
+            return len(nation.get("territories", []))
+        return nation.get(self.sort_key, 0)
+
+    def rebuild(self, nations: Dict[str, dict]) -> None:
+        self.key_of = {uid: (-self.value_of(nation), uid) for uid, nation in nations.items()}
+        self.keys = sorted(self.key_of.values())
+
+    def update(self, uid: str, nation: Optional[dict]) -> None:
+        old = self.key_of.pop(uid, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, old)]
+        if nation is not None:
+            key = (-self.value_of(nation), uid)
+            self.key_of[uid] = key
+            insort(self.keys, key)
+
+    def top(self, count: int) -> List[tuple]:
+        return [(uid, -negated) for negated, uid in self.keys[:count]]
+
+    def rank(self, uid: str) -> Optional[int]:
+        key = self.key_of.get(uid)
+        if key is None:
+            return None
+        return bisect_left(self.keys, key) + 1
+
+
+# ---------------- LOG DISPATCHER ----------------
+# Log lines are queued per priority and merged into as few channel messages as
+# possible on every flush. When the queue is full the lowest priority lines are
+# dropped first and reported as a summary line.
+LOG_HIGH = 0  # conquests and lost regions
+LOG_NORMAL = 1  # claims, research, infrastructure, new nations
+LOG_LOW = 2  # random events
+LOG_PRIORITY_NAMES = {LOG_HIGH: "war reports", LOG_NORMAL: "announcements", LOG_LOW: "random events"}
+MESSAGE_LIMIT = 2000
+
+
+class LogDispatcher:
+    def __init__(self, limit: int, messages_per_flush: int):
+        self.limit = limit
+        self.messages_per_flush = messages_per_flush
+        self.queues = {priority: deque() for priority in LOG_PRIORITY_NAMES}
+        self.dropped = {priority: 0 for priority in LOG_PRIORITY_NAMES}
+        self.sent_messages = 0
+        self.sent_lines = 0
+        self.backoff_until = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "depth_by_priority": {LOG_PRIORITY_NAMES[p]: len(q) for p, q in self.queues.items()},
+            "dropped": sum(self.dropped.values()),
+            "sent_messages": self.sent_messages,
+            "sent_lines": self.sent_lines,
+        }
+
+    def post(self, text: str, priority: int = LOG_NORMAL) -> None:
+        if self.depth >= self.limit:
+            # With a limit of 0 there is nothing queued to evict
+            worst = max((p for p, queue in self.queues.items() if queue), default=None)
+            if worst is None or worst <= priority:
+                self.dropped[priority] += 1
+                return
+            # Evict the newest line of the lowest priority to make room
+            self.queues[worst].pop()
+            self.dropped[worst] += 1
+        self.queues[priority].append(text[:MESSAGE_LIMIT])
+
+    def take_batch(self) -> List[str]:
+        # Builds up to messages_per_flush messages, highest priority first
+        messages: List[str] = []
+        current = ""
+        summary = [
+            f"➕ {count} more {LOG_PRIORITY_NAMES[priority]} not shown"
+            for priority, count in self.dropped.items() if count
+        ]
+        self.dropped = {priority: 0 for priority in LOG_PRIORITY_NAMES}
+        pending = [(None, line) for line in summary] + [
+            (priority, None) for priority in sorted(self.queues)
+        ]
+        for priority, line in pending:
+            queue = self.queues[priority] if priority is not None else None
+            while True:
+                if queue is not None:
+                    if not queue:
+                        break
+                    line = queue[0]
+                if current and len(current) + 1 + len(line) > MESSAGE_LIMIT:
+                    messages.append(current)
+                    current = ""
+                    if len(messages) >= self.messages_per_flush:
+                        return messages
+                current = f"{current}\n{line}" if current else line
+                if queue is None:
+                    break
+                queue.popleft()
+        if current:
+            messages.append(current)
+        return messages
+
+    async def flush(self, channel) -> None:
+        if channel is None:
+            # No log channel configured, so there is nowhere to deliver
+            for queue in self.queues.values():
+                queue.clear()
+            return
+        if not self.depth and not any(self.dropped.values()):
+            return
+        if time.monotonic() < self.backoff_until:
+            return
+        messages = self.take_batch()
+        for idx, message in enumerate(messages):
+            try:
+                await channel.send(message)
+                self.sent_messages += 1
+                self.sent_lines += message.count("\n") + 1
+            except discord.HTTPException as e:
+                # discord.py already retries 429s; back off on anything it gives up on
+                retry_after = getattr(e, "retry_after", None) or 30
+                self.backoff_until = time.monotonic() + retry_after
+                print(f"Log dispatch failed: {e}")
+                # Unsent messages go back in front, already joined, to go out first after the backoff
+                self.queues[LOG_HIGH].extendleft(reversed(messages[idx:]))
+                return
+
+
+# ---------------- TICK SCHEDULER ----------------
+# Converts measured monotonic time into whole fixed-length steps. The remainder
+# carries over to the next call, so a late iteration is paid back on the next
+# one instead of being lost; after a long stall at most max_steps are returned
+# and the rest is counted in dropped.
+class FixedStepClock:
+    def __init__(self, step: float, max_steps: int):
+        self.step = step
+        self.max_steps = max_steps
+        self.last: Optional[float] = None
+        self.carry = 0.0
+        self.elapsed = 0.0
+        self.dropped = 0.0
+
+    def advance(self, now: float) -> int:
+        if self.last is None:
+            self.last = now
+            return 0
+        self.elapsed = now - self.last
+        self.last = now
+        self.carry += self.elapsed
+        steps = int(self.carry // self.step)
+        self.carry -= steps * self.step
+        if steps > self.max_steps:
+            self.dropped += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+        return steps
+
+
+def upkeep_periods(value: float, gain: float, upkeep: float, periods: int, cap: float) -> float:
+    # Closed form of `periods` rounds of value = min(value + gain, cap) - upkeep.
+    # Only the first round can hit the cap from below cap - gain; after that the
+    # value moves by gain - upkeep per round and tops out at cap - upkeep. A
+    # negative result is the total upkeep that could not be paid.
+    return min(min(value, cap - gain) + periods * (gain - upkeep), cap - upkeep)
+
+
+# ---------------- NATION TRANSACTIONS ----------------
+# Commands that check and then mutate a nation run as transactions: each nation
+# has a FIFO lock acting as its single writer, so two commands touching the same
+# nation queue up while commands on different nations run independently.
+# Multi-nation transactions lock in sorted uid order, so they cannot deadlock.
+# Locks only exist while someone holds or waits for them. Economy ticks and
+# upkeep skip held nations and the transaction pays them back when it ends.
+class NationLocks:
+    def __init__(self, on_contended: Optional[Callable[[], None]] = None):
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.users: Dict[str, int] = {}
+        # Called each time a transaction has to queue for a nation
+        self.on_contended = on_contended
+
+    async def acquire(self, uids) -> List[str]:
+        ordered = sorted({uid for uid in uids if uid is not None})
+        held: List[str] = []
+        try:
+            for uid in ordered:
+                lock = self.locks.get(uid)
+                if lock is None:
+                    lock = self.locks[uid] = asyncio.Lock()
+                self.users[uid] = self.users.get(uid, 0) + 1
+                if lock.locked() and self.on_contended is not None:
+                    self.on_contended()
+                try:
+                    await lock.acquire()
+                except BaseException:
+                    self._forget(uid)
+                    raise
+                held.append(uid)
+        except BaseException:
+            self.release(held)
+            raise
+        return held
+
+    def release(self, held: List[str]) -> None:
+        for uid in reversed(held):
+            self.locks[uid].release()
+            self._forget(uid)
+
+    def held(self) -> frozenset:
+        return frozenset(uid for uid, lock in self.locks.items() if lock.locked())
+
+    def _forget(self, uid: str) -> None:
+        self.users[uid] -= 1
+        if not self.users[uid]:
+            del self.users[uid]
+            del self.locks[uid]
+
+
+# ---------------- COMMAND SYNC ----------------
+def command_tree_fingerprint(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake]) -> str:
+    # to_dict() is the payload sync() uploads: names, descriptions, options,
+    # autocomplete flags, permissions and localizations
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def read_command_fingerprints(path: str) -> Dict[str, str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_command_fingerprints(path: str, fingerprints: Dict[str, str]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ---------------- AUTOCOMPLETE INDEX ----------------
+class CompletionIndex:
+    # Case-folded catalog searched on every keystroke. Names starting with the
+    # query rank first, then names with a later word starting with it, then any
+    # other name containing it. 1-3 character n-grams give the substring
+    # candidates, so a lookup never scans the whole catalog.
+    def __init__(self, names):
+        self.names = sorted(names, key=str.casefold)
+        self.folded = [name.casefold() for name in self.names]
+        self.grams: Dict[str, set] = {}
+        for idx, text in enumerate(self.folded):
+            for size in (1, 2, 3):
+                for pos in range(len(text) - size + 1):
+                    self.grams.setdefault(text[pos:pos + size], set()).add(idx)
+
+    def candidates(self, query: str) -> set:
+        if len(query) <= 3:
+            return self.grams.get(query, set())
+        grams = [self.grams.get(query[pos:pos + 3]) for pos in range(len(query) - 2)]
+        if not all(grams):
+            return set()
+        return set.intersection(*sorted(grams, key=len))
+
+    def search(self, query: str, limit: int = 25, accept=None) -> List[str]:
+        # accept optionally filters names, e.g. down to what one nation can use
+        query = query.casefold()
+        if not query:
+            ranked = range(len(self.names))
+        else:
+            prefix = []
+            pos = bisect_left(self.folded, query)
+            while pos < len(self.folded) and self.folded[pos].startswith(query):
+                prefix.append(pos)
+                pos += 1
+            word, inner = [], []
+            for idx in sorted(self.candidates(query).difference(prefix)):
+                text = self.folded[idx]
+                if f" {query}" in text:
+                    word.append(idx)
+                elif query in text:
+                    inner.append(idx)
+            ranked = prefix + word + inner
+        results = []
+        for idx in ranked:
+            if accept is None or accept(self.names[idx]):
+                results.append(self.names[idx])
+                if len(results) >= limit:
+                    break
+        return results
+
+
+class AutocompleteService:
+    def __init__(self, catalogs: Dict[str, object]):
+        self.indexes = {catalog: CompletionIndex(names) for catalog, names in catalogs.items()}
+
+    def search(self, catalog: str, query: str, accept=None) -> List[str]:
+        return self.indexes[catalog].search(query, accept=accept)
+
+    def owned_regions(self, bot, uid: str, query: str) -> List[str]:
+        # region_owners is kept current by transfer_region(), so filtering the
+        # region catalog through it is the per-nation index
+        return self.search("regions", query, lambda region: bot.region_owners.get(region) == uid)
+
+    def affordable_units(self, bot, catalog: str, uid: str, query: str, quantity: int = 1) -> List[str]:
+        if uid not in bot.nations:
+            return self.search(catalog, query)
+        # peek_resource() reads the live values without checking the nation out
+        resources = bot.peek_resource(uid, "resources")
+        manpower = bot.peek_resource(uid, "manpower")
+        return self.search(catalog, query, lambda unit: (
+            ALL_UNITS[unit]["cost"] * quantity <= resources and ALL_UNITS[unit]["manpower"] * quantity <= manpower
+        ))
+
+
+autocomplete_service = AutocompleteService({
+    "ground_units": GROUND_UNITS,
+    "naval_units": NAVAL_UNITS,
+    "air_units": AIR_UNITS,
+    "regions": WORLD_REGIONS,
+    "infrastructure": INFRASTRUCTURE,
+    "technologies": TECHNOLOGIES,
+    "buildings": BUILDINGS,
+    "map_modes": ["emoji", "image"],
+    "leaderboards": LEADERBOARD_CATEGORIES,
+})
+
+
+# ---------------- WORLD PARTITIONS ----------------
+# Each guild plays in its own World. PaxHistoriaBot forwards the attributes in
+# WORLD_ATTRIBUTES to the world active in the current context, which is set per
+# interaction by the command tree and per world by the loops, so the game code
+# reads self.nations / bot.nations as before.
+current_world: ContextVar = ContextVar("current_world", default=None)
+
+WORLD_ATTRIBUTES = (
+    "nations", "alliances", "wars", "trade_offers", "income_cache", "economy", "_save_task", "_save_requested",
+    "dirty_nations", "all_nations_dirty", "table_fingerprints", "leaderboards", "leaderboard_dirty",
+    "event_window", "event_heap", "event_due", "map_seed", "base_map", "map_render_cache", "region_cells",
+    "display_map", "symbol_order", "nation_symbol", "terrain_raster", "map_image_cache", "military",
+    "region_owners", "history_pending", "journal", "log_dispatcher", "nation_locks", "economy_clock", "save_clock",
+    "cold_store", "owed_ticks", "owed_upkeep",
+)
+
+
+class World:
+    def __init__(self, guild_id: int, data_dir: str):
+        self.guild_id = guild_id
+        self.data_dir = data_dir
+        self.log_channel_id = GUILD_LOG_CHANNELS.get(guild_id)
+        self.last_active = time.monotonic()
+
+
+def estimate_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key) + estimate_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+
+class PaxCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        guild_id = interaction.guild_id if MULTI_GUILD else GUILD_ID
+        if guild_id is None:
+            if interaction.type is discord.InteractionType.application_command:
+                await interaction.response.send_message("❌ Nations live in servers, use this in one", ephemeral=True)
+            return False
+        # The tree runs each interaction in its own task, so this only affects it
+        current_world.set(self.client.open_world(guild_id))
+        return True
+
+
+# ---------------- METRICS ----------------
+def instrumented_loop(name: str):
+    # Runs a tasks.loop body once per loaded world, timing each run into
+    # pax_world_loop_duration_seconds and the whole pass into pax_loop_duration_seconds
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self) -> None:
+            self.loop_iterations.inc(labels={"loop": name})
+            with self.loop_seconds.time({"loop": name}):
+                for world in list(self.worlds.values()):
+                    with self.use_world(world), self.world_loop_seconds.time(
+                            {"loop": name, "guild": str(world.guild_id)}):
+                        await func(self)
+        return wrapper
+    return decorator
+
 
 # ---------------- BOT CLASS ----------------
 class PaxHistoriaBot(commands.Bot):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents)
+        super().__init__(command_prefix="!", intents=intents, tree_cls=PaxCommandTree)
+        self.lazy_accrual = ECONOMY_ENGINE == "lazy"
+        self.map_pool: Optional[ProcessPoolExecutor] = None
+        # guild id -> loaded world; evicted_at remembers when idle worlds were unloaded
+        self.worlds: Dict[int, World] = {}
+        self.evicted_at: Dict[int, float] = {}
+        self.register_metrics()
+        self.metrics_server = None
+
+    @property
+    def world(self) -> World:
+        world = current_world.get()
+        if world is None:
+            raise RuntimeError("No world is active in this context")
+        return world
+
+    @contextmanager
+    def use_world(self, world: World):
+        token = current_world.set(world)
+        try:
+            yield world
+        finally:
+            current_world.reset(token)
+
+    def world_path(self, name: str) -> str:
+        return os.path.join(self.world.data_dir, name)
+
+    def open_world(self, guild_id: int) -> World:
+        world = self.worlds.get(guild_id)
+        if world is None:
+            data_dir = "." if guild_id == GUILD_ID else os.path.join(WORLDS_DIR, str(guild_id))
+            os.makedirs(data_dir, exist_ok=True)
+            world = World(guild_id, data_dir)
+            with self.use_world(world):
+                self.init_world_state()
+                self.load_data(self.evicted_at.pop(guild_id, None))
+                for problem in self.check_region_index():
+                    print(f"Region index drift in guild {guild_id}: {problem}")
+            self.worlds[guild_id] = world
+            print(f"Loaded world for guild {guild_id} ({len(world.nations)} nations)")
+        world.last_active = time.monotonic()
+        return world
+
+    def catch_up_evicted(self, evicted_at: float) -> None:
+        # Settles the whole time the world spent unloaded as if it had stayed
+        # loaded, with no TICK_MAX_CATCHUP cap: income for every whole tick and one
+        # upkeep charge per UPKEEP_SECONDS, in closed form per nation. A nation that
+        # ran short loses units once, for its share of all the upkeep it missed.
+        # Random events are not replayed, their schedule resumes where it stopped.
+        # Runs inside load_data before anything settles lazy nations.
+        steps = int((time.monotonic() - evicted_at) // TICK_SECONDS)
+        if not steps:
+            return
+        periods = int(steps * TICK_SECONDS // UPKEEP_SECONDS)
+        ticks_per_period = UPKEEP_SECONDS / TICK_SECONDS
+        # Income earned after the last upkeep charge
+        tail = steps - periods * ticks_per_period
+        unloaded_at = time.time() - (time.monotonic() - evicted_at)
+        for uid in list(self.nations):
+            nation = self.nations[uid]
+            if self.lazy_accrual:
+                # Accrue up to the unload so the gap below is only paid once
+                self.accrue(uid, unloaded_at)
+            income = self.get_income(uid)
+            upkeep = self.upkeep_due(uid) if periods else 0
+            disbanded = False
+            for key, cap in RESOURCE_CAPS.items():
+                if key != "resources" or not upkeep:
+                    nation[key] = min(nation.get(key, 0) + income[key] * steps, cap)
+                    continue
+                value = upkeep_periods(nation.get(key, 0), income[key] * ticks_per_period, upkeep, periods, cap)
+                if value < 0:
+                    self.disband_unpaid(uid, -value / (upkeep * periods))
+                    disbanded = True
+                    value = 0
+                nation[key] = min(value + income[key] * tail, cap)
+            if self.lazy_accrual:
+                nation["last_accrued_at"] = unloaded_at + steps * TICK_SECONDS
+            self.record("catch_up", uid, "resources", *(("units", "military_power") if disbanded else ()))
+        self.all_nations_dirty = True
+        print(f"Settled {steps * TICK_SECONDS:.0f}s of economy for guild {self.world.guild_id} after reload")
+
+    async def evict_world(self, world: World) -> bool:
+        if world.nation_locks.locks:
+            return False
+        touched = world.last_active
+        with self.use_world(world):
+            await self.log_dispatcher.flush(self.get_channel(world.log_channel_id or 0))
+            self.write_snapshot()
+            # The worker's last save includes this request; unloading after a failed
+            # one would throw the unsaved state away
+            if not await self._save_task:
+                print(f"Keeping world for guild {world.guild_id} loaded, its final save failed")
+                return False
+            # Someone used the world while it was being saved; keep it
+            if world.last_active != touched:
+                return False
+            if self.journal is not None:
+                self.journal.close()
+            if self.cold_store is not None:
+                self.cold_store.close()
+        del self.worlds[world.guild_id]
+        self.evicted_at[world.guild_id] = time.monotonic()
+        print(f"Unloaded idle world for guild {world.guild_id}")
+        return True
+
+    def init_world_state(self) -> None:
         self.nations: Dict[str, dict] = {}
         self.alliances: Dict[str, dict] = {}
         self.wars: List[dict] = []
         self.trade_offers: List[dict] = []
+        # Income only depends on territories, technologies and buildings, so it is
+        # cached per nation and dropped by the commands that change those inputs.
+        self.income_cache: Dict[str, dict] = {}
+        self.economy: Optional[EconomyEngine] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_requested = False
+        # Nations changed since the last SQLite commit; tick engines that touch
+        # every nation set all_nations_dirty instead of listing them.
+        self.dirty_nations: set = set()
+        self.all_nations_dirty = False
+        self.table_fingerprints: Dict[str, str] = {}
+        # Rebuilt every 30 ticks; nations touched by commands are re-ranked on query
+        self.leaderboards = {
+            category: LeaderboardIndex(sort_key) for category, (sort_key, _) in LEADERBOARD_CATEGORIES.items()
+        }
+        self.leaderboard_dirty: set = set()
+        # (due window, uid) min-heap; event_due holds the live entry per nation so
+        # stale heap entries can be skipped
+        self.event_window = 0
+        self.event_heap: List[tuple] = []
+        self.event_due: Dict[str, int] = {}
+        # Terrain comes from a persisted seed; the painted map is rebuilt only after
+        # territories change
+        self.map_seed: Optional[int] = None
+        self.base_map: Optional[List[List[str]]] = None
+        self.map_render_cache: Optional[tuple] = None
+        # Land cells per region, the painted grid and stable per-nation symbols,
+        # kept up to date one region at a time by paint_region()
+        self.region_cells: Dict[str, List[tuple]] = {}
+        self.display_map: List[List[str]] = []
+        self.symbol_order: List[str] = []
+        self.nation_symbol: Dict[str, str] = {}
+        # PNG maps are drawn in worker processes and cached by ownership hash
+        self.terrain_raster = b""
+        self.map_image_cache: Dict[str, bytes] = {}
+        # uid -> power per domain and raw upkeep; only change_units() changes units
+        self.military: Dict[str, dict] = {}
+        # region -> owner uid; only transfer_region() changes ownership
+        self.region_owners: Dict[str, str] = {}
+        # Entries trimmed from in-memory history that are not on disk yet
+        self.history_pending: Dict[str, list] = {}
+        self.journal: Optional[MutationJournal] = None
+        # Indexed snapshots only: where unloaded nations' cold fields live
+        self.cold_store: Optional[NationColdStore] = None
+        self.log_dispatcher = LogDispatcher(LOG_QUEUE_LIMIT, LOG_MESSAGES_PER_FLUSH)
+        contended_labels = self.world_labels()
+        self.nation_locks = NationLocks(lambda: self.lock_contended.inc(labels=contended_labels))
+        # uid -> ticks / upkeep passes skipped while a transaction held the nation
+        self.owed_ticks: Dict[str, int] = {}
+        self.owed_upkeep: Dict[str, int] = {}
+        self.economy_clock = FixedStepClock(TICK_SECONDS, TICK_MAX_CATCHUP)
+        self.save_clock = FixedStepClock(SAVE_INTERVAL_SECONDS, 1)
+        if JOURNAL_ENABLED:
+            if STORAGE_BACKEND == "json":
+                self.journal = MutationJournal(self.world_path(f"{DATA_FILE}.journal"))
+            else:
+                print("JOURNAL_ENABLED is only supported with the json storage backend")
+        if ECONOMY_ENGINE == "numpy":
+            if np is not None:
+                self.economy = EconomyEngine(self)
+            else:
+                print("ECONOMY_ENGINE=numpy but numpy is not installed, using dict engine")
+
+    def register_metrics(self) -> None:
+        self.metrics = metrics.MetricsRegistry()
+        self.loop_seconds = self.metrics.histogram("pax_loop_duration_seconds", "Time spent in one loop iteration")
+        self.loop_iterations = self.metrics.counter("pax_loop_iterations_total", "Loop iterations started")
+        self.world_loop_seconds = self.metrics.histogram(
+            "pax_world_loop_duration_seconds", "Time one loop iteration spent on one guild's world"
+        )
+        self.world_nations = self.metrics.gauge("pax_world_nations", "Nations in each loaded world")
+        self.world_memory = self.metrics.gauge(
+            "pax_world_memory_bytes", "Estimated memory held by each loaded world's nations"
+        )
+        self.metrics.gauge("pax_worlds_loaded", "Guild worlds currently in memory", lambda: len(self.worlds))
+        self.autocomplete_seconds = self.metrics.histogram(
+            "pax_autocomplete_duration_seconds", "Time to answer one autocomplete request, by handler"
+        )
+        self.hydrations = self.metrics.counter(
+            "pax_nation_hydrations_total", "Nations whose history, infrastructure and units were read from disk"
+        )
+        self.metrics.gauge(
+            "pax_hydrated_nations", "Nations with history, infrastructure and units in memory (indexed snapshots)",
+            self.per_world(lambda world: len(world.cold_store.loaded) if world.cold_store else 0)
+        )
+        self.loop_nations = self.metrics.counter(
+            "pax_loop_nations_processed_total", "Nations processed by loop iterations"
+        )
+        self.loop_last_nations = self.metrics.gauge(
+            "pax_loop_last_nations_processed", "Nations processed by the latest iteration of each loop"
+        )
+        self.tick_lag = self.metrics.histogram(
+            "pax_tick_lag_seconds", "How late each economy tick started compared to its 1 second cadence",
+            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+        )
+        self.tick_steps = self.metrics.counter("pax_tick_steps_total", "Economy ticks applied")
+        self.tick_catchup = self.metrics.counter(
+            "pax_tick_catchup_steps_total", "Extra economy ticks applied to make up for late iterations"
+        )
+        self.metrics.gauge(
+            "pax_tick_dropped_seconds", "Economy time skipped after stalls longer than the catch-up limit",
+            self.per_world(lambda world: world.economy_clock.dropped)
+        )
+        self.save_seconds = self.metrics.histogram("pax_save_duration_seconds", "Time to write one save, by guild")
+        self.saves = self.metrics.counter("pax_saves_total", "Saves written, by guild and result")
+        self.metrics.gauge("pax_nations", "Nations in memory",
+                           self.per_world(lambda world: len(world.nations)))
+        self.metrics.gauge("pax_log_queue_depth", "Log lines waiting to be sent",
+                           self.per_world(lambda world: world.log_dispatcher.depth))
+        self.metrics.gauge("pax_nation_locks_held", "Nations with a transaction running or queued",
+                           self.per_world(lambda world: len(world.nation_locks.locks)))
+        self.lock_contended = self.metrics.counter(
+            "pax_nation_lock_contended_total", "Transactions that had to queue behind another, by guild"
+        )
 
-    async def setup_hook(self) -> None:
-        self.load_data()
-        guild = discord.Object(id=GUILD_ID)
-        self.tree.copy_global_to(guild=guild)
+    def per_world(self, value: Callable[[World], float]):
+        # Gauge callback with one guild-labelled series per loaded world
+        return lambda: [({"guild": str(world.guild_id)}, value(world)) for world in list(self.worlds.values())]
+
+    def world_labels(self, **labels: str) -> Dict[str, str]:
+        # Labels for series that belong to the active world
+        return {"guild": str(self.world.guild_id), **labels}
+
+    def count_processed(self, loop: str, nations: int) -> None:
+        self.loop_nations.inc(nations, self.world_labels(loop=loop))
+        self.loop_last_nations.set(nations, self.world_labels(loop=loop))
+
+    async def sync_commands(self) -> Optional[float]:
+        # Returns how long the sync took, or None when the tree is unchanged
+        guild = None if MULTI_GUILD else discord.Object(id=GUILD_ID)
+        if guild is not None:
+            self.tree.copy_global_to(guild=guild)
+        scope = f"{self.application_id}:{guild.id if guild else 'global'}"
+        fingerprint = command_tree_fingerprint(self.tree, guild)
+        fingerprints = read_command_fingerprints(COMMAND_FINGERPRINT_FILE)
+        if fingerprints.get(scope) == fingerprint and not FORCE_COMMAND_SYNC:
+            return None
+        start = time.perf_counter()
         await self.tree.sync(guild=guild)
+        elapsed = time.perf_counter() - start
+        fingerprints[scope] = fingerprint
+        write_command_fingerprints(COMMAND_FINGERPRINT_FILE, fingerprints)
+        return elapsed
+
+    async def setup_hook(self) -> None:
+        start = time.perf_counter()
+        # The home guild's world is always loaded; other guilds load on first use
+        self.open_world(GUILD_ID)
+        sync_seconds = await self.sync_commands()
         print(f"Bot Online as {self.user}")
+        if sync_seconds is None:
+            print(f"Startup took {time.perf_counter() - start:.2f}s (command tree unchanged, sync skipped)")
+        else:
+            print(f"Startup took {time.perf_counter() - start:.2f}s (command sync {sync_seconds:.2f}s)")
         self.real_time_growth_loop.start()
         self.passive_growth_loop.start()
         self.random_events_loop.start()
-
-    def load_data(self) -> None:
-        if os.path.exists(DATA_FILE):
+        self.log_flush_loop.start()
+        self.world_maintenance_loop.start()
+        if JOURNAL_ENABLED and STORAGE_BACKEND == "json":
+            self.journal_compaction_loop.start()
+        if METRICS_PORT:
+            self.metrics_server = await metrics.start_exporter(self.metrics, METRICS_HOST, METRICS_PORT)
+            print(f"Metrics exporter listening on {METRICS_HOST}:{METRICS_PORT}")
+
+    def load_data(self, evicted_at: Optional[float] = None) -> None:
+        # evicted_at is the monotonic time a reloaded world was unloaded at
+        journal_seq = 0
+        # Cleared before replay: trimming replayed history queues entries here
+        # that are not in any archive segment yet
+        self.history_pending.clear()
+        if self.cold_store is not None:
+            self.cold_store.close()
+        self.cold_store = (
+            NationColdStore(HYDRATION_CACHE_SIZE) if SNAPSHOT_FORMAT == "indexed" and STORAGE_BACKEND == "json" else None
+        )
+        if STORAGE_BACKEND == "sqlite":
+            self.load_sqlite()
+        elif os.path.exists(self.world_path(SNAPSHOT_FILE)) or os.path.exists(self.world_path(DATA_FILE)):
+            # A binary setup falls back to the JSON file until its first save
+            path = self.world_path(SNAPSHOT_FILE if os.path.exists(self.world_path(SNAPSHOT_FILE)) else DATA_FILE)
             try:
-                with open(DATA_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.nations = data.get("nations", {})
-                    self.alliances = data.get("alliances", {})
-                    self.wars = data.get("wars", [])
-                    self.trade_offers = data.get("trade_offers", [])
+                if self.cold_store is not None and is_indexed_file(path):
+                    # Only the header is parsed; cold fields are read per nation on first use
+                    data = self.cold_store.load(path)
+                    self.military = data.pop("military")
+                else:
+                    data = read_data_file(path)
+                self.nations = data.get("nations", {})
+                self.alliances = data.get("alliances", {})
+                self.wars = data.get("wars", [])
+                self.trade_offers = data.get("trade_offers", [])
+                self.map_seed = data.get("map_seed")
+                journal_seq = data.get("journal_seq", 0)
                 print(f"Loaded {len(self.nations)} nations")
             except Exception as e:
                 print(f"Failed loading data: {e}")
                 self.nations = {}
                 self.alliances = {}
+                if self.cold_store is not None:
+                    self.cold_store.close()
+                    self.cold_store.cold.clear()
+        else:
+            self.nations = {}
+            self.alliances = {}
+        if self.journal is not None:
+            self.replay_journal(journal_seq)
+        for uid in self.nations:
+            self.trim_history(uid)
+        self.rebuild_region_index()
+        self.income_cache.clear()
+        self.dirty_nations.clear()
+        self.all_nations_dirty = False
+        self.table_fingerprints = sqlite_table_fingerprints(
+            {"alliances": self.alliances, "wars": self.wars, "trade_offers": self.trade_offers, "map_seed": self.map_seed}
+        )
+        if self.map_seed is None:
+            # New seed differs from the stored fingerprint, so the next save persists it
+            self.map_seed = random.randrange(2 ** 32)
+            if self.journal is not None:
+                # A world that crashes before its first snapshot keeps its map
+                self.journal.append({"op": "map_seed", "seed": self.map_seed})
+        self.reset_map()
+        self.rebuild_military_ledger()
+        if not self.lazy_accrual:
+            # A stamp left over from an earlier lazy run would pay out the whole gap later
+            for nation in self.nations.values():
+                nation.pop("last_accrued_at", None)
         else:
+            # Nations saved by another engine accrue from the load, not from their first touch
+            now = time.time()
+            for nation in self.nations.values():
+                nation.setdefault("last_accrued_at", now)
+        if evicted_at is not None:
+            self.catch_up_evicted(evicted_at)
+        if self.economy is not None:
+            self.economy.rebuild()
+        self.rebuild_leaderboards()
+        self.rebuild_event_schedule()
+
+    def load_sqlite(self) -> None:
+        try:
+            sqlite_path, json_path = self.world_path(SQLITE_FILE), self.world_path(DATA_FILE)
+            if not os.path.exists(sqlite_path) and os.path.exists(json_path):
+                count = import_json_to_sqlite(json_path, sqlite_path)
+                print(f"Imported {count} nations from {json_path} into {sqlite_path}")
+            data = read_sqlite(sqlite_path)
+            self.nations = data["nations"]
+            self.alliances = data["alliances"]
+            self.wars = data["wars"]
+            self.trade_offers = data["trade_offers"]
+            self.map_seed = data.get("map_seed")
+            print(f"Loaded {len(self.nations)} nations")
+        except Exception as e:
+            print(f"Failed loading data: {e}")
             self.nations = {}
             self.alliances = {}
 
+    def replay_journal(self, after_seq: int) -> None:
+        started = time.perf_counter()
+        size = self.journal.size()
+        entries = self.journal.read_entries(after_seq)
+        for entry in entries:
+            self.apply_journal_entry(entry)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"Replayed {len(entries)} journal entries ({size:,} bytes on disk) in {elapsed_ms:.1f} ms")
+
+    def apply_journal_entry(self, entry: dict) -> None:
+        if entry["op"] == "tick":
+            self.apply_income_tick(entry.get("steps", 1))
+            return
+        if entry["op"] == "map_seed":
+            self.map_seed = entry["seed"]
+            return
+        uid = entry["uid"]
+        if uid in self.nations:
+            # Entries may set cold fields, which must not be overwritten by a later hydration
+            self.hydrate(uid)
+        nation = self.nations.setdefault(uid, {})
+        if "set" in entry:
+            nation.update(entry["set"])
+            self.invalidate_income(uid)
+        if "history" in entry:
+            self.push_history(uid, entry["history"])
+
+    def rebuild_region_index(self) -> None:
+        self.region_owners = {}
+        for uid, nation in self.nations.items():
+            for region in nation.get("territories", []):
+                self.region_owners.setdefault(region, uid)
+
+    def transfer_region(self, region: str, uid: str) -> None:
+        previous = self.region_owners.get(region)
+        if previous == uid:
+            return
+        if previous is not None:
+            territories = self.nations[previous].get("territories", [])
+            if region in territories:
+                territories.remove(region)
+            self.invalidate_income(previous)
+        self.nations[uid].setdefault("territories", []).append(region)
+        self.region_owners[region] = uid
+        self.invalidate_income(uid)
+        self.paint_region(region)
+
+    def rebuild_military_ledger(self) -> None:
+        stored, self.military = self.military, {}
+        for uid in self.nations:
+            if self.cold_store is not None and uid in self.cold_store.cold and uid in stored:
+                # The roster is still on disk; the ledger was saved alongside it
+                self.military[uid] = stored[uid]
+            else:
+                self.military[uid] = calculate_military_by_type(self.hydrate(uid))
+        for uid in self.nations:
+            # Older saves subtracted battle losses from military_power without
+            # removing units; re-deriving it brings them back in line
+            if self.sync_military_power(uid):
+                self.dirty_nations.add(uid)
+
+    def sync_military_power(self, uid: str) -> bool:
+        nation = self.nations[uid]
+        ledger = self.military[uid]
+        ground = ledger["ground"]
+        if "Military Tactics" in nation.get("technologies", []):
+            ground = int(ground * MILITARY_TACTICS_BONUS)
+        power = BASE_MILITARY_POWER + ground + ledger["naval"] + ledger["air"] + ledger["strategic"]
+        changed = nation.get("military_power") != power
+        nation["military_power"] = power
+        return changed
+
+    def change_units(self, uid: str, unit_name: str, delta: int) -> None:
+        nation = self.hydrate(uid)
+        unit = ALL_UNITS[unit_name]
+        if uid not in self.military:
+            # Counted before the roster changes, so the delta is applied once
+            self.military[uid] = calculate_military_by_type(nation)
+        ledger = self.military[uid]
+        delta = max(delta, -nation["units"].get(unit_name, 0))
+        nation["units"][unit_name] = nation["units"].get(unit_name, 0) + delta
+        ledger[unit.get("type", "ground")] += unit["power"] * delta
+        ledger["total"] += unit["power"] * delta
+        ledger["upkeep"] += unit["upkeep"] * delta
+        self.sync_military_power(uid)
+
+    def inflict_losses(self, uid: str, fraction: float, domains: tuple = MILITARY_DOMAINS) -> int:
+        # Removes the given fraction of every unit type in those domains and
+        # returns the unit power lost
+        fraction = min(max(fraction, 0.0), 1.0)
+        lost = 0
+        for unit_name, removed in unit_losses(self.hydrate(uid).get("units", {}), fraction, domains).items():
+            if removed:
+                self.change_units(uid, unit_name, -removed)
+                lost += ALL_UNITS[unit_name]["power"] * removed
+        return lost
+
+    def military_forces(self, uid: str) -> dict:
+        return dict(self.military[uid])
+
+    def upkeep_due(self, uid: str) -> int:
+        upkeep = self.military[uid]["upkeep"]
+        if "Advanced Logistics" in self.nations[uid].get("technologies", []):
+            upkeep = int(upkeep * ADVANCED_LOGISTICS_DISCOUNT)
+        return upkeep
+
+    def reset_map(self) -> None:
+        self.base_map = generate_world_map(self.map_seed)
+        self.region_cells = compile_region_cells(self.base_map)
+        self.terrain_raster = bytes(TERRAIN_CODES[cell] for row in self.base_map for cell in row)
+        self.display_map = [row[:] for row in self.base_map]
+        self.symbol_order = []
+        self.nation_symbol = {}
+        for uid, nation in self.nations.items():
+            if nation.get("territories"):
+                self.assign_symbol(uid)
+        for region in self.region_owners:
+            self.paint_region(region)
+        self.map_render_cache = None
+
+    def assign_symbol(self, uid: str) -> str:
+        # Symbols are never reassigned, so one nation gaining or losing its first
+        # region does not repaint everyone else
+        if uid not in self.nation_symbol:
+            self.nation_symbol[uid] = NATION_SYMBOLS[len(self.symbol_order) % len(NATION_SYMBOLS)]
+            self.symbol_order.append(uid)
+        return self.nation_symbol[uid]
+
+    def paint_region(self, region: str) -> None:
+        if not self.display_map:
+            self.reset_map()
+            return
+        owner = self.region_owners.get(region)
+        for ny, nx in self.region_cells.get(region, ()):
+            self.display_map[ny][nx] = self.assign_symbol(owner) if owner is not None else self.base_map[ny][nx]
+        self.map_render_cache = None
+
+    def rendered_map(self) -> tuple:
+        if not self.display_map:
+            self.reset_map()
+        if self.map_render_cache is None:
+            legend = {uid: self.nation_symbol[uid] for uid in self.symbol_order if self.nations[uid].get("territories")}
+            self.map_render_cache = (format_map(self.display_map), legend)
+        return self.map_render_cache
+
+    def ownership_raster(self) -> tuple:
+        holders = set(self.region_owners.values())
+        owners = [uid for uid in self.symbol_order if uid in holders]
+        owner_index = {uid: idx + 1 for idx, uid in enumerate(owners)}
+        raster = array("H", [0]) * (MAP_WIDTH * MAP_HEIGHT)
+        for region, uid in self.region_owners.items():
+            for ny, nx in self.region_cells.get(region, ()):
+                raster[ny * MAP_WIDTH + nx] = owner_index[uid]
+        return raster.tobytes(), [self.nations[uid]["name"] for uid in owners]
+
+    async def render_map_image(self) -> bytes:
+        if not self.display_map:
+            self.reset_map()
+        owners, names = self.ownership_raster()
+        key = hashlib.sha1(self.terrain_raster + owners + "\0".join(names).encode("utf-8")).hexdigest()
+        png = self.map_image_cache.get(key)
+        if png is None:
+            if self.map_pool is None:
+                # Forking would copy the save and SQLite worker threads' locks mid-use.
+                # Spawned workers re-import this script as __mp_main__ (discord, numpy,
+                # the commands, an idle bot), about 0.5 s and 60 MB each; the pool is
+                # created once and kept, so that is paid on the first /map_image only
+                self.map_pool = ProcessPoolExecutor(
+                    max_workers=MAP_IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+            labels = [(name, *region["coordinates"]) for name, region in WORLD_REGIONS.items()]
+            png = await asyncio.get_running_loop().run_in_executor(
+                self.map_pool, map_image.render_map_png,
+                MAP_WIDTH, MAP_HEIGHT, self.terrain_raster, owners, names, labels
+            )
+            self.map_image_cache = {key: png}
+        return png
+
+    def check_region_index(self) -> List[str]:
+        problems = []
+        holders: Dict[str, str] = {}
+        for uid, nation in self.nations.items():
+            for region in nation.get("territories", []):
+                if region not in WORLD_REGIONS:
+                    problems.append(f"{uid} holds unknown region {region}")
+                if region in holders:
+                    problems.append(f"{region} is held by both {holders[region]} and {uid}")
+                    continue
+                holders[region] = uid
+                if self.region_owners.get(region) != uid:
+                    problems.append(f"{region} is held by {uid} but indexed to {self.region_owners.get(region)}")
+        for region, uid in self.region_owners.items():
+            if region not in holders:
+                problems.append(f"{region} is indexed to {uid} but held by nobody")
+        return problems
+
+    def schedule_event(self, uid: str) -> None:
+        due = self.event_window + sample_event_gap()
+        self.event_due[uid] = due
+        heapq.heappush(self.event_heap, (due, uid))
+
+    def rebuild_event_schedule(self) -> None:
+        # Gaps are memoryless, so a fresh draw at load keeps the same frequencies
+        self.event_due = {uid: self.event_window + sample_event_gap() for uid in self.nations}
+        self.event_heap = [(due, uid) for uid, due in self.event_due.items()]
+        heapq.heapify(self.event_heap)
+
+    def pop_due_events(self) -> List[str]:
+        due_nations = []
+        while self.event_heap and self.event_heap[0][0] <= self.event_window:
+            due, uid = heapq.heappop(self.event_heap)
+            if self.event_due.get(uid) != due or uid not in self.nations:
+                continue
+            due_nations.append(uid)
+            self.schedule_event(uid)
+        return due_nations
+
+    def rebuild_leaderboards(self) -> None:
+        self.settle_economy()
+        for index in self.leaderboards.values():
+            index.rebuild(self.nations)
+        self.leaderboard_dirty.clear()
+
+    def refresh_leaderboards(self) -> None:
+        if len(self.leaderboard_dirty) > LEADERBOARD_REBUILD_FRACTION * len(self.nations):
+            for index in self.leaderboards.values():
+                index.rebuild(self.nations)
+            self.leaderboard_dirty.clear()
+            return
+        for uid in self.leaderboard_dirty:
+            nation = self.nations.get(uid)
+            for index in self.leaderboards.values():
+                index.update(uid, nation)
+        self.leaderboard_dirty.clear()
+
+    def push_history(self, uid: str, text: str) -> None:
+        history = self.hydrate(uid).setdefault("history", [])
+        history.append(text)
+        if 0 < HISTORY_LIMIT < len(history):
+            self.trim_history(uid)
+
+    def trim_history(self, uid: str) -> None:
+        nation = self.nations[uid]
+        history = nation.get("history", [])
+        overflow = len(history) - HISTORY_LIMIT
+        if HISTORY_LIMIT <= 0 or overflow <= 0:
+            return
+        archived = nation.get("history_archived", 0)
+        self.history_pending.setdefault(uid, [archived, []])[1].extend(history[:overflow])
+        del history[:overflow]
+        nation["history_archived"] = archived + overflow
+
+    async def read_history(self, uid: str, start: int, end: int) -> List[str]:
+        nation = self.hydrate(uid)
+        history = nation.get("history", [])
+        archived = nation.get("history_archived", 0)
+        pending_start, pending = self.history_pending.get(uid, (archived, []))
+        # Slice the in-memory parts before awaiting the disk read
+        from_pending = pending[max(start - pending_start, 0):max(end - pending_start, 0)]
+        from_memory = history[max(start - archived, 0):max(end - archived, 0)]
+        from_disk = []
+        if start < pending_start:
+            from_disk = await asyncio.to_thread(
+                read_history_archive, self.world_path(HISTORY_ARCHIVE_DIR), uid, start, min(end, pending_start)
+            )
+        return from_disk + from_pending + from_memory
+
+    def take_history_pending(self) -> Dict[str, list]:
+        archive, self.history_pending = self.history_pending, {}
+        return archive
+
+    def record(self, op: str, uid: str, *keys: str, history: Optional[str] = None) -> None:
+        if self.journal is None:
+            return
+        entry = {"op": op, "uid": uid}
+        if keys:
+            # get_nation() may have settled the economy, so those fields always go along
+            nation = self.nations[uid]
+            entry["set"] = {
+                key: copy_json(nation[key])
+                for key in JOURNAL_ECONOMY_KEYS + list(keys)
+                if key in nation
+            }
+        if history is not None:
+            entry["history"] = history
+        self.journal.append(entry)
+
+    def get_nation(self, uid: str, hydrate: bool = True) -> dict:
+        # hydrate=False is for loops that only touch resources and other hot fields
+        self.dirty_nations.add(uid)
+        self.leaderboard_dirty.add(uid)
+        if self.economy is not None:
+            self.economy.checkout(uid)
+        elif self.lazy_accrual:
+            self.accrue(uid)
+        return self.hydrate(uid) if hydrate else self.nations[uid]
+
+    def hydrate(self, uid: str) -> dict:
+        # Makes sure the nation's COLD_FIELDS are in memory and marks it recently used
+        nation = self.nations[uid]
+        store = self.cold_store
+        if store is not None:
+            if uid in store.cold:
+                nation.update(store.fetch(uid))
+                store.cold.discard(uid)
+                self.hydrations.inc(labels=self.world_labels())
+            store.touch(uid)
+        return nation
+
+    def evict_cold_nations(self) -> None:
+        store = self.cold_store
+        for uid in self.nations:
+            if uid not in store.cold and uid not in store.loaded:
+                # Created or loaded from a non-indexed file since the last save
+                store.loaded[uid] = None
+        for uid in store.evictable():
+            del store.loaded[uid]
+            nation = self.nations.get(uid)
+            if nation is not None:
+                for field in COLD_FIELDS:
+                    nation.pop(field, None)
+                store.cold.add(uid)
+
+    def peek_resource(self, uid: str, key: str) -> float:
+        # Current value of an economy field without checking the nation out
+        nation = self.nations[uid]
+        if self.economy is not None:
+            row = self.economy.rows.get(uid)
+            if row is not None and uid not in self.economy.detached:
+                return float(self.economy.values[row, RESOURCE_KEYS.index(key)])
+        elif self.lazy_accrual and nation.get("last_accrued_at") is not None:
+            elapsed = max(0.0, time.time() - nation["last_accrued_at"])
+            return min(nation.get(key, 0) + self.get_income(uid)[key] * elapsed, RESOURCE_CAPS[key])
+        return nation.get(key, 0)
+
+    def accrue(self, uid: str, now: Optional[float] = None) -> None:
+        nation = self.nations[uid]
+        if now is None:
+            now = time.time()
+        last = nation.get("last_accrued_at")
+        if last is not None and now <= last:
+            return
+        nation["last_accrued_at"] = now
+        if last is None:
+            return
+        elapsed = now - last
+        income = self.get_income(uid)
+        for key, cap in RESOURCE_CAPS.items():
+            nation[key] = min(nation.get(key, 0) + income[key] * elapsed, cap)
+
+    def settle_economy(self) -> None:
+        if self.economy is not None:
+            self.economy.flush()
+        elif self.lazy_accrual:
+            now = time.time()
+            for uid in self.nations:
+                self.accrue(uid, now)
+
+    def get_income(self, uid: str) -> dict:
+        income = self.income_cache.get(uid)
+        if income is None:
+            income = self.calculate_passive_income(self.nations[uid])
+            self.income_cache[uid] = income
+        elif INCOME_CACHE_DEBUG:
+            fresh = self.calculate_passive_income(self.nations[uid])
+            if fresh != income:
+                print(f"Stale income cache for {uid}: cached {income}, actual {fresh}")
+                self.income_cache[uid] = income = fresh
+        return income
+
+    def invalidate_income(self, uid: str) -> None:
+        self.income_cache.pop(uid, None)
+
+    def snapshot_state(self) -> dict:
+        self.settle_economy()
+        return copy_json({
+            "nations": self.nations,
+            "alliances": self.alliances,
+            "wars": self.wars,
+            "trade_offers": self.trade_offers,
+            "map_seed": self.map_seed
+        })
+
+    def snapshot_changes(self) -> dict:
+        # Copies the dirty nations and the small tables; serializing them and
+        # diffing the tables against the last save happen in the save thread.
+        # Lazy accrual needs no settling here: stored values plus last_accrued_at
+        # already describe every nation that is not rewritten.
+        if self.economy is not None:
+            self.economy.flush()
+            self.all_nations_dirty = True
+        uids = self.nations if self.all_nations_dirty else [uid for uid in self.dirty_nations if uid in self.nations]
+        snapshot = copy_json({
+            "nations": {uid: self.nations[uid] for uid in uids},
+            "alliances": self.alliances,
+            "wars": self.wars,
+            "trade_offers": self.trade_offers,
+            "map_seed": self.map_seed
+        })
+        snapshot["fingerprints"] = self.table_fingerprints
+        self.dirty_nations.clear()
+        self.all_nations_dirty = False
+        return snapshot
+
+    def prepare_save(self):
+        if STORAGE_BACKEND == "sqlite":
+            return write_sqlite_snapshot, self.world_path(SQLITE_FILE), self.snapshot_changes()
+        if self.journal is not None:
+            journal_seq = self.journal.rotate()
+            snapshot = self.snapshot_state()
+            snapshot["journal_seq"] = journal_seq
+        else:
+            snapshot = self.snapshot_state()
+        if self.cold_store is not None:
+            snapshot["military"] = copy_json(self.military)
+            self.cold_store.begin_save(snapshot)
+            return write_indexed_file, self.world_path(SNAPSHOT_FILE), snapshot
+        return write_data_file, self.world_path(SNAPSHOT_FILE), snapshot
+
+    def after_save(self, snapshot: dict, written=None) -> None:
+        if STORAGE_BACKEND == "sqlite":
+            self.table_fingerprints = written
+            return
+        if self.journal is not None:
+            removed = self.journal.drop_through(snapshot["journal_seq"])
+            print(f"Compacted {removed:,} journal bytes into snapshot at seq {snapshot['journal_seq']}")
+        if self.cold_store is not None and written is not None:
+            self.cold_store.attach(self.world_path(SNAPSHOT_FILE), *written)
+            self.evict_cold_nations()
+
     def save_data(self) -> None:
+        # With the journal enabled every mutation is already durable in the log and
+        # snapshots are only written by the compactor.
+        if self.journal is not None:
+            return
+        self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        # Saves are coalesced: the worker snapshots the state on the event loop and
+        # serializes it in a thread, picking up any save requested meanwhile.
         try:
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump({
-                    "nations": self.nations,
-                    "alliances": self.alliances,
-                    "wars": self.wars,
-                    "trade_offers": self.trade_offers
-                }, f, indent=4)
-        except Exception as e:
-            print(f"Failed saving: {e}")
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            archive = self.take_history_pending()
+            try:
+                with self.save_seconds.time(self.world_labels()):
+                    writer, path, snapshot = self.prepare_save()
+                    write_history_archive(self.world_path(HISTORY_ARCHIVE_DIR), archive)
+                    written = writer(path, snapshot)
+                    self.after_save(snapshot, written)
+                self.saves.inc(labels=self.world_labels(result="ok"))
+            except Exception as e:
+                self.saves.inc(labels=self.world_labels(result="failed"))
+                self.save_failed(archive)
+                print(f"Failed saving: {e}")
+            return
+        self._save_requested = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save_worker())
+
+    async def _save_worker(self) -> bool:
+        # Returns whether the last save it ran succeeded
+        saved = True
+        while self._save_requested:
+            self._save_requested = False
+            archive = self.take_history_pending()
+            try:
+                with self.save_seconds.time(self.world_labels()):
+                    writer, path, snapshot = self.prepare_save()
+                    # Archive first: a snapshot must never count entries that are not on disk
+                    await asyncio.to_thread(write_history_archive, self.world_path(HISTORY_ARCHIVE_DIR), archive)
+                    written = await asyncio.to_thread(writer, path, snapshot)
+                    self.after_save(snapshot, written)
+                self.saves.inc(labels=self.world_labels(result="ok"))
+                saved = True
+            except asyncio.CancelledError:
+                # Shutting down mid-save; whatever prepare_save took is written next time
+                self.save_failed(archive)
+                raise
+            except Exception as e:
+                self.saves.inc(labels=self.world_labels(result="failed"))
+                self.save_failed(archive)
+                print(f"Failed saving: {e}")
+                saved = False
+        return saved
+
+    def save_failed(self, archive: Dict[str, list]) -> None:
+        # The dirty set was consumed by the failed write, so rewrite everything next time
+        self.all_nations_dirty = True
+        self.table_fingerprints = {}
+        for uid, (start, entries) in archive.items():
+            if uid in self.history_pending:
+                entries = entries + self.history_pending[uid][1]
+            self.history_pending[uid] = [start, entries]
+
+    def post_log(self, text: str, priority: int = LOG_NORMAL) -> None:
+        self.log_dispatcher.post(text, priority)
+
+    async def close(self) -> None:
+        flush_logs = self.log_flush_loop.is_running()
+        if flush_logs:
+            self.log_flush_loop.cancel()
+        for world in list(self.worlds.values()):
+            with self.use_world(world):
+                if flush_logs:
+                    await self.log_dispatcher.flush(self.get_channel(world.log_channel_id or 0))
+                if self.journal is not None:
+                    self.write_snapshot()
+                if self._save_task is not None and not self._save_task.done():
+                    await self._save_task
+                if self.journal is not None:
+                    self.journal.close()
+                if self.cold_store is not None:
+                    self.cold_store.close()
+        if self.map_pool is not None:
+            self.map_pool.shutdown(wait=False)
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        await super().close()
 
     def calculate_passive_income(self, nation: dict) -> dict:
         base_resources = 1
@@ -362,81 +2444,165 @@ class PaxHistoriaBot(commands.Bot):
             "population": (base_population * territory_mult * pop_mult) + building_population
         }
 
+    def apply_income_tick(self, steps: int = 1, skip: frozenset = frozenset()) -> None:
+        # Capping once after `steps` ticks matches capping after every tick
+        for user_id, nation in self.nations.items():
+            if user_id in skip:
+                continue
+            income = self.get_income(user_id)
+            for key, cap in RESOURCE_CAPS.items():
+                nation[key] = min(nation.get(key, 0) + income[key] * steps, cap)
+
+    def advance_economy(self, steps: int) -> None:
+        # Nations inside a transaction are paid when it ends (see pay_deferred),
+        # so a handler that awaits between a read and a write keeps the tick
+        held = self.nation_locks.held()
+        if not self.lazy_accrual:
+            for uid in held:
+                self.owed_ticks[uid] = self.owed_ticks.get(uid, 0) + steps
+        if self.economy is not None:
+            self.economy.tick(steps, held)
+        elif not self.lazy_accrual:
+            self.apply_income_tick(steps, held)
+            self.all_nations_dirty = True
+        if self.journal is not None and not self.lazy_accrual:
+            self.journal.append({"op": "tick", "steps": steps} if steps != 1 else {"op": "tick"})
+
     @tasks.loop(seconds=1)
+    @instrumented_loop("real_time_growth")
     async def real_time_growth_loop(self) -> None:
-        for user_id, nation in self.nations.items():
-            income = self.calculate_passive_income(nation)
-
-            nation["resources"] = min(nation.get("resources", 0) + income["resources"], 999999)
-            nation["manpower"] = min(nation.get("manpower", 0) + income["manpower"], 999999)
-            nation["research_points"] = min(nation.get("research_points", 0) + income["research_points"], 99999)
-            nation["political_points"] = min(nation.get("political_points", 0) + income["political_points"], 99999)
-            nation["population"] = min(nation.get("population", 0) + income["population"], 9999999)
-
-        if not hasattr(self, '_save_counter'):
-            self._save_counter = 0
-        self._save_counter += 1
-        if self._save_counter >= 30:
+        # Income follows measured time rather than the number of iterations
+        now = time.monotonic()
+        steps = self.economy_clock.advance(now)
+        if self.economy_clock.elapsed:
+            self.tick_lag.observe(max(0.0, self.economy_clock.elapsed - TICK_SECONDS), self.world_labels())
+        if steps:
+            self.advance_economy(steps)
+            self.tick_steps.inc(steps, self.world_labels())
+            self.tick_catchup.inc(steps - 1, self.world_labels())
+        self.count_processed("real_time_growth", 0 if self.lazy_accrual or not steps else len(self.nations))
+
+        if self.save_clock.advance(now):
+            self.rebuild_leaderboards()
             self.save_data()
-            self._save_counter = 0
 
-    @tasks.loop(minutes=5)
+    @tasks.loop(seconds=UPKEEP_SECONDS)
+    @instrumented_loop("passive_growth")
     async def passive_growth_loop(self) -> None:
-        log_channel = self.get_channel(LOG_CHANNEL_ID)
-        for user_id, nation in self.nations.items():
-            total_upkeep = sum(
-                ALL_UNITS.get(unit, {}).get("upkeep", 0) * qty
-                for unit, qty in nation.get("units", {}).items()
-            )
-
-            if "Advanced Logistics" in nation.get("technologies", []):
-                total_upkeep = int(total_upkeep * 0.8)
+        # Nations inside a transaction pay when it ends, like deferred ticks
+        held = self.nation_locks.held()
+        for uid in held:
+            if uid in self.nations and self.upkeep_due(uid) > 0:
+                self.owed_upkeep[uid] = self.owed_upkeep.get(uid, 0) + 1
+        if self.economy is not None and self.journal is None:
+            # Paying nations are charged in one vectorized pass over the engine rows
+            to_settle = self.economy.charge("resources", self.upkeep_due, held)
+            self.all_nations_dirty = True
+        else:
+            to_settle = [uid for uid in self.nations if uid not in held and self.upkeep_due(uid) > 0]
+        self.count_processed("passive_growth", len(self.nations))
 
-            if total_upkeep > 0:
-                if nation["resources"] >= total_upkeep:
-                    nation["resources"] -= total_upkeep
-                else:
-                    shortfall = total_upkeep - nation["resources"]
-                    nation["resources"] = 0
-                    fraction_unpaid = shortfall / total_upkeep
-                    for unit_name in list(nation.get("units", {}).keys()):
-                        qty = nation["units"][unit_name]
-                        to_remove = max(1, int(qty * fraction_unpaid * 0.5))
-                        if to_remove > 0:
-                            nation["units"][unit_name] = max(0, qty - to_remove)
-                            if unit_name in ALL_UNITS:
-                                nation["military_power"] = max(0, nation["military_power"] - ALL_UNITS[unit_name][
-                                    "power"] * to_remove)
+        for user_id in to_settle:
+            self.charge_upkeep(user_id)
         self.save_data()
 
+    def charge_upkeep(self, uid: str) -> None:
+        nation = self.get_nation(uid, hydrate=False)
+        total_upkeep = self.upkeep_due(uid)
+        if nation["resources"] >= total_upkeep:
+            nation["resources"] -= total_upkeep
+        else:
+            shortfall = total_upkeep - nation["resources"]
+            nation["resources"] = 0
+            self.disband_unpaid(uid, shortfall / total_upkeep)
+        self.record("upkeep", uid, "units", "military_power")
+
+    def pay_deferred(self, uid: str) -> None:
+        # Settles the ticks and upkeep passes that skipped uid during a transaction
+        steps = self.owed_ticks.pop(uid, 0)
+        periods = self.owed_upkeep.pop(uid, 0)
+        if uid not in self.nations or not (steps or periods):
+            return
+        nation = self.get_nation(uid, hydrate=False)
+        if steps:
+            income = self.get_income(uid)
+            for key, cap in RESOURCE_CAPS.items():
+                nation[key] = min(nation.get(key, 0) + income[key] * steps, cap)
+            self.record("deferred_ticks", uid, "resources")
+        for _ in range(periods):
+            if self.upkeep_due(uid) > 0:
+                self.charge_upkeep(uid)
+
+    def disband_unpaid(self, uid: str, fraction_unpaid: float) -> None:
+        # Units leave in proportion to the share of upkeep that went unpaid
+        for unit_name, qty in list(self.hydrate(uid).get("units", {}).items()):
+            if unit_name in ALL_UNITS:
+                self.change_units(uid, unit_name, -max(1, int(qty * fraction_unpaid * 0.5)))
+
     @tasks.loop(minutes=10)
+    @instrumented_loop("random_events")
     async def random_events_loop(self) -> None:
-        log_channel = self.get_channel(LOG_CHANNEL_ID)
-        for user_id, nation in self.nations.items():
-            for event in RANDOM_EVENTS:
-                if random.random() < event["chance"]:
-                    effect = event["effect"]
-                    value = event["value"]
-                    if effect in nation:
-                        nation[effect] = max(0, nation[effect] + value)
-                        symbol = "🎉" if value > 0 else "⚠️"
-                        message = f"{symbol} **{nation['name']}** - **{event['name']}**!"
-                        nation["history"].append(message)
-                        if log_channel:
-                            try:
-                                await log_channel.send(message)
-                            except:
-                                pass
-                    break
-        self.save_data()
+        self.event_window += 1
+        due_nations = self.pop_due_events()
+        self.count_processed("random_events", len(due_nations))
+        for user_id in due_nations:
+            nation = self.get_nation(user_id)
+            event = sample_event()
+            effect = event["effect"]
+            value = event["value"]
+            if effect in nation:
+                nation[effect] = max(0, nation[effect] + value)
+                symbol = "🎉" if value > 0 else "⚠️"
+                message = f"{symbol} **{nation['name']}** - **{event['name']}**!"
+                self.push_history(user_id, message)
+                self.record("random_event", user_id, effect, history=message)
+                self.post_log(message, LOG_LOW)
+        if due_nations:
+            self.save_data()
+
+    @tasks.loop(seconds=LOG_FLUSH_SECONDS)
+    async def log_flush_loop(self) -> None:
+        for world in list(self.worlds.values()):
+            with self.use_world(world):
+                await self.log_dispatcher.flush(self.get_channel(world.log_channel_id or 0))
+
+    @tasks.loop(seconds=JOURNAL_COMPACT_SECONDS)
+    async def journal_compaction_loop(self) -> None:
+        for world in list(self.worlds.values()):
+            with self.use_world(world):
+                self.write_snapshot()
+
+    @tasks.loop(minutes=1)
+    async def world_maintenance_loop(self) -> None:
+        now = time.monotonic()
+        for world in list(self.worlds.values()):
+            guild = {"guild": str(world.guild_id)}
+            sample = list(islice(world.nations.values(), 50))
+            per_nation = sum(estimate_size(nation) for nation in sample) / len(sample) if sample else 0
+            self.world_nations.set(len(world.nations), guild)
+            self.world_memory.set(int(per_nation * len(world.nations)), guild)
+            if MULTI_GUILD and world.guild_id != GUILD_ID and now - world.last_active > WORLD_IDLE_SECONDS:
+                if await self.evict_world(world):
+                    self.world_nations.remove(guild)
+                    self.world_memory.remove(guild)
 
     @real_time_growth_loop.before_loop
     @passive_growth_loop.before_loop
     @random_events_loop.before_loop
+    @journal_compaction_loop.before_loop
+    @log_flush_loop.before_loop
+    @world_maintenance_loop.before_loop
     async def before_loops(self) -> None:
         await self.wait_until_ready()
 
 
+def _world_attribute(name: str) -> property:
+    return property(lambda self: getattr(self.world, name), lambda self, value: setattr(self.world, name, value))
+
+
+for _name in WORLD_ATTRIBUTES:
+    setattr(PaxHistoriaBot, _name, _world_attribute(_name))
+
 bot = PaxHistoriaBot()
 
 
@@ -452,52 +2618,101 @@ def has_nation():
     return app_commands.check(predicate)
 
 
-def append_history(user_id: str, text: str, major: bool = False) -> None:
-    bot.nations[user_id]["history"].append(text)
-    if major:
-        log_channel = bot.get_channel(LOG_CHANNEL_ID)
-        if log_channel:
+def is_admin():
+    # default_permissions is only a default that guild admins can override
+    async def predicate(interaction: Interaction) -> bool:
+        permissions = getattr(interaction.user, "guild_permissions", None)
+        if permissions is None or not permissions.administrator:
+            await interaction.response.send_message("❌ Administrators only", ephemeral=True)
+            return False
+        return True
+
+    return app_commands.check(predicate)
+
+
+def nation_transaction(*resolvers):
+    # Runs the handler as a transaction on the caller's nation plus the nations
+    # named by resolvers, each a function of the handler's keyword arguments.
+    # Handlers must not await between a balance check and the mutation it guards.
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(interaction: Interaction, *args, **kwargs):
+            def involved() -> List[str]:
+                return [str(interaction.user.id)] + [resolver(kwargs) for resolver in resolvers]
+
+            while True:
+                uids = involved()
+                held = await bot.nation_locks.acquire(uids)
+                # A resolver may name someone else once we got the locks (e.g. a
+                # region changed hands while we queued); start over if so
+                if involved() == uids:
+                    break
+                bot.nation_locks.release(held)
             try:
-                bot.loop.create_task(log_channel.send(text))
-            except:
-                pass
+                for uid in held:
+                    if uid in bot.nations:
+                        bot.get_nation(uid)
+                return await func(interaction, *args, **kwargs)
+            finally:
+                for uid in held:
+                    bot.pay_deferred(uid)
+                bot.nation_locks.release(held)
+
+        return wrapper
+
+    return decorator
+
+
+def target_nation(kwargs: dict) -> Optional[str]:
+    target = kwargs.get("target_user")
+    return str(target.id) if target is not None else None
+
+
+def region_owner(kwargs: dict) -> Optional[str]:
+    return bot.region_owners.get(kwargs.get("region_name"))
+
+
+def append_history(user_id: str, text: str, major: bool = False, priority: int = LOG_NORMAL) -> None:
+    bot.push_history(user_id, text)
+    bot.record("history", user_id, history=text)
+    if major:
+        bot.post_log(text, priority)
 
 
 def calculate_military_by_type(nation: dict) -> dict:
-    ground, naval, air = 0, 0, 0
+    # Full recount from the unit roster; the bot keeps these totals in its ledger
+    forces = {domain: 0 for domain in MILITARY_DOMAINS}
+    upkeep = 0
     for unit_name, qty in nation.get("units", {}).items():
         if unit_name in ALL_UNITS:
             unit = ALL_UNITS[unit_name]
-            power = unit["power"] * qty
-            utype = unit.get("type", "ground")
-            if utype == "naval":
-                naval += power
-            elif utype == "air":
-                air += power
-            else:
-                ground += power
-    return {"ground": ground, "naval": naval, "air": air, "total": ground + naval + air}
+            forces[unit.get("type", "ground")] += unit["power"] * qty
+            upkeep += unit["upkeep"] * qty
+    forces["total"] = sum(forces.values())
+    forces["upkeep"] = upkeep
+    return forces
 
 
-def generate_world_map():
+def generate_world_map(seed: Optional[int] = None):
+    rng = random.Random(seed)
     map_grid = [[TERRAIN_OCEAN for _ in range(MAP_WIDTH)] for _ in range(MAP_HEIGHT)]
 
     # Continents
     for y in range(3, 12):
         for x in range(5, 20):
-            if random.random() > 0.15:
+            if rng.random() > 0.15:
                 map_grid[y][x] = TERRAIN_LAND
     for y in range(2, 14):
         for x in range(30, 48):
-            if random.random() > 0.15:
+            if rng.random() > 0.15:
                 map_grid[y][x] = TERRAIN_LAND
     for y in range(15, 28):
         for x in range(3, 18):
-            if random.random() > 0.15:
+            if rng.random() > 0.15:
                 map_grid[y][x] = TERRAIN_LAND
     for y in range(18, 28):
         for x in range(35, 48):
-            if random.random() > 0.15:
+            if rng.random() > 0.15:
                 map_grid[y][x] = TERRAIN_LAND
 
     # Mountains
@@ -519,13 +2734,42 @@ def generate_world_map():
     return map_grid
 
 
-def render_map_with_nations(map_grid, nations_data):
-    nation_symbols = "🔴🔵🟢🟡🟣🟠🟤⚫⚪"
+def compile_region_cells(map_grid) -> Dict[str, List[tuple]]:
+    # Land cells inside a region's square; a cell covered by several squares goes
+    # to the region with the nearest center (earlier WORLD_REGIONS entry on ties).
+    claims = {}
+    for region_name, region in WORLD_REGIONS.items():
+        x, y = region["coordinates"]
+        size = region["size"]
+        for dy in range(-size, size + 1):
+            for dx in range(-size, size + 1):
+                ny, nx = y + dy, x + dx
+                if 0 <= ny < MAP_HEIGHT and 0 <= nx < MAP_WIDTH and map_grid[ny][nx] != TERRAIN_OCEAN:
+                    distance = dx * dx + dy * dy
+                    if (ny, nx) not in claims or distance < claims[(ny, nx)][0]:
+                        claims[(ny, nx)] = (distance, region_name)
+    region_cells = {region_name: [] for region_name in WORLD_REGIONS}
+    for cell, (_, region_name) in claims.items():
+        region_cells[region_name].append(cell)
+    return region_cells
+
+
+def format_map(display_map) -> str:
+    map_str = "```\n" + "═" * (MAP_WIDTH + 2) + "\n"
+    for row in display_map:
+        map_str += "║" + "".join(row) + "║\n"
+    map_str += "═" * (MAP_WIDTH + 2) + "\n```"
+    return map_str
+
+
+def render_map_with_nations(map_grid, nations_data, region_cells=None):
+    if region_cells is None:
+        region_cells = compile_region_cells(map_grid)
     nation_to_symbol = {}
     idx = 0
     for uid, nation in nations_data.items():
         if nation.get("territories"):
-            nation_to_symbol[uid] = nation_symbols[idx % len(nation_symbols)]
+            nation_to_symbol[uid] = NATION_SYMBOLS[idx % len(NATION_SYMBOLS)]
             idx += 1
 
     display_map = [row[:] for row in map_grid]
@@ -533,21 +2777,10 @@ def render_map_with_nations(map_grid, nations_data):
         if uid in nation_to_symbol:
             symbol = nation_to_symbol[uid]
             for region_name in nation.get("territories", []):
-                if region_name in WORLD_REGIONS:
-                    region = WORLD_REGIONS[region_name]
-                    x, y = region["coordinates"]
-                    size = region["size"]
-                    for dy in range(-size, size + 1):
-                        for dx in range(-size, size + 1):
-                            ny, nx = y + dy, x + dx
-                            if 0 <= ny < MAP_HEIGHT and 0 <= nx < MAP_WIDTH and display_map[ny][nx] != TERRAIN_OCEAN:
-                                display_map[ny][nx] = symbol
+                for ny, nx in region_cells.get(region_name, ()):
+                    display_map[ny][nx] = symbol
 
-    map_str = "```\n" + "═" * (MAP_WIDTH + 2) + "\n"
-    for row in display_map:
-        map_str += "║" + "".join(row) + "║\n"
-    map_str += "═" * (MAP_WIDTH + 2) + "\n```"
-    return map_str, nation_to_symbol
+    return format_map(display_map), nation_to_symbol
 
 
 # PASTE THIS AFTER THE HELPERS IN YOUR MAIN FILE
@@ -555,6 +2788,7 @@ def render_map_with_nations(map_grid, nations_data):
 # ---------------- NATION MANAGEMENT ----------------
 @bot.tree.command(name="create_nation", description="Create your nation")
 @app_commands.describe(nation_name="Name for your nation")
+@nation_transaction()
 async def create_nation(interaction: Interaction, nation_name: str):
     uid = str(interaction.user.id)
     if uid in bot.nations:
@@ -568,7 +2802,7 @@ async def create_nation(interaction: Interaction, nation_name: str):
         "manpower": 50,
         "research_points": 0,
         "political_points": 0,
-        "military_power": 50,
+        "military_power": BASE_MILITARY_POWER,
         "territory": 1,
         "territories": [],
         "infrastructure": {},
@@ -578,6 +2812,13 @@ async def create_nation(interaction: Interaction, nation_name: str):
         "alliance": None,
         "history": [f"Nation created: {nation_name}"]
     }
+    if bot.lazy_accrual:
+        bot.nations[uid]["last_accrued_at"] = time.time()
+    bot.dirty_nations.add(uid)
+    bot.leaderboard_dirty.add(uid)
+    bot.record("create_nation", uid, *bot.nations[uid])
+    bot.military[uid] = calculate_military_by_type(bot.nations[uid])
+    bot.schedule_event(uid)
     bot.save_data()
 
     embed = discord.Embed(title=f"🏛️ {nation_name} Founded!", color=discord.Color.green())
@@ -586,20 +2827,15 @@ async def create_nation(interaction: Interaction, nation_name: str):
     embed.add_field(name="🪖 Manpower", value="50", inline=True)
     await interaction.response.send_message(embed=embed)
 
-    log_ch = bot.get_channel(LOG_CHANNEL_ID)
-    if log_ch:
-        try:
-            await log_ch.send(f"🗺️ New nation: **{nation_name}**")
-        except:
-            pass
+    bot.post_log(f"🗺️ New nation: **{nation_name}**")
 
 
 @bot.tree.command(name="nation_status", description="View your nation")
 @has_nation()
 async def nation_status(interaction: Interaction):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
-    income = bot.calculate_passive_income(nation)
+    nation = bot.get_nation(uid)
+    income = bot.get_income(uid)
 
     embed = discord.Embed(title=f"🏛️ {nation['name']}", color=discord.Color.blue())
     embed.add_field(name="👥 Population", value=f"{int(nation['population']):,} (+{income['population']:.1f}/s)",
@@ -621,9 +2857,10 @@ async def nation_status(interaction: Interaction):
 @bot.tree.command(name="train_units", description="Train ground units")
 @app_commands.describe(unit_type="Type of unit", quantity="Number to train")
 @has_nation()
+@nation_transaction()
 async def train_units(interaction: Interaction, unit_type: str, quantity: int):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     if unit_type not in GROUND_UNITS:
         await interaction.response.send_message("❌ Invalid unit. Use `/list_units`", ephemeral=True)
@@ -639,12 +2876,10 @@ async def train_units(interaction: Interaction, unit_type: str, quantity: int):
 
     nation["resources"] -= total_cost
     nation["manpower"] -= total_manpower
-    nation["units"][unit_type] = nation["units"].get(unit_type, 0) + quantity
-
-    power_gain = unit_info["power"] * quantity
-    if "Military Tactics" in nation.get("technologies", []):
-        power_gain = int(power_gain * 1.2)
-    nation["military_power"] += power_gain
+    power_before = nation["military_power"]
+    bot.change_units(uid, unit_type, quantity)
+    power_gain = nation["military_power"] - power_before
+    bot.record("train_units", uid, "units", "military_power")
 
     append_history(uid, f"⚔️ Trained {quantity}x {unit_type}")
     bot.save_data()
@@ -668,9 +2903,10 @@ async def list_units(interaction: Interaction):
 @bot.tree.command(name="train_naval_units", description="Train naval units (requires Naval Base)")
 @app_commands.describe(unit_type="Naval unit", quantity="Number", region="Region with naval base")
 @has_nation()
+@nation_transaction()
 async def train_naval_units(interaction: Interaction, unit_type: str, quantity: int, region: str):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     if unit_type not in NAVAL_UNITS:
         await interaction.response.send_message("❌ Invalid naval unit", ephemeral=True)
@@ -690,8 +2926,8 @@ async def train_naval_units(interaction: Interaction, unit_type: str, quantity:
 
     nation["resources"] -= total_cost
     nation["manpower"] -= total_manpower
-    nation["units"][unit_type] = nation["units"].get(unit_type, 0) + quantity
-    nation["military_power"] += unit_info["power"] * quantity
+    bot.change_units(uid, unit_type, quantity)
+    bot.record("train_naval_units", uid, "units", "military_power")
 
     append_history(uid, f"🚢 Deployed {quantity}x {unit_type}")
     bot.save_data()
@@ -711,9 +2947,10 @@ async def list_naval_units(interaction: Interaction):
 @bot.tree.command(name="train_air_units", description="Train aircraft (requires Airbase)")
 @app_commands.describe(unit_type="Aircraft type", quantity="Number", region="Region with airbase")
 @has_nation()
+@nation_transaction()
 async def train_air_units(interaction: Interaction, unit_type: str, quantity: int, region: str):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     if unit_type not in AIR_UNITS:
         await interaction.response.send_message("❌ Invalid air unit", ephemeral=True)
@@ -733,8 +2970,8 @@ async def train_air_units(interaction: Interaction, unit_type: str, quantity: in
 
     nation["resources"] -= total_cost
     nation["manpower"] -= total_manpower
-    nation["units"][unit_type] = nation["units"].get(unit_type, 0) + quantity
-    nation["military_power"] += unit_info["power"] * quantity
+    bot.change_units(uid, unit_type, quantity)
+    bot.record("train_air_units", uid, "units", "military_power")
 
     append_history(uid, f"✈️ Deployed {quantity}x {unit_type}")
     bot.save_data()
@@ -754,25 +2991,38 @@ async def list_air_units(interaction: Interaction):
 @has_nation()
 async def military_overview(interaction: Interaction):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
-    forces = calculate_military_by_type(nation)
+    nation = bot.get_nation(uid)
+    forces = bot.military_forces(uid)
 
     embed = discord.Embed(title=f"🎖️ {nation['name']} Military", color=discord.Color.blue())
     embed.add_field(name="🪖 Ground", value=f"{forces['ground']:,}", inline=True)
     embed.add_field(name="🚢 Naval", value=f"{forces['naval']:,}", inline=True)
     embed.add_field(name="✈️ Air", value=f"{forces['air']:,}", inline=True)
+    if forces["strategic"]:
+        embed.add_field(name="☢️ Strategic", value=f"{forces['strategic']:,}", inline=True)
     embed.add_field(name="⚔️ Total", value=f"{forces['total']:,}", inline=False)
+    embed.add_field(name="🛡️ Upkeep", value=f"{bot.upkeep_due(uid):,}/5min", inline=False)
 
     await interaction.response.send_message(embed=embed)
 
 
 # ---------------- WORLD MAP ----------------
 @bot.tree.command(name="view_map", description="View the world map")
-async def view_map(interaction: Interaction):
+@app_commands.describe(mode="emoji (default) or image")
+async def view_map(interaction: Interaction, mode: str = "emoji"):
     await interaction.response.defer()
 
-    world_map = generate_world_map()
-    map_display, nation_symbols = render_map_with_nations(world_map, bot.nations)
+    if mode == "image":
+        if map_image.Image is None:
+            await interaction.followup.send("❌ Image maps are not available (Pillow is not installed)")
+            return
+        png = await bot.render_map_image()
+        embed = discord.Embed(title="🌍 World Map", color=discord.Color.blue())
+        embed.set_image(url="attachment://world_map.png")
+        await interaction.followup.send(embed=embed, file=discord.File(io.BytesIO(png), filename="world_map.png"))
+        return
+
+    map_display, nation_symbols = bot.rendered_map()
 
     embed = discord.Embed(title="🌍 World Map", color=discord.Color.blue())
     embed.description = map_display
@@ -793,11 +3043,8 @@ async def list_regions(interaction: Interaction):
     embed = discord.Embed(title="🗺️ World Regions", color=discord.Color.green())
 
     for region_name, region_data in list(WORLD_REGIONS.items())[:10]:
-        owner = "Unclaimed"
-        for uid, nation in bot.nations.items():
-            if region_name in nation.get("territories", []):
-                owner = nation["name"]
-                break
+        owner_uid = bot.region_owners.get(region_name)
+        owner = bot.nations[owner_uid]["name"] if owner_uid is not None else "Unclaimed"
 
         embed.add_field(
             name=region_name,
@@ -811,9 +3058,10 @@ async def list_regions(interaction: Interaction):
 @bot.tree.command(name="invade_region", description="Capture a region")
 @app_commands.describe(region_name="Region to invade")
 @has_nation()
+@nation_transaction(region_owner)
 async def invade_region(interaction: Interaction, region_name: str):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     if region_name not in WORLD_REGIONS:
         await interaction.response.send_message("❌ Invalid region", ephemeral=True)
@@ -823,11 +3071,7 @@ async def invade_region(interaction: Interaction, region_name: str):
         await interaction.response.send_message("❌ Need 100+ military power", ephemeral=True)
         return
 
-    current_owner = None
-    for owner_uid, owner_nation in bot.nations.items():
-        if region_name in owner_nation.get("territories", []):
-            current_owner = owner_uid
-            break
+    current_owner = bot.region_owners.get(region_name)
 
     if current_owner is None:
         cost = 500
@@ -836,9 +3080,8 @@ async def invade_region(interaction: Interaction, region_name: str):
             return
 
         nation["resources"] -= cost
-        if "territories" not in nation:
-            nation["territories"] = []
-        nation["territories"].append(region_name)
+        bot.transfer_region(region_name, uid)
+        bot.record("claim_region", uid, "territories")
 
         append_history(uid, f"🗺️ Claimed {region_name}!", major=True)
         bot.save_data()
@@ -850,7 +3093,7 @@ async def invade_region(interaction: Interaction, region_name: str):
         await interaction.response.send_message("❌ Already own this", ephemeral=True)
         return
 
-    defender = bot.nations[current_owner]
+    defender = bot.get_nation(current_owner)
     region_data = WORLD_REGIONS[region_name]
 
     att_power = nation["military_power"]
@@ -860,25 +3103,24 @@ async def invade_region(interaction: Interaction, region_name: str):
     attacker_wins = random.random() < (att_power / total if total > 0 else 0.5)
 
     if attacker_wins:
-        defender["territories"].remove(region_name)
-        nation["territories"].append(region_name)
+        bot.transfer_region(region_name, uid)
 
-        att_losses = int(att_power * 0.15)
-        def_losses = int(def_power * 0.30)
-        nation["military_power"] = max(0, nation["military_power"] - att_losses)
-        defender["military_power"] = max(0, defender["military_power"] - def_losses)
+        bot.inflict_losses(uid, 0.15)
+        bot.inflict_losses(current_owner, 0.30 * region_data.get("bonus_value", 1.0))
+        bot.record("conquer_region", uid, "territories", "units", "military_power")
+        bot.record("lose_region", current_owner, "territories", "units", "military_power")
 
-        append_history(uid, f"⚔️ Conquered {region_name}!", major=True)
-        append_history(current_owner, f"💔 Lost {region_name}", major=True)
+        append_history(uid, f"⚔️ Conquered {region_name}!", major=True, priority=LOG_HIGH)
+        append_history(current_owner, f"💔 Lost {region_name}", major=True, priority=LOG_HIGH)
 
         await interaction.response.send_message(f"🎖️ **VICTORY!** Conquered **{region_name}**!")
     else:
-        att_losses = int(att_power * 0.35)
-        def_losses = int(def_power * 0.15)
-        nation["military_power"] = max(0, nation["military_power"] - att_losses)
-        defender["military_power"] = max(0, defender["military_power"] - def_losses)
+        bot.inflict_losses(uid, 0.35)
+        bot.inflict_losses(current_owner, 0.15 * region_data.get("bonus_value", 1.0))
+        bot.record("invasion_failed", uid, "units", "military_power")
+        bot.record("invasion_repelled", current_owner, "units", "military_power")
 
-        append_history(uid, f"💔 Failed to take {region_name}", major=True)
+        append_history(uid, f"💔 Failed to take {region_name}", major=True, priority=LOG_HIGH)
 
         await interaction.response.send_message(f"💔 **DEFEAT!** Failed to capture {region_name}")
 
@@ -889,7 +3131,7 @@ async def invade_region(interaction: Interaction, region_name: str):
 @has_nation()
 async def my_territories(interaction: Interaction):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
     territories = nation.get("territories", [])
 
     if not territories:
@@ -907,9 +3149,10 @@ async def my_territories(interaction: Interaction):
 @bot.tree.command(name="build_infrastructure", description="Build naval bases or airbases")
 @app_commands.describe(infra_type="Infrastructure type", region_name="Region to build in")
 @has_nation()
+@nation_transaction()
 async def build_infrastructure(interaction: Interaction, infra_type: str, region_name: str):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     if infra_type not in INFRASTRUCTURE:
         await interaction.response.send_message("❌ Invalid type", ephemeral=True)
@@ -937,6 +3180,7 @@ async def build_infrastructure(interaction: Interaction, infra_type: str, region
     if region_name not in nation["infrastructure"]:
         nation["infrastructure"][region_name] = []
     nation["infrastructure"][region_name].append(infra_type)
+    bot.record("build_infrastructure", uid, "infrastructure")
 
     append_history(uid, f"🏗️ Built {infra_type} in {region_name}!", major=True)
     bot.save_data()
@@ -947,9 +3191,89 @@ async def build_infrastructure(interaction: Interaction, infra_type: str, region
 # PASTE THIS AFTER PART 2 IN YOUR MAIN FILE
 
 # ---------------- FULL-SCALE WARFARE ----------------
+# Shared by /full_scale_war and /simulate_war. rolls holds one uniform draw per
+# phase (air, naval, ground): plain floats for a real battle, or NumPy arrays
+# for a batch of simulated ones, in which case every result is an array too.
+def _pick(flag, if_true, if_false):
+    if np is not None and isinstance(flag, np.ndarray):
+        return np.where(flag, if_true, if_false)
+    return if_true if flag else if_false
+
+
+def _trunc(value):
+    if np is not None and isinstance(value, np.ndarray):
+        return np.floor(value)
+    return int(value)
+
+
+def unit_losses(units: dict, fraction, domains: tuple, draw=random.random) -> dict:
+    # Whole units lost per type in those domains: qty * fraction rounded down, plus
+    # one more with probability equal to the remainder, so a single unit can still
+    # be lost and on average exactly qty * fraction are. fraction and draw() may be
+    # numpy arrays, one value per simulated battle.
+    losses = {}
+    for unit_name, qty in units.items():
+        unit = ALL_UNITS.get(unit_name)
+        if unit is None or unit.get("type", "ground") not in domains or qty <= 0:
+            continue
+        expected = qty * fraction
+        whole = _trunc(expected)
+        losses[unit_name] = whole + _pick(draw() < expected - whole, 1, 0)
+    return losses
+
+
+def resolve_battle(att: dict, dfn: dict, rolls) -> dict:
+    air_roll, naval_roll, ground_roll = rolls
+    outcome = {"air": None, "naval": None, "ground": None, "attacker_losses": [], "defender_losses": []}
+
+    # PHASE 1: AIR BATTLE
+    air_total = att["air"] + dfn["air"]
+    if air_total > 0:
+        won = air_roll < att["air"] / air_total
+        outcome["air"] = won
+        outcome["attacker_losses"].append((("air",), _pick(won, 0.10, 0.40)))
+        outcome["defender_losses"].append((("air",), _pick(won, 0.40, 0.10)))
+
+    # PHASE 2: NAVAL BATTLE
+    naval_total = att["naval"] + dfn["naval"]
+    if naval_total > 0:
+        won = naval_roll < att["naval"] / naval_total
+        outcome["naval"] = won
+        outcome["attacker_losses"].append((("naval",), _pick(won, 0.15, 0.35)))
+        outcome["defender_losses"].append((("naval",), _pick(won, 0.35, 0.15)))
+
+    # PHASE 3: GROUND BATTLE (strategic weapons back the ground assault)
+    ground_att = att["ground"] + att["strategic"]
+    ground_def = dfn["ground"] + dfn["strategic"]
+    if outcome["air"] is not None:
+        ground_att = _trunc(ground_att * _pick(outcome["air"], 1.25, 1.0))
+        ground_def = _trunc(ground_def * _pick(outcome["air"], 1.0, 1.25))
+    if outcome["naval"] is not None:
+        ground_att = _trunc(ground_att * _pick(outcome["naval"], 1.15, 1.0))
+        ground_def = _trunc(ground_def * _pick(outcome["naval"], 1.0, 1.15))
+    # The bonuses never turn a non-zero total into zero, so the phase check can
+    # use the unmodified forces and stay a plain bool for simulated batches
+    if att["ground"] + att["strategic"] + dfn["ground"] + dfn["strategic"] > 0:
+        won = ground_roll < ground_att / (ground_att + ground_def)
+        outcome["ground"] = won
+        outcome["attacker_losses"].append((BATTLE_GROUND_DOMAINS, _pick(won, 0.20, 0.45)))
+        outcome["defender_losses"].append((BATTLE_GROUND_DOMAINS, _pick(won, 0.45, 0.20)))
+
+    phases_won = sum(won for won in (outcome["air"], outcome["naval"], outcome["ground"]) if won is not None)
+    outcome["victory"] = phases_won >= 2
+    return outcome
+
+
+def battle_plunder(defender: dict) -> tuple:
+    resources_plunder = min(int(defender["resources"]), int(defender["resources"] * 0.30) + 200)
+    pop_captured = min(int(defender["population"]), int(defender["population"] * 0.10))
+    return resources_plunder, pop_captured
+
+
 @bot.tree.command(name="full_scale_war", description="Launch combined arms assault")
 @app_commands.describe(target_user="Nation to attack")
 @has_nation()
+@nation_transaction(target_nation)
 async def full_scale_war(interaction: Interaction, target_user: discord.User):
     uid = str(interaction.user.id)
     target_uid = str(target_user.id)
@@ -958,116 +3282,54 @@ async def full_scale_war(interaction: Interaction, target_user: discord.User):
         await interaction.response.send_message("❌ Invalid target", ephemeral=True)
         return
 
-    attacker = bot.nations[uid]
-    defender = bot.nations[target_uid]
-
-    att_forces = calculate_military_by_type(attacker)
-    def_forces = calculate_military_by_type(defender)
-
-    if att_forces["total"] <= 0:
+    if bot.military_forces(uid)["total"] <= 0:
         await interaction.response.send_message("❌ No military!", ephemeral=True)
         return
 
     await interaction.response.defer()
+    attacker = bot.get_nation(uid)
+    defender = bot.get_nation(target_uid)
+    att_forces = bot.military_forces(uid)
+    def_forces = bot.military_forces(target_uid)
 
     embed = discord.Embed(title="⚔️ FULL-SCALE WAR!", color=discord.Color.red())
     embed.description = f"**{attacker['name']}** vs **{defender['name']}**"
 
-    battle_log = []
-    total_att_losses = 0
-    total_def_losses = 0
-
-    # PHASE 1: AIR BATTLE
-    air_winner = None
-    if att_forces["air"] > 0 or def_forces["air"] > 0:
-        air_total = att_forces["air"] + def_forces["air"]
-        if air_total > 0:
-            att_air_chance = att_forces["air"] / air_total
-            if random.random() < att_air_chance:
-                air_winner = "attacker"
-                att_losses = int(att_forces["air"] * 0.10)
-                def_losses = int(def_forces["air"] * 0.40)
-                battle_log.append(f"✈️ **AIR SUPERIORITY**: {attacker['name']}!")
-            else:
-                air_winner = "defender"
-                att_losses = int(att_forces["air"] * 0.40)
-                def_losses = int(def_forces["air"] * 0.10)
-                battle_log.append(f"✈️ **AIR SUPERIORITY**: {defender['name']}!")
-
-            total_att_losses += att_losses
-            total_def_losses += def_losses
-            battle_log.append(f"   Losses: {att_losses:,} vs {def_losses:,}")
-
-    # PHASE 2: NAVAL BATTLE
-    naval_winner = None
-    if att_forces["naval"] > 0 or def_forces["naval"] > 0:
-        naval_total = att_forces["naval"] + def_forces["naval"]
-        if naval_total > 0:
-            att_naval_chance = att_forces["naval"] / naval_total
-            if random.random() < att_naval_chance:
-                naval_winner = "attacker"
-                att_losses = int(att_forces["naval"] * 0.15)
-                def_losses = int(def_forces["naval"] * 0.35)
-                battle_log.append(f"\n🚢 **NAVAL DOMINANCE**: {attacker['name']}!")
-            else:
-                naval_winner = "defender"
-                att_losses = int(att_forces["naval"] * 0.35)
-                def_losses = int(def_forces["naval"] * 0.15)
-                battle_log.append(f"\n🚢 **NAVAL DOMINANCE**: {defender['name']}!")
-
-            total_att_losses += att_losses
-            total_def_losses += def_losses
-            battle_log.append(f"   Losses: {att_losses:,} vs {def_losses:,}")
-
-    # PHASE 3: GROUND BATTLE
-    ground_att = att_forces["ground"]
-    ground_def = def_forces["ground"]
+    outcome = resolve_battle(att_forces, def_forces, [random.random() for _ in range(3)])
+    phase_losses = [
+        (bot.inflict_losses(uid, att_fraction, domains), bot.inflict_losses(target_uid, def_fraction, domains))
+        for (domains, att_fraction), (_, def_fraction) in zip(outcome["attacker_losses"], outcome["defender_losses"])
+    ]
+    total_att_losses = sum(att for att, _ in phase_losses)
+    total_def_losses = sum(dfn for _, dfn in phase_losses)
+    phase_losses = iter(phase_losses)
 
-    if air_winner == "attacker":
-        ground_att = int(ground_att * 1.25)
+    battle_log = []
+    if outcome["air"] is not None:
+        battle_log.append(f"✈️ **AIR SUPERIORITY**: {attacker['name'] if outcome['air'] else defender['name']}!")
+        battle_log.append("   Losses: {:,} vs {:,}".format(*next(phase_losses)))
+    if outcome["naval"] is not None:
+        battle_log.append(f"\n🚢 **NAVAL DOMINANCE**: {attacker['name'] if outcome['naval'] else defender['name']}!")
+        battle_log.append("   Losses: {:,} vs {:,}".format(*next(phase_losses)))
+
+    if outcome["air"] is True:
         battle_log.append(f"\n🎯 Air superiority: +25% attacker power!")
-    elif air_winner == "defender":
-        ground_def = int(ground_def * 1.25)
+    elif outcome["air"] is False:
         battle_log.append(f"\n🎯 Air superiority: +25% defender power!")
-
-    if naval_winner == "attacker":
-        ground_att = int(ground_att * 1.15)
+    if outcome["naval"] is True:
         battle_log.append(f"🌊 Naval support: +15% attacker power!")
-    elif naval_winner == "defender":
-        ground_def = int(ground_def * 1.15)
+    elif outcome["naval"] is False:
         battle_log.append(f"🌊 Coastal defense: +15% defender power!")
 
-    ground_total = ground_att + ground_def
-    ground_winner = None
-
-    if ground_total > 0:
-        if random.random() < (ground_att / ground_total):
-            ground_winner = "attacker"
-            att_losses = int(att_forces["ground"] * 0.20)
-            def_losses = int(def_forces["ground"] * 0.45)
+    if outcome["ground"] is not None:
+        if outcome["ground"]:
             battle_log.append(f"\n🪖 **GROUND VICTORY**: {attacker['name']}!")
         else:
-            ground_winner = "defender"
-            att_losses = int(att_forces["ground"] * 0.45)
-            def_losses = int(def_forces["ground"] * 0.20)
             battle_log.append(f"\n🪖 **GROUND DEFENSE**: {defender['name']} holds!")
+        battle_log.append("   Losses: {:,} vs {:,}".format(*next(phase_losses)))
 
-        total_att_losses += att_losses
-        total_def_losses += def_losses
-        battle_log.append(f"   Losses: {att_losses:,} vs {def_losses:,}")
-
-    attacker["military_power"] = max(0, attacker["military_power"] - total_att_losses)
-    defender["military_power"] = max(0, defender["military_power"] - total_def_losses)
-
-    phases_won = sum([
-        1 if air_winner == "attacker" else 0,
-        1 if naval_winner == "attacker" else 0,
-        1 if ground_winner == "attacker" else 0
-    ])
-
-    if phases_won >= 2:
-        resources_plunder = min(int(defender["resources"]), int(defender["resources"] * 0.30) + 200)
-        pop_captured = min(int(defender["population"]), int(defender["population"] * 0.10))
+    if outcome["victory"]:
+        resources_plunder, pop_captured = battle_plunder(defender)
 
         attacker["resources"] += resources_plunder
         attacker["population"] += pop_captured
@@ -1081,7 +3343,10 @@ async def full_scale_war(interaction: Interaction, target_user: discord.User):
         embed.color = discord.Color.red()
         embed.title = "💔 DEFEAT!"
 
-    embed.add_field(name="Battle Report", value="\n".join(battle_log), inline=False)
+    bot.record("war_attack", uid, "units", "military_power")
+    bot.record("war_defense", target_uid, "units", "military_power")
+
+    embed.add_field(name="Battle Report", value="\n".join(battle_log) or "No forces engaged", inline=False)
     embed.add_field(name="Total Casualties", value=f"Attacker: {total_att_losses:,}\nDefender: {total_def_losses:,}",
                     inline=False)
 
@@ -1089,13 +3354,78 @@ async def full_scale_war(interaction: Interaction, target_user: discord.User):
     await interaction.followup.send(embed=embed)
 
 
+@bot.tree.command(name="simulate_war", description="Preview the odds of a full-scale war")
+@app_commands.describe(target_user="Nation to attack", runs="Number of simulated battles (default 10,000)")
+@has_nation()
+async def simulate_war(interaction: Interaction, target_user: discord.User, runs: int = 10000):
+    uid = str(interaction.user.id)
+    target_uid = str(target_user.id)
+
+    if uid == target_uid or target_uid not in bot.nations:
+        await interaction.response.send_message("❌ Invalid target", ephemeral=True)
+        return
+    if np is None:
+        await interaction.response.send_message("❌ Simulations need numpy installed", ephemeral=True)
+        return
+
+    runs = max(1, min(runs, SIMULATION_MAX_RUNS))
+    # Reads only; nothing is marked dirty or journaled
+    att_forces = bot.military_forces(uid)
+    def_forces = bot.military_forces(target_uid)
+    if att_forces["total"] <= 0:
+        await interaction.response.send_message("❌ No military!", ephemeral=True)
+        return
+
+    rng = np.random.default_rng()
+    outcome = resolve_battle(att_forces, def_forces, rng.random((3, runs)))
+
+    def power_lost(units: dict, losses: list):
+        # Same whole-unit losses as inflict_losses(), drawn for every run
+        total = np.zeros(runs)
+        for domains, fraction in losses:
+            for unit_name, removed in unit_losses(units, fraction, domains, lambda: rng.random(runs)).items():
+                total += removed * ALL_UNITS[unit_name]["power"]
+        return total
+
+    att_losses = power_lost(bot.hydrate(uid).get("units", {}), outcome["attacker_losses"])
+    def_losses = power_lost(bot.hydrate(target_uid).get("units", {}), outcome["defender_losses"])
+    win_rate = float(np.mean(outcome["victory"]))
+    resources_plunder, pop_captured = battle_plunder({
+        "resources": bot.peek_resource(target_uid, "resources"),
+        "population": bot.peek_resource(target_uid, "population"),
+    })
+
+    def spread(values) -> str:
+        p10, p50, p90 = np.percentile(values, [10, 50, 90])
+        return f"{p50:,.0f} (10–90%: {p10:,.0f}–{p90:,.0f})"
+
+    embed = discord.Embed(
+        title="🎲 War Simulation",
+        description=f"**{bot.nations[uid]['name']}** vs **{bot.nations[target_uid]['name']}** over {runs:,} battles",
+        color=discord.Color.green() if win_rate >= 0.5 else discord.Color.red()
+    )
+    embed.add_field(name="Victory Chance", value=f"{win_rate:.1%}", inline=False)
+    for phase, label in (("air", "✈️ Air"), ("naval", "🚢 Naval"), ("ground", "🪖 Ground")):
+        if outcome[phase] is not None:
+            embed.add_field(name=label, value=f"{float(np.mean(outcome[phase])):.1%}", inline=True)
+    embed.add_field(name="Your Casualties", value=spread(att_losses), inline=False)
+    embed.add_field(name="Enemy Casualties", value=spread(def_losses), inline=False)
+    embed.add_field(
+        name="Expected Plunder",
+        value=f"💰 {win_rate * resources_plunder:,.0f}\n👥 {win_rate * pop_captured:,.0f}",
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
 # ---------------- TECHNOLOGY ----------------
 @bot.tree.command(name="research", description="Research technology")
 @app_commands.describe(tech_name="Technology to research")
 @has_nation()
+@nation_transaction()
 async def research(interaction: Interaction, tech_name: str):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     if tech_name not in TECHNOLOGIES:
         await interaction.response.send_message("❌ Invalid tech", ephemeral=True)
@@ -1124,6 +3454,9 @@ async def research(interaction: Interaction, tech_name: str):
     nation["research_points"] -= tech["cost_research"]
     nation["political_points"] -= tech["cost_political"]
     nation["technologies"].append(tech_name)
+    bot.invalidate_income(uid)
+    bot.sync_military_power(uid)
+    bot.record("research", uid, "technologies", "military_power")
 
     append_history(uid, f"🔬 Researched {tech_name}!", major=True)
     bot.save_data()
@@ -1138,7 +3471,7 @@ async def research(interaction: Interaction, tech_name: str):
 @has_nation()
 async def view_tech(interaction: Interaction):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     embed = discord.Embed(title="🔬 Technology Tree", color=discord.Color.purple())
 
@@ -1161,9 +3494,10 @@ async def view_tech(interaction: Interaction):
 @bot.tree.command(name="construct_building", description="Construct a building")
 @app_commands.describe(building_type="Type of building", quantity="Number to build")
 @has_nation()
+@nation_transaction()
 async def construct_building(interaction: Interaction, building_type: str, quantity: int):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
+    nation = bot.get_nation(uid)
 
     if building_type not in BUILDINGS:
         await interaction.response.send_message("❌ Invalid building", ephemeral=True)
@@ -1178,6 +3512,8 @@ async def construct_building(interaction: Interaction, building_type: str, quant
 
     nation["resources"] -= total_cost
     nation["buildings"][building_type] = nation["buildings"].get(building_type, 0) + quantity
+    bot.invalidate_income(uid)
+    bot.record("construct_building", uid, "buildings")
 
     append_history(uid, f"🏗️ Built {quantity}x {building_type}")
     bot.save_data()
@@ -1205,34 +3541,20 @@ async def leaderboard(interaction: Interaction, category: str = "power"):
         await interaction.response.send_message("📊 No nations yet", ephemeral=True)
         return
 
-    category_map = {
-        "power": ("military_power", "⚔️ Military Power"),
-        "population": ("population", "👥 Population"),
-        "resources": ("resources", "💰 Resources"),
-        "territories": ("territories", "🗺️ Territories"),
-    }
-
-    if category not in category_map:
+    if category not in LEADERBOARD_CATEGORIES:
         category = "power"
 
-    sort_key, title = category_map[category]
-
-    if sort_key == "territories":
-        ranked = sorted(bot.nations.items(), key=lambda x: len(x[1].get("territories", [])), reverse=True)[:10]
-    else:
-        ranked = sorted(bot.nations.items(), key=lambda x: x[1].get(sort_key, 0), reverse=True)[:10]
+    sort_key, title = LEADERBOARD_CATEGORIES[category]
+    bot.refresh_leaderboards()
+    ranked = bot.leaderboards[category].top(10)
 
     embed = discord.Embed(title=f"🏆 Leaderboard - {title}", color=discord.Color.gold())
 
-    for idx, (uid, nation) in enumerate(ranked, 1):
+    for idx, (uid, value) in enumerate(ranked, 1):
         try:
-            if sort_key == "territories":
-                value = len(nation.get("territories", []))
-            else:
-                value = int(nation.get(sort_key, 0))
             embed.add_field(
-                name=f"{idx}. {nation['name']}",
-                value=f"{title}: {value:,}",
+                name=f"{idx}. {bot.nations[uid]['name']}",
+                value=f"{title}: {int(value):,}",
                 inline=False
             )
         except:
@@ -1241,117 +3563,172 @@ async def leaderboard(interaction: Interaction, category: str = "power"):
     await interaction.response.send_message(embed=embed)
 
 
+@bot.tree.command(name="my_rank", description="View your rank and percentile")
+@app_commands.describe(category="What to rank by")
+@has_nation()
+async def my_rank(interaction: Interaction, category: str = "power"):
+    uid = str(interaction.user.id)
+
+    if category not in LEADERBOARD_CATEGORIES:
+        category = "power"
+
+    sort_key, title = LEADERBOARD_CATEGORIES[category]
+    bot.refresh_leaderboards()
+    index = bot.leaderboards[category]
+    rank = index.rank(uid)
+    total = len(index.keys)
+    value = -index.key_of[uid][0]
+    top_percent = rank / total * 100
+
+    embed = discord.Embed(title=f"🏅 {bot.nations[uid]['name']} - {title}", color=discord.Color.gold())
+    embed.add_field(name="Rank", value=f"#{rank:,} of {total:,}", inline=True)
+    embed.add_field(name="Percentile", value=f"Top {top_percent:.1f}%", inline=True)
+    embed.add_field(name=title, value=f"{int(value):,}", inline=True)
+    await interaction.response.send_message(embed=embed)
+
+
 @bot.tree.command(name="history", description="View your nation's history")
+@app_commands.describe(page="Page to show, 1 is the most recent")
 @has_nation()
-async def history(interaction: Interaction):
+async def history(interaction: Interaction, page: int = 1):
     uid = str(interaction.user.id)
-    nation = bot.nations[uid]
-    hist = nation.get("history", [])
+    nation = bot.get_nation(uid)
+    total = nation.get("history_archived", 0) + len(nation.get("history", []))
 
-    if not hist:
+    if not total:
         await interaction.response.send_message("📜 No history yet", ephemeral=True)
         return
 
-    recent = hist[-15:]
+    pages = (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    page = min(max(page, 1), pages)
+    end = total - (page - 1) * HISTORY_PAGE_SIZE
+    entries = await bot.read_history(uid, max(end - HISTORY_PAGE_SIZE, 0), end)
+
     embed = discord.Embed(
         title=f"📜 History of {nation['name']}",
-        description="\n".join(recent),
+        description="\n".join(entries),
         color=discord.Color.gold()
     )
+    embed.set_footer(text=f"Page {page}/{pages} • /history page:<n> for older entries")
     await interaction.response.send_message(embed=embed)
 
 
+@bot.tree.command(name="bot_metrics", description="View loop and save timings (admin)")
+@app_commands.default_permissions(administrator=True)
+@is_admin()
+async def bot_metrics(interaction: Interaction):
+    # Guild admins only see series labelled with their guild; process-wide ones are left out
+    lines = bot.metrics.summary({"guild": str(interaction.guild_id)} if MULTI_GUILD else None)
+    body = "\n".join(lines)
+    if len(body) > 4000:
+        body = body[:4000].rsplit("\n", 1)[0] + "\n…"
+    embed = discord.Embed(title="📈 Bot Metrics", description=f"```\n{body}\n```", color=discord.Color.dark_grey())
+    if METRICS_PORT:
+        embed.set_footer(text=f"Prometheus: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
 # ---------------- AUTOCOMPLETE ----------------
+def timed_autocomplete(func):
+    # Records each handler's latency; Discord drops answers after 3 seconds
+    @functools.wraps(func)
+    async def wrapper(interaction: Interaction, current: str):
+        with bot.autocomplete_seconds.time({"handler": func.__name__}):
+            return await func(interaction, current)
+    return wrapper
+
+
+def requested_quantity(interaction: Interaction) -> int:
+    # Affordability accounts for the quantity when it was filled in first
+    quantity = getattr(interaction.namespace, "quantity", None)
+    return quantity if isinstance(quantity, int) and quantity > 0 else 1
+
+
+def choices(values: List[str]) -> List[app_commands.Choice]:
+    return [app_commands.Choice(name=value, value=value) for value in values]
+
+
 @train_units.autocomplete('unit_type')
+@timed_autocomplete
 async def ground_unit_autocomplete(interaction: Interaction, current: str):
-    return [
-        app_commands.Choice(name=unit, value=unit)
-        for unit in GROUND_UNITS.keys()
-        if current.lower() in unit.lower()
-    ][:25]
+    return choices(autocomplete_service.affordable_units(
+        bot, "ground_units", str(interaction.user.id), current, requested_quantity(interaction)
+    ))
 
 
 @train_naval_units.autocomplete('unit_type')
+@timed_autocomplete
 async def naval_unit_autocomplete(interaction: Interaction, current: str):
-    return [
-        app_commands.Choice(name=unit, value=unit)
-        for unit in NAVAL_UNITS.keys()
-        if current.lower() in unit.lower()
-    ][:25]
+    return choices(autocomplete_service.affordable_units(
+        bot, "naval_units", str(interaction.user.id), current, requested_quantity(interaction)
+    ))
 
 
 @train_air_units.autocomplete('unit_type')
+@timed_autocomplete
 async def air_unit_autocomplete(interaction: Interaction, current: str):
-    return [
-        app_commands.Choice(name=unit, value=unit)
-        for unit in AIR_UNITS.keys()
-        if current.lower() in unit.lower()
-    ][:25]
+    return choices(autocomplete_service.affordable_units(
+        bot, "air_units", str(interaction.user.id), current, requested_quantity(interaction)
+    ))
 
 
 @invade_region.autocomplete('region_name')
+@timed_autocomplete
 async def region_autocomplete(interaction: Interaction, current: str):
-    return [
-        app_commands.Choice(name=region, value=region)
-        for region in WORLD_REGIONS.keys()
-        if current.lower() in region.lower()
-    ][:25]
+    return choices(autocomplete_service.search("regions", current))
 
 
 @train_naval_units.autocomplete('region')
 @train_air_units.autocomplete('region')
 @build_infrastructure.autocomplete('region_name')
+@timed_autocomplete
 async def owned_region_autocomplete(interaction: Interaction, current: str):
-    uid = str(interaction.user.id)
-    if uid not in bot.nations:
-        return []
-    territories = bot.nations[uid].get("territories", [])
-    return [
-        app_commands.Choice(name=region, value=region)
-        for region in territories
-        if current.lower() in region.lower()
-    ][:25]
+    return choices(autocomplete_service.owned_regions(bot, str(interaction.user.id), current))
 
 
 @build_infrastructure.autocomplete('infra_type')
+@timed_autocomplete
 async def infrastructure_autocomplete(interaction: Interaction, current: str):
-    return [
-        app_commands.Choice(name=infra, value=infra)
-        for infra in INFRASTRUCTURE.keys()
-        if current.lower() in infra.lower()
-    ][:25]
+    return choices(autocomplete_service.search("infrastructure", current))
 
 
 @research.autocomplete('tech_name')
+@timed_autocomplete
 async def tech_autocomplete(interaction: Interaction, current: str):
-    return [
-        app_commands.Choice(name=tech, value=tech)
-        for tech in TECHNOLOGIES.keys()
-        if current.lower() in tech.lower()
-    ][:25]
+    return choices(autocomplete_service.search("technologies", current))
 
 
 @construct_building.autocomplete('building_type')
+@timed_autocomplete
 async def building_autocomplete(interaction: Interaction, current: str):
+    return choices(autocomplete_service.search("buildings", current))
+
+
+@view_map.autocomplete('mode')
+@timed_autocomplete
+async def map_mode_autocomplete(interaction: Interaction, current: str):
     return [
-        app_commands.Choice(name=building, value=building)
-        for building in BUILDINGS.keys()
-        if current.lower() in building.lower()
-    ][:25]
+        app_commands.Choice(name=mode.title(), value=mode)
+        for mode in autocomplete_service.search("map_modes", current)
+    ]
 
 
 @leaderboard.autocomplete('category')
+@my_rank.autocomplete('category')
+@timed_autocomplete
 async def leaderboard_autocomplete(interaction: Interaction, current: str):
-    categories = ["power", "population", "resources", "territories"]
     return [
         app_commands.Choice(name=cat.title(), value=cat)
-        for cat in categories
-        if current.lower() in cat.lower()
+        for cat in autocomplete_service.search("leaderboards", current)
     ]
 
 
 # ---------------- RUN BOT ----------------
 if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "convert":
+        # python Discord.py convert nations_data.json nations_data.pax (or the reverse)
+        convert_snapshot(sys.argv[2], sys.argv[3])
+        exit(0)
     if not TOKEN:
         print("ERROR: DISCORD_TOKEN not found!")
         exit(1)
@@ -0,0 +1,2 @@
+# Synthetic-world benchmarks for the bot's hot paths.
+# Run from the repository root: python -m benchmarks --help
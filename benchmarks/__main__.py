@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.world import generate_world
+
+DEFAULT_SIZES = [100, 10000, 100000]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    # setup runs before every repetition and is not timed
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "repeat": repeat,
+    }
+
+
+def run_loop(bot, loop) -> None:
+    # tasks.Loop keeps the undecorated coroutine in .coro
+    asyncio.run(loop.coro(bot))
+
+
+def bench_size(bot_module, size: int, repeat: int, seed: int, history_length: int) -> dict:
+    bot = bot_module.bot
+    cls = bot_module.PaxHistoriaBot
+    results = {}
+
+    state = generate_world(bot_module, size, seed=seed, history_length=history_length)
+    if bot_module.SNAPSHOT_FORMAT == "indexed":
+        bot_module.write_indexed_file(bot_module.SNAPSHOT_FILE, state)
+    else:
+        bot_module.write_data_file(bot_module.SNAPSHOT_FILE, state)
+    del state
+    results["snapshot_bytes"] = os.path.getsize(bot_module.SNAPSHOT_FILE)
+
+    # Benchmark the home guild's world; the loops run over every loaded world
+    bot.worlds.clear()
+    bot_module.current_world.set(bot.open_world(bot_module.GUILD_ID))
+
+    results["load_data"] = measure(bot.load_data, repeat)
+
+    # First command on 1% of nations right after startup; with indexed snapshots
+    # this is where their history and rosters are read
+    sample = random.Random(seed).sample(list(bot.nations), max(1, size // 100))
+    results["first_touch"] = measure(lambda: [bot.get_nation(uid) for uid in sample], repeat, setup=bot.load_data)
+
+    # The loops save on their own; saves are measured separately below
+    bot.save_data = lambda: None
+    try:
+        def one_tick_due():
+            # The loop applies ticks for measured time, so make exactly one due
+            bot.economy_clock.last = time.monotonic() - bot_module.TICK_SECONDS
+            bot.economy_clock.carry = 0.0
+
+        random.seed(seed)
+        results["real_time_growth_loop"] = measure(
+            lambda: run_loop(bot, cls.real_time_growth_loop), repeat, setup=one_tick_due
+        )
+        random.seed(seed)
+        results["passive_growth_loop"] = measure(lambda: run_loop(bot, cls.passive_growth_loop), repeat)
+        random.seed(seed)
+        results["random_events_loop"] = measure(lambda: run_loop(bot, cls.random_events_loop), repeat)
+    finally:
+        del bot.save_data
+
+    def mark_all_dirty():
+        bot.all_nations_dirty = True
+        bot.dirty_nations.update(bot.nations)
+
+    # With the journal on, save_data() is a no-op and snapshots are written by
+    # compaction, so time that under the same name to keep modes comparable
+    save = bot.write_snapshot if bot.journal is not None else bot.save_data
+    results["save_data"] = measure(save, repeat, setup=mark_all_dirty)
+
+    results["render_map_with_nations"] = measure(
+        lambda: bot_module.render_map_with_nations(bot.base_map, bot.nations, bot.region_cells), repeat
+    )
+
+    def drop_map_cache():
+        bot.map_render_cache = None
+
+    results["rendered_map_cold"] = measure(bot.rendered_map, repeat, setup=drop_map_cache)
+    results["rendered_map_cached"] = measure(bot.rendered_map, repeat)
+
+    results["rebuild_leaderboards"] = measure(bot.rebuild_leaderboards, repeat)
+
+    # What /leaderboard does after a burst of commands touched 1% of nations
+    touched = random.Random(seed).sample(list(bot.nations), max(1, size // 100))
+
+    def touch_nations():
+        for uid in touched:
+            bot.get_nation(uid)["resources"] += 1
+
+    def leaderboard_query():
+        bot.refresh_leaderboards()
+        for index in bot.leaderboards.values():
+            index.top(10)
+
+    results["leaderboard_query"] = measure(leaderboard_query, repeat, setup=touch_nations)
+
+    # After a passive_growth_loop in the dict engine every nation is dirty
+    def touch_all_nations():
+        bot.leaderboard_dirty.update(bot.nations)
+
+    results["leaderboard_all_dirty"] = measure(leaderboard_query, repeat, setup=touch_all_nations)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float, floor_ms: float) -> list:
+    regressions = []
+    for size, paths in current["results"].items():
+        for path, timing in paths.items():
+            old = baseline.get("results", {}).get(size, {}).get(path)
+            if not isinstance(timing, dict) or not isinstance(old, dict) or not old["min_ms"]:
+                continue
+            ratio = timing["min_ms"] / old["min_ms"]
+            # Sub-millisecond paths are too noisy to call regressions
+            flag = "  REGRESSION" if ratio > threshold and timing["min_ms"] >= floor_ms else ""
+            print(f"{size:>7} {path:<26} {old['min_ms']:>10.2f} -> {timing['min_ms']:>10.2f} ms  x{ratio:.2f}{flag}")
+            if flag:
+                regressions.append((size, path, ratio))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time the bot's hot paths on synthetic worlds")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Nation counts to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per path")
+    parser.add_argument("--seed", type=int, default=1, help="World generator seed")
+    parser.add_argument("--history", type=int, default=60, help="Average history entries per nation")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--floor-ms", type=float, default=1.0, help="Ignore regressions on paths faster than this")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import Discord as bot_module
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "history": args.history,
+            "config": {
+                "economy_engine": bot_module.ECONOMY_ENGINE,
+                "storage_backend": bot_module.STORAGE_BACKEND,
+                "snapshot_format": bot_module.SNAPSHOT_FORMAT,
+                "snapshot_compression": bot_module.SNAPSHOT_COMPRESSION,
+                "journal_enabled": bot_module.JOURNAL_ENABLED,
+                "history_limit": bot_module.HISTORY_LIMIT,
+            },
+        },
+        "results": {},
+    }
+
+    # Data files are relative paths, so every size runs in a scratch directory
+    cwd = os.getcwd()
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="pax-bench-") as workdir:
+            os.chdir(workdir)
+            try:
+                print(f"Benchmarking {size:,} nations...")
+                report["results"][str(size)] = bench_size(bot_module, size, args.repeat, args.seed, args.history)
+            finally:
+                os.chdir(cwd)
+        for path, timing in report["results"][str(size)].items():
+            if isinstance(timing, dict):
+                print(f"  {path:<26} min {timing['min_ms']:>10.2f} ms  median {timing['median_ms']:>10.2f} ms")
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold, args.floor_ms):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import random
+from typing import Dict
+
+# Tech names in an order where every prerequisite comes before what needs it,
+# so a prefix of a shuffled-but-valid order is always researchable
+def _research_order(technologies: dict, rng: random.Random) -> list:
+    remaining = list(technologies)
+    rng.shuffle(remaining)
+    order = []
+    while remaining:
+        for name in remaining:
+            if all(req in order for req in technologies[name].get("requires", [])):
+                order.append(name)
+                remaining.remove(name)
+                break
+    return order
+
+
+def generate_world(bot_module, nation_count: int, seed: int = 1, history_length: int = 60) -> dict:
+    # Returns a state dict in the same shape as nations_data.json. The same
+    # arguments always produce the same world, so runs are comparable.
+    rng = random.Random(seed)
+    regions = list(bot_module.WORLD_REGIONS)
+    unit_names = list(bot_module.GROUND_UNITS) + list(bot_module.NAVAL_UNITS) + list(bot_module.AIR_UNITS)
+    building_names = list(bot_module.BUILDINGS)
+    infra_names = [name for name in bot_module.INFRASTRUCTURE if name != "Strategic Missile Silo"]
+
+    nations: Dict[str, dict] = {}
+    for idx in range(nation_count):
+        uid = str(100000000000000000 + idx)
+        name = f"Nation {idx}"
+        history_size = rng.randint(0, history_length * 2)
+        nations[uid] = {
+            "name": name,
+            "population": rng.randint(1000, 5000000),
+            "resources": rng.randint(0, 500000),
+            "manpower": rng.randint(0, 200000),
+            "research_points": rng.randint(0, 50000),
+            "political_points": rng.randint(0, 5000),
+            "military_power": 0,
+            "territory": 1,
+            "territories": [],
+            "infrastructure": {},
+            "units": {unit: rng.randint(1, 400) for unit in rng.sample(unit_names, rng.randint(0, 6))},
+            "technologies": _research_order(bot_module.TECHNOLOGIES, rng)[:rng.randint(0, len(bot_module.TECHNOLOGIES))],
+            "buildings": {b: rng.randint(1, 60) for b in rng.sample(building_names, rng.randint(0, len(building_names)))},
+            "alliance": None,
+            "history": [f"Nation created: {name}"] + [
+                f"⚔️ Trained {rng.randint(1, 50)}x {rng.choice(unit_names)}" for _ in range(history_size)
+            ],
+        }
+
+    # Regions are unique, so only a handful of nations hold territory
+    uids = list(nations)
+    for region in regions:
+        owner = rng.choice(uids)
+        nations[owner]["territories"].append(region)
+        nations[owner]["infrastructure"][region] = rng.sample(infra_names, rng.randint(0, len(infra_names)))
+
+    return {"nations": nations, "alliances": {}, "wars": [], "trade_offers": [], "map_seed": seed}
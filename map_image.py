@@ -0,0 +1,72 @@
+import colorsys
+import io
+from array import array
+from typing import List, Tuple
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+# Runs inside ProcessPoolExecutor workers, so it only takes plain picklable data
+# and must not import the bot module. Spawned workers still import the bot's
+# __main__ script once at startup; see PaxHistoriaBot.render_map_image.
+
+CELL_SIZE = 16
+LEGEND_WIDTH = 260
+LEGEND_ROW = 18
+LEGEND_MAX_NATIONS = 40
+
+# Terrain codes used in the terrain raster
+TERRAIN_COLORS = {
+    0: (38, 84, 156),    # ocean
+    1: (86, 160, 74),    # land
+    2: (140, 132, 120),  # mountain
+    3: (214, 186, 120),  # desert
+}
+
+
+def nation_color(index: int) -> Tuple[int, int, int]:
+    # Golden-ratio hue steps keep neighbouring indexes visually distinct
+    hue = (index * 0.618033988749895) % 1.0
+    r, g, b = colorsys.hsv_to_rgb(hue, 0.75, 0.95)
+    return int(r * 255), int(g * 255), int(b * 255)
+
+
+def render_map_png(width: int, height: int, terrain: bytes, owners: bytes,
+                   nation_names: List[str], labels: List[Tuple[str, int, int]]) -> bytes:
+    # owners is a uint16 raster: 0 = unowned, n = nation_names[n - 1]
+    owner_raster = array("H")
+    owner_raster.frombytes(owners)
+
+    map_width = width * CELL_SIZE
+    legend_height = 32 + (min(len(nation_names), LEGEND_MAX_NATIONS) + 1) * LEGEND_ROW
+    image = Image.new("RGB", (map_width + LEGEND_WIDTH, max(height * CELL_SIZE, legend_height)), (24, 24, 28))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+
+    for y in range(height):
+        for x in range(width):
+            cell = y * width + x
+            owner = owner_raster[cell]
+            color = nation_color(owner - 1) if owner else TERRAIN_COLORS.get(terrain[cell], (0, 0, 0))
+            x0, y0 = x * CELL_SIZE, y * CELL_SIZE
+            draw.rectangle((x0, y0, x0 + CELL_SIZE - 1, y0 + CELL_SIZE - 1), fill=color)
+
+    for name, x, y in labels:
+        cx, cy = x * CELL_SIZE + CELL_SIZE // 2, y * CELL_SIZE + CELL_SIZE // 2
+        draw.text((cx, cy), name, fill=(255, 255, 255), font=font, anchor="mm", stroke_width=2, stroke_fill=(0, 0, 0))
+
+    draw.text((map_width + 12, 10), "Nations", fill=(255, 255, 255), font=font)
+    for idx, name in enumerate(nation_names[:LEGEND_MAX_NATIONS]):
+        y0 = 32 + idx * LEGEND_ROW
+        draw.rectangle((map_width + 12, y0, map_width + 24, y0 + 12), fill=nation_color(idx))
+        draw.text((map_width + 32, y0), name[:32], fill=(230, 230, 230), font=font)
+    if len(nation_names) > LEGEND_MAX_NATIONS:
+        y0 = 32 + LEGEND_MAX_NATIONS * LEGEND_ROW
+        draw.text((map_width + 12, y0), f"+{len(nation_names) - LEGEND_MAX_NATIONS} more", fill=(200, 200, 200),
+                  font=font)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,241 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Small in-process metrics registry rendered in the Prometheus text format.
+# Standard library only, so it can be used and tested without Discord.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> Tuple[tuple, ...]:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _matches(key: tuple, only: Optional[Dict[str, str]]) -> bool:
+    # Series must carry every label in only with the same value, so unlabelled
+    # process-wide series are left out of a filtered view too
+    labels = dict(key)
+    return all(labels.get(name) == value for name, value in (only or {}).items())
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+    def render(self, only: Optional[Dict[str, str]] = None) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(key)} {_format_value(value)}"
+            for key, value in self.values.items() if _matches(key, only)
+        ]
+
+
+# A callback returns either one unlabelled value or (labels, value) pairs
+GaugeCallback = Callable[[], Union[float, Iterable[Tuple[Dict[str, str], float]]]]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Optional[GaugeCallback] = None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.values: Dict[tuple, float] = {}
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        self.values[_label_key(labels)] = value
+
+    def remove(self, labels: Optional[Dict[str, str]] = None) -> None:
+        self.values.pop(_label_key(labels), None)
+
+    def collect(self) -> Dict[tuple, float]:
+        if self.callback is None:
+            return self.values
+        result = self.callback()
+        if isinstance(result, (int, float)):
+            return {(): result}
+        return {_label_key(labels): value for labels, value in result}
+
+    def get(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self.collect().get(_label_key(labels), 0)
+
+    def render(self, only: Optional[Dict[str, str]] = None) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(key)} {_format_value(value)}"
+            for key, value in self.collect().items() if _matches(key, only)
+        ]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count, max]
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+        series[3] = max(series[3], value)
+
+    def time(self, labels: Optional[Dict[str, str]] = None) -> "Timer":
+        return Timer(self, labels)
+
+    def count(self, labels: Optional[Dict[str, str]] = None) -> int:
+        series = self.series.get(_label_key(labels))
+        return series[2] if series else 0
+
+    def quantile(self, q: float, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation, capped at the
+        # largest value seen
+        series = self.series.get(_label_key(labels))
+        if not series or not series[2]:
+            return None
+        rank = q * series[2]
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), series[0]):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, series[3])
+        return series[3]
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (bucket_counts, total, count, _) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Timer:
+    def __init__(self, histogram: Histogram, labels: Optional[Dict[str, str]]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str, callback: Optional[GaugeCallback] = None) -> Gauge:
+        return self._register(Gauge(name, help_text, callback))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def summary(self, only: Optional[Dict[str, str]] = None) -> List[str]:
+        # Human-readable lines for chat: quantiles for histograms, values otherwise.
+        # only={"guild": "123"} keeps just the series labelled with that guild.
+        lines = []
+        for metric in self.metrics.values():
+            if isinstance(metric, Histogram):
+                for key, (_, total, count, largest) in metric.series.items():
+                    if not _matches(key, only):
+                        continue
+                    labels = dict(key)
+                    lines.append(
+                        f"{metric.name}{_format_labels(key)} n={count} avg={total / count * 1000:.1f}ms "
+                        f"p50={metric.quantile(0.5, labels) * 1000:.1f}ms p95={metric.quantile(0.95, labels) * 1000:.1f}ms "
+                        f"max={largest * 1000:.1f}ms"
+                    )
+            else:
+                lines.extend(metric.render(only))
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+async def start_exporter(registry: MetricsRegistry, host: str, port: int) -> asyncio.AbstractServer:
+    # Minimal HTTP/1.0 responder: GET /metrics returns the text format, anything
+    # else is a 404. Meant to be bound to localhost and scraped by Prometheus.
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", registry.render()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", "not found\n"
+            payload = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Discord  # noqa: E402
+
+
+class FakeResponse:
+    # Every call yields to the event loop, like a real HTTP round trip would
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, content=None, **kwargs):
+        await asyncio.sleep(0)
+        self.messages.append((content, kwargs))
+
+    async def defer(self, **kwargs):
+        await asyncio.sleep(0)
+
+
+class FakeFollowup:
+    def __init__(self, response: FakeResponse):
+        self.response = response
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(0)
+        self.response.messages.append((content, kwargs))
+
+
+class FakeInteraction:
+    # Just enough of discord.Interaction for command callbacks
+    def __init__(self, user_id: int, guild_id: int = Discord.GUILD_ID):
+        self.user = SimpleNamespace(id=user_id, mention=f"<@{user_id}>", display_name=str(user_id))
+        self.guild_id = guild_id
+        self.namespace = SimpleNamespace()
+        self.response = FakeResponse()
+        self.followup = FakeFollowup(self.response)
+
+
+def found(user_id: int, name: str) -> str:
+    # Founds a nation in the active world through /create_nation; returns its uid
+    asyncio.run(Discord.create_nation.callback(FakeInteraction(user_id), nation_name=name))
+    return str(user_id)
+
+
+@pytest.fixture
+def world(tmp_path, monkeypatch):
+    # A fresh home-guild world whose data files live in tmp_path
+    monkeypatch.chdir(tmp_path)
+    bot = Discord.bot
+    bot.worlds.clear()
+    bot.evicted_at.clear()
+    token = Discord.current_world.set(bot.open_world(Discord.GUILD_ID))
+    yield bot
+    if bot.journal is not None:
+        bot.journal.close()
+    if bot.cold_store is not None:
+        bot.cold_store.close()
+    Discord.current_world.reset(token)
+    bot.worlds.clear()
+
+
+def reopen(bot):
+    # Drop the in-memory world and load it back from disk
+    if bot.journal is not None:
+        bot.journal.close()
+    bot.worlds.clear()
+    Discord.current_world.set(bot.open_world(Discord.GUILD_ID))
+    return bot
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+import Discord
+from conftest import found
+
+
+def snapshot_path(bot) -> str:
+    return bot.world_path(Discord.SNAPSHOT_FILE)
+
+
+@pytest.mark.parametrize("step", ["replace", "fsync"])
+def test_failed_write_leaves_previous_file_intact(world, monkeypatch, step):
+    uid = found(1, "Durablia")
+    world.write_snapshot()
+    with open(snapshot_path(world), "rb") as f:
+        before = f.read()
+
+    world.nations[uid]["resources"] = 12345
+    world.dirty_nations.add(uid)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(Discord.os, step, fail)
+        world.write_snapshot()
+
+    with open(snapshot_path(world), "rb") as f:
+        assert f.read() == before
+    assert Discord.read_data_file(snapshot_path(world))["nations"][uid]["resources"] != 12345
+
+    # The next save writes the change the failed one dropped
+    world.write_snapshot()
+    assert Discord.read_data_file(snapshot_path(world))["nations"][uid]["resources"] == 12345
+
+
+def test_concurrent_save_requests_coalesce(world, monkeypatch):
+    found(1, "Coalescia")
+    prepared = []
+    prepare_save = world.prepare_save
+
+    def counting_prepare_save():
+        prepared.append(1)
+        return prepare_save()
+
+    monkeypatch.setattr(world, "prepare_save", counting_prepare_save)
+
+    async def run():
+        for _ in range(5):
+            world.write_snapshot()
+        await world._save_task
+        assert len(prepared) == 1
+
+        world.write_snapshot()
+        task = world._save_task
+        # Let the worker start writing, then pile more requests onto it
+        await asyncio.sleep(0)
+        assert len(prepared) == 2
+        for _ in range(5):
+            world.write_snapshot()
+        assert world._save_task is task
+        assert await task
+        assert len(prepared) == 3
+
+    asyncio.run(run())
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import Discord
+from conftest import found
+
+
+def brute_force(names, query: str, limit: int = 25, accept=None) -> list:
+    query = query.casefold()
+    ordered = sorted(names, key=str.casefold)
+    prefix = [name for name in ordered if name.casefold().startswith(query)]
+    word = [name for name in ordered if name not in prefix and f" {query}" in name.casefold()]
+    inner = [name for name in ordered if name not in prefix and name not in word and query in name.casefold()]
+    return [name for name in prefix + word + inner if accept is None or accept(name)][:limit]
+
+
+def queries(names, rng: random.Random, size: int) -> list:
+    # Mostly pieces of real names, in mixed case, plus a few that match nothing
+    picked = []
+    for _ in range(200):
+        name = rng.choice(names)
+        if len(name) >= size:
+            start = rng.randrange(len(name) - size + 1)
+            piece = name[start:start + size]
+            picked.append(piece.upper() if rng.random() < 0.3 else piece)
+    picked += ["".join(rng.choice("xqz ") for _ in range(size)) for _ in range(20)]
+    return picked
+
+
+@pytest.mark.parametrize("size", [1, 3, 4, 7])
+def test_ranking_matches_brute_force(size):
+    rng = random.Random(size)
+    for catalog, index in Discord.autocomplete_service.indexes.items():
+        names = index.names
+        for query in queries(names, rng, size):
+            assert index.search(query) == brute_force(names, query), (catalog, query)
+            assert index.search(query, limit=1000) == brute_force(names, query, limit=1000), (catalog, query)
+
+
+def test_owned_regions_only_lists_the_callers_regions(world):
+    uid, other = found(1, "Ownia"), found(2, "Otheria")
+    regions = sorted(Discord.WORLD_REGIONS, key=str.casefold)
+    for region in regions[:6]:
+        world.transfer_region(region, uid)
+    for region in regions[6:9]:
+        world.transfer_region(region, other)
+    owned = set(regions[:6])
+
+    assert Discord.autocomplete_service.owned_regions(world, uid, "") == regions[:6]
+    for query in ("a", "an", regions[7][:3]):
+        expected = brute_force(Discord.WORLD_REGIONS, query, accept=owned.__contains__)
+        assert Discord.autocomplete_service.owned_regions(world, uid, query) == expected
+
+
+def test_affordable_units_follow_resources_and_quantity(world):
+    uid = found(1, "Thriftia")
+    world.nations[uid]["resources"] = 120
+    world.nations[uid]["manpower"] = 20
+
+    def affordable(quantity: int) -> list:
+        return brute_force(Discord.GROUND_UNITS, "", accept=lambda unit: (
+            Discord.ALL_UNITS[unit]["cost"] * quantity <= 120 and Discord.ALL_UNITS[unit]["manpower"] * quantity <= 20
+        ))
+
+    service = Discord.autocomplete_service
+    assert service.affordable_units(world, "ground_units", uid, "") == affordable(1)
+    assert service.affordable_units(world, "ground_units", uid, "", quantity=5) == affordable(5)
+    assert affordable(5) != affordable(1) != brute_force(Discord.GROUND_UNITS, "")
+    # Nations that do not exist yet see the whole catalog
+    assert service.affordable_units(world, "ground_units", "99", "") == brute_force(Discord.GROUND_UNITS, "")
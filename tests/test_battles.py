@@ -0,0 +1,76 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+import Discord
+from conftest import FakeInteraction, found
+
+
+ATTACKER = {"Infantry": 12, "Fighter": 1, "Destroyer": 1}
+DEFENDER = {"MBT": 3, "Bomber": 2, "Nuclear Missile": 1}
+
+
+def power_lost(units: dict, losses: list, draw) -> float:
+    return sum(
+        removed * Discord.ALL_UNITS[unit_name]["power"]
+        for domains, fraction in losses
+        for unit_name, removed in Discord.unit_losses(units, fraction, domains, draw).items()
+    )
+
+
+def test_simulated_losses_match_single_battles():
+    att = Discord.calculate_military_by_type({"units": ATTACKER})
+    dfn = Discord.calculate_military_by_type({"units": DEFENDER})
+    rng = random.Random(6)
+    battles = 20000
+    single = [0.0, 0.0]
+    for _ in range(battles):
+        outcome = Discord.resolve_battle(att, dfn, [rng.random() for _ in range(3)])
+        single[0] += power_lost(ATTACKER, outcome["attacker_losses"], rng.random)
+        single[1] += power_lost(DEFENDER, outcome["defender_losses"], rng.random)
+
+    np_rng = np.random.default_rng(6)
+    outcome = Discord.resolve_battle(att, dfn, np_rng.random((3, battles)))
+    batched = [
+        power_lost(ATTACKER, outcome["attacker_losses"], lambda: np_rng.random(battles)).mean(),
+        power_lost(DEFENDER, outcome["defender_losses"], lambda: np_rng.random(battles)).mean(),
+    ]
+    for total, mean in zip(single, batched):
+        assert abs(total / battles - mean) / mean < 0.05
+
+
+def test_batched_battles_match_single_battles_run_by_run():
+    att = Discord.calculate_military_by_type({"units": ATTACKER})
+    dfn = Discord.calculate_military_by_type({"units": DEFENDER})
+    rolls = np.random.default_rng(17).random((3, 2000))
+    batched = Discord.resolve_battle(att, dfn, rolls)
+    for run in range(rolls.shape[1]):
+        single = Discord.resolve_battle(att, dfn, rolls[:, run].tolist())
+        for phase in ("air", "naval", "ground", "victory"):
+            assert bool(batched[phase][run]) == single[phase]
+        for side in ("attacker_losses", "defender_losses"):
+            assert [(domains, fraction[run]) for domains, fraction in batched[side]] == single[side]
+
+
+def test_simulate_war_replies_privately(world):
+    for user_id in (1, 2):
+        found(user_id, f"N{user_id}")
+    world.change_units("1", "Infantry", 1)
+    world.change_units("2", "Infantry", 1)
+    interaction = FakeInteraction(1)
+    asyncio.run(Discord.simulate_war.callback(interaction, target_user=SimpleNamespace(id=2), runs=500))
+    _, kwargs = interaction.response.messages[-1]
+    assert kwargs["ephemeral"] is True
+    assert "embed" in kwargs
+
+
+def test_full_scale_war_keeps_cached_income(world):
+    # Battles move units, resources and population, none of which feed income
+    for user_id in (1, 2):
+        found(user_id, f"N{user_id}")
+        world.change_units(str(user_id), "Infantry", 5)
+    cached = {uid: world.get_income(uid) for uid in ("1", "2")}
+    asyncio.run(Discord.full_scale_war.callback(FakeInteraction(1), target_user=SimpleNamespace(id=2)))
+    assert all(world.income_cache.get(uid) is income for uid, income in cached.items())
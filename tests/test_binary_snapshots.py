@@ -0,0 +1,57 @@
+import pytest
+
+import Discord
+
+COMPRESSIONS = ["none", "zlib"]
+
+
+def round_trip(state: dict, compression: str) -> dict:
+    return Discord.decode_snapshot(Discord.encode_snapshot(state, compression))
+
+
+def nation(**fields) -> dict:
+    base = {"name": "Columnia", "population": 1000, "resources": 12.5, "territories": ["Alaska"],
+            "technologies": [], "history": ["Founded"], "units": {"Infantry": 3}, "buildings": {}}
+    base.update(fields)
+    return base
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_numeric_columns_keep_ints_and_floats(compression):
+    state = {"nations": {"1": nation(), "2": nation(name="Floatia", population=2.5, resources=7)},
+             "wars": [], "map_seed": 3}
+    decoded = round_trip(state, compression)
+    assert decoded == state
+    assert type(decoded["nations"]["1"]["population"]) is int
+    assert type(decoded["nations"]["2"]["population"]) is float
+    assert type(decoded["nations"]["2"]["resources"]) is int
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_values_a_column_cannot_hold_fall_back_to_json(compression):
+    state = {"nations": {
+        # Past 2**53 a double would round; bools must not come back as numbers
+        "1": nation(resources=2 ** 60 + 1, units={"Infantry": True}),
+        "2": nation(population=True, alliance="Pact", history_archived=40),
+    }}
+    decoded = round_trip(state, compression)
+    assert decoded == state
+    assert decoded["nations"]["1"]["resources"] == 2 ** 60 + 1
+    assert decoded["nations"]["2"]["population"] is True
+    assert decoded["nations"]["1"]["units"]["Infantry"] is True
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_empty_world_round_trips(compression):
+    state = {"nations": {}, "alliances": {}, "wars": [], "trade_offers": []}
+    assert round_trip(state, compression) == state
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_damaged_files_raise_value_error(compression):
+    raw = Discord.encode_snapshot({"nations": {"1": nation(), "2": nation(name="Cutia")}}, compression)
+    with pytest.raises(ValueError):
+        Discord.decode_snapshot(b"JUNK" + raw[4:])
+    for cut in range(5, len(raw), 7):
+        with pytest.raises(ValueError):
+            Discord.decode_snapshot(raw[:cut])
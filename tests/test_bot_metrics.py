@@ -0,0 +1,29 @@
+import asyncio
+
+import discord
+
+import Discord
+from conftest import FakeInteraction
+
+
+def run_checks(interaction) -> bool:
+    return all(asyncio.run(check(interaction)) for check in Discord.bot_metrics.checks)
+
+
+def test_bot_metrics_rejects_non_admins(world):
+    interaction = FakeInteraction(1)
+    interaction.user.guild_permissions = discord.Permissions(manage_messages=True)
+    assert not run_checks(interaction)
+    content, kwargs = interaction.response.messages[-1]
+    assert "Administrators only" in content and kwargs["ephemeral"]
+
+    # Direct messages have no guild permissions at all
+    assert not run_checks(FakeInteraction(1))
+
+
+def test_bot_metrics_allows_admins(world):
+    interaction = FakeInteraction(1)
+    interaction.user.guild_permissions = discord.Permissions(administrator=True)
+    assert run_checks(interaction)
+    asyncio.run(Discord.bot_metrics.callback(interaction))
+    assert interaction.response.messages[-1][1]["ephemeral"]
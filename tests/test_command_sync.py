@@ -0,0 +1,41 @@
+import asyncio
+
+import discord
+from discord import app_commands
+
+import Discord
+
+
+def fresh_tree() -> app_commands.CommandTree:
+    # A client that never connects is enough to build and serialize a tree
+    tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+
+    @tree.command(name="ping", description="Ping")
+    async def ping(interaction: discord.Interaction):
+        pass
+
+    return tree
+
+
+def test_fingerprint_tracks_the_uploaded_payload():
+    tree = fresh_tree()
+    before = Discord.command_tree_fingerprint(tree, None)
+    assert Discord.command_tree_fingerprint(fresh_tree(), None) == before
+
+    @tree.command(name="pong", description="Pong")
+    async def pong(interaction: discord.Interaction):
+        pass
+
+    assert Discord.command_tree_fingerprint(tree, None) != before
+
+
+def test_unchanged_tree_skips_the_sync(world, monkeypatch):
+    synced = []
+
+    async def sync(guild=None):
+        synced.append(guild)
+
+    monkeypatch.setattr(world.tree, "sync", sync)
+    assert asyncio.run(world.sync_commands()) is not None
+    assert asyncio.run(world.sync_commands()) is None
+    assert len(synced) == 1
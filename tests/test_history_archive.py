@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import pytest
+
+import Discord
+from conftest import found, reopen
+
+
+@pytest.fixture
+def journaled(monkeypatch, tmp_path):
+    monkeypatch.setattr(Discord, "JOURNAL_ENABLED", True)
+    monkeypatch.setattr(Discord, "HISTORY_LIMIT", 3)
+
+
+def test_history_trimmed_during_journal_replay_is_archived(journaled, world):
+    found(7, "Replayia")
+    for idx in range(10):
+        Discord.append_history("7", f"event {idx}")
+    expected = ["Nation created: Replayia"] + [f"event {idx}" for idx in range(10)]
+
+    # Nothing was snapshotted, so the whole history comes back through replay
+    bot = reopen(world)
+    bot.write_snapshot()
+    assert os.path.exists(Discord.history_segment_path(Discord.HISTORY_ARCHIVE_DIR, "7", 0))
+
+    # The journal holding the replayed entries is gone after compaction
+    bot = reopen(bot)
+    nation = bot.nations["7"]
+    assert nation["history_archived"] == len(expected) - Discord.HISTORY_LIMIT
+    assert asyncio.run(bot.read_history("7", 0, len(expected))) == expected
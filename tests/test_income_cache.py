@@ -0,0 +1,59 @@
+import asyncio
+
+import Discord
+from conftest import FakeInteraction, found
+
+
+def assert_fresh(bot, uid: str) -> None:
+    assert bot.get_income(uid) == bot.calculate_passive_income(bot.nations[uid])
+
+
+def test_construct_building_invalidates_income(world):
+    uid = found(1, "Buildia")
+    world.nations[uid]["resources"] = 1000
+    before = world.get_income(uid)
+
+    asyncio.run(Discord.construct_building.callback(FakeInteraction(1), building_type="Factory", quantity=2))
+
+    assert world.nations[uid]["buildings"]["Factory"] == 2
+    assert world.get_income(uid)["resources"] > before["resources"]
+    assert_fresh(world, uid)
+
+
+def test_research_invalidates_income(world):
+    uid = found(1, "Studia")
+    world.nations[uid]["research_points"] = 1000
+    world.nations[uid]["political_points"] = 1000
+    before = world.get_income(uid)
+
+    asyncio.run(Discord.research.callback(FakeInteraction(1), tech_name="Mass Conscription"))
+
+    assert "Mass Conscription" in world.nations[uid]["technologies"]
+    assert world.get_income(uid)["manpower"] > before["manpower"]
+    assert_fresh(world, uid)
+
+
+def test_transfer_region_invalidates_both_nations(world):
+    a, b = found(1, "Ayland"), found(2, "Beeland")
+    world.transfer_region("Central Oilfields", a)
+    before_a, before_b = world.get_income(a), world.get_income(b)
+
+    world.transfer_region("Central Oilfields", b)
+
+    assert world.get_income(a)["resources"] < before_a["resources"]
+    assert world.get_income(b)["resources"] > before_b["resources"]
+    assert_fresh(world, a)
+    assert_fresh(world, b)
+
+
+def test_debug_mode_replaces_stale_entries(world, monkeypatch, capsys):
+    uid = found(1, "Stalia")
+    cached = world.get_income(uid)
+    # A change that skips invalidate_income
+    world.nations[uid]["buildings"]["Factory"] = 5
+    assert world.get_income(uid) == cached
+
+    monkeypatch.setattr(Discord, "INCOME_CACHE_DEBUG", True)
+    assert_fresh(world, uid)
+    assert world.get_income(uid) != cached
+    assert f"Stale income cache for {uid}" in capsys.readouterr().out
@@ -0,0 +1,89 @@
+import pytest
+
+import Discord
+from conftest import found, reopen
+
+
+@pytest.fixture
+def indexed(monkeypatch):
+    monkeypatch.setattr(Discord, "SNAPSHOT_FORMAT", "indexed")
+    monkeypatch.setattr(Discord, "SNAPSHOT_FILE", Discord.INDEXED_DATA_FILE)
+    monkeypatch.setattr(Discord, "HYDRATION_CACHE_SIZE", 1)
+
+
+def saved_state() -> dict:
+    with open(Discord.INDEXED_DATA_FILE, "rb") as f:
+        return Discord.decode_indexed(f.read())
+
+
+def test_indexed_file_round_trip(tmp_path):
+    state = {
+        "nations": {
+            "1": {"name": "Hotia", "resources": 12.5, "territories": ["Alaska"], "history": ["a", "b"],
+                  "units": {"Infantry": 3}, "infrastructure": {"roads": 1}},
+            "2": {"name": "Barea", "resources": 0},
+        },
+        "alliances": {"Pact": {"members": ["1", "2"]}},
+        "wars": [],
+        "trade_offers": [],
+        "map_seed": 7,
+    }
+    path = str(tmp_path / "state.paxi")
+    documents_start, index = Discord.write_indexed_file(path, state)
+    with open(path, "rb") as f:
+        assert Discord.decode_indexed(f.read()) == state
+
+    store = Discord.NationColdStore(10)
+    header = store.load(path)
+    assert store.documents_start == documents_start and store.index == index
+    assert "history" not in header["nations"]["1"]
+    assert store.fetch("1") == {"history": ["a", "b"], "units": {"Infantry": 3}, "infrastructure": {"roads": 1}}
+    assert store.fetch("2") == {}
+    store.close()
+
+
+def test_save_keeps_mutated_and_untouched_nations(indexed, world):
+    for user_id in (1, 2, 3):
+        found(user_id, f"Coldia {user_id}")
+    world.write_snapshot()
+    bot = reopen(world)
+    assert bot.cold_store.cold == {"1", "2", "3"}
+
+    Discord.append_history("2", "Mutated while hot")
+    bot.write_snapshot()
+    nations = saved_state()["nations"]
+    assert nations["2"]["history"][-1] == "Mutated while hot"
+    # Never loaded, so copied over from the previous file
+    assert nations["1"]["history"] == ["Nation created: Coldia 1"]
+    assert nations["3"]["units"] == {}
+
+
+def test_untouched_nations_are_evicted_and_hydrate_again(indexed, world):
+    for user_id in (1, 2, 3):
+        found(user_id, f"Evictia {user_id}")
+    world.write_snapshot()
+    bot = reopen(world)
+    histories = {uid: list(bot.get_nation(uid)["history"]) for uid in ("1", "2", "3")}
+    assert not bot.cold_store.cold
+
+    bot.write_snapshot()
+    # Capacity 1: the two least recently used nations go back to disk
+    assert bot.cold_store.cold == {"1", "2"}
+    assert "history" not in bot.nations["1"]
+    assert {uid: bot.get_nation(uid)["history"] for uid in histories} == histories
+
+
+def test_journal_replays_into_cold_nations(indexed, world, monkeypatch):
+    monkeypatch.setattr(Discord, "JOURNAL_ENABLED", True)
+    bot = reopen(world)
+    found(1, "Replaya")
+    bot.write_snapshot()
+    bot.change_units("1", "Infantry", 4)
+    bot.record("train_units", "1", "units", "military_power")
+    Discord.append_history("1", "After the snapshot")
+
+    bot = reopen(bot)
+    nation = bot.get_nation("1")
+    assert nation["history"][-1] == "After the snapshot"
+    assert nation["units"]["Infantry"] == 4
+    assert bot.military["1"] == Discord.calculate_military_by_type(nation)
@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+import pytest
+
+import Discord
+from conftest import FakeInteraction, found, reopen
+
+
+@pytest.fixture
+def journaled(monkeypatch):
+    monkeypatch.setattr(Discord, "JOURNAL_ENABLED", True)
+
+
+def run(command, user_id: int, **kwargs) -> None:
+    asyncio.run(command.callback(FakeInteraction(user_id), **kwargs))
+
+
+def play(bot, offset: int, region: str) -> None:
+    # Commands from two nations interleaved with economy ticks, some after catch-up
+    a, b = str(offset + 1), str(offset + 2)
+    found(offset + 1, f"Ayland {offset}")
+    found(offset + 2, f"Beeland {offset}")
+    run(Discord.construct_building, offset + 1, building_type="Farm", quantity=1)
+    bot.advance_economy(1)
+    bot.advance_economy(1000)
+    run(Discord.research, offset + 1, tech_name="Advanced Farming")
+    run(Discord.train_units, offset + 2, unit_type="Infantry", quantity=20)
+    bot.advance_economy(1)
+    run(Discord.invade_region, offset + 2, region_name=region)
+    bot.advance_economy(3)
+    assert bot.nations[a]["technologies"] == ["Advanced Farming"]
+    assert bot.nations[b]["territories"]
+
+
+def assert_replays_to(bot, expected: dict) -> None:
+    reopen(bot)
+    assert bot.snapshot_state() == expected
+
+
+def test_replayed_journal_matches_memory(journaled, world):
+    play(world, 0, "Northern Highlands")
+    assert_replays_to(world, world.snapshot_state())
+
+
+def test_snapshot_plus_journal_tail_matches_memory(journaled, world):
+    play(world, 0, "Northern Highlands")
+    world.write_snapshot()
+    # Compaction leaves only the segment opened for entries after the snapshot
+    assert len(world.journal.segments()) == 1
+    assert os.path.getsize(world.journal.segments()[0]) == 0
+
+    play(world, 10, "Eastern Plains")
+    assert world.journal.size() > 0
+    assert_replays_to(world, world.snapshot_state())
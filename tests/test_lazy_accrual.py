@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+import Discord
+from conftest import found, reopen
+
+
+@pytest.fixture
+def lazy(world, monkeypatch):
+    # Worlds opened later (reopen) pick the engine up too
+    monkeypatch.setattr(Discord, "ECONOMY_ENGINE", "lazy")
+    monkeypatch.setattr(world, "lazy_accrual", True)
+    return world
+
+
+def later(monkeypatch, seconds: float) -> None:
+    monkeypatch.setattr(Discord.time, "time", lambda real=time.time: real() + seconds)
+
+
+def test_new_nations_accrue_from_creation(lazy, monkeypatch):
+    uid = found(1, "Stampia")
+    assert lazy.nations[uid]["last_accrued_at"] == pytest.approx(time.time(), abs=5)
+    start = lazy.nations[uid]["resources"]
+    income = lazy.get_income(uid)["resources"]
+
+    later(monkeypatch, 100)
+    assert lazy.get_nation(uid)["resources"] == pytest.approx(start + 100 * income, rel=1e-3)
+
+
+def test_nations_saved_without_stamps_accrue_from_the_load(lazy, monkeypatch):
+    uid = found(1, "Migratia")
+    # As saved by the dict engine
+    lazy.lazy_accrual = False
+    del lazy.nations[uid]["last_accrued_at"]
+    lazy.write_snapshot()
+    lazy.lazy_accrual = True
+    bot = reopen(lazy)
+    start = bot.nations[uid]["resources"]
+    income = bot.get_income(uid)["resources"]
+
+    later(monkeypatch, 100)
+    assert bot.get_nation(uid)["resources"] == pytest.approx(start + 100 * income, rel=1e-3)
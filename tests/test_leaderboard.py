@@ -0,0 +1,98 @@
+import asyncio
+import random
+
+import Discord
+from conftest import FakeInteraction
+
+
+def full_sort(nations: dict, sort_key: str) -> list:
+    index = Discord.LeaderboardIndex(sort_key)
+    return sorted(nations, key=lambda uid: (-index.value_of(nations[uid]), uid))
+
+
+def assert_matches_full_sort(index: Discord.LeaderboardIndex, nations: dict) -> None:
+    expected = full_sort(nations, index.sort_key)
+    assert [uid for uid, _ in index.top(len(nations))] == expected
+    for position, uid in enumerate(expected, 1):
+        assert index.rank(uid) == position
+
+
+def test_index_matches_full_sort_through_updates_and_removals():
+    rng = random.Random(7)
+    # Few distinct values, so most nations tie with several others
+    nations = {str(uid): {"military_power": rng.randrange(5)} for uid in range(200)}
+    index = Discord.LeaderboardIndex("military_power")
+    index.rebuild(nations)
+    assert_matches_full_sort(index, nations)
+
+    for step in range(300):
+        uid = str(rng.randrange(250))
+        if step % 5 == 0 and uid in nations:
+            del nations[uid]
+            index.update(uid, None)
+            assert index.rank(uid) is None
+        else:
+            nations[uid] = {"military_power": rng.randrange(5)}
+            index.update(uid, nations[uid])
+        assert_matches_full_sort(index, nations)
+
+
+def test_ties_rank_by_uid():
+    nations = {"30": {"population": 5}, "10": {"population": 5}, "20": {"population": 9}}
+    index = Discord.LeaderboardIndex("population")
+    index.rebuild(nations)
+    assert index.top(3) == [("20", 9), ("10", 5), ("30", 5)]
+    assert [index.rank(uid) for uid in ("20", "10", "30")] == [1, 2, 3]
+
+
+def test_territories_rank_by_count():
+    nations = {"1": {"territories": ["a"]}, "2": {"territories": ["a", "b"]}, "3": {}}
+    index = Discord.LeaderboardIndex("territories")
+    index.rebuild(nations)
+    assert index.top(3) == [("2", 2), ("1", 1), ("3", 0)]
+
+
+def add_nations(bot, count: int) -> None:
+    for uid in range(1, count + 1):
+        bot.nations[str(uid)] = {"name": f"Nation {uid}", "military_power": uid % 10, "population": 1000,
+                                 "resources": 100, "territories": []}
+    bot.rebuild_leaderboards()
+
+
+def test_refresh_keeps_ranks_exact(world):
+    add_nations(world, 100)
+
+    # Under LEADERBOARD_REBUILD_FRACTION of the nations: updated in place
+    world.nations["5"]["military_power"] = 50
+    world.nations["42"]["military_power"] = 0
+    world.leaderboard_dirty.update({"5", "42"})
+    world.refresh_leaderboards()
+    assert_matches_full_sort(world.leaderboards["power"], world.nations)
+
+    # Over it: rebuilt
+    for uid in list(world.nations)[:20]:
+        world.nations[uid]["military_power"] = 7
+        world.leaderboard_dirty.add(uid)
+    world.refresh_leaderboards()
+    assert_matches_full_sort(world.leaderboards["power"], world.nations)
+
+    del world.nations["5"]
+    world.leaderboard_dirty.add("5")
+    world.refresh_leaderboards()
+    for index in world.leaderboards.values():
+        assert index.rank("5") is None
+        assert_matches_full_sort(index, world.nations)
+
+
+def test_my_rank_reports_position_among_all_nations(world):
+    add_nations(world, 100)
+    world.nations["37"]["military_power"] = 9
+    world.leaderboard_dirty.add("37")
+
+    interaction = FakeInteraction(37)
+    asyncio.run(Discord.my_rank.callback(interaction, category="power"))
+
+    expected = full_sort(world.nations, "military_power").index("37") + 1
+    fields = interaction.response.messages[0][1]["embed"].fields
+    assert fields[0].value == f"#{expected:,} of 100"
+    assert fields[2].value == "9"
@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from Discord import LOG_HIGH, LOG_LOW, LogDispatcher
+
+
+class FlakyChannel:
+    def __init__(self, fail_on: int):
+        self.fail_on = fail_on
+        self.calls = 0
+        self.sent = []
+
+    async def send(self, message):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise discord.HTTPException(SimpleNamespace(status=500, reason="boom"), "boom")
+        self.sent.append(message)
+
+
+def test_zero_limit_drops_instead_of_raising():
+    dispatcher = LogDispatcher(0, 3)
+    dispatcher.post("lost", LOG_HIGH)
+    assert dispatcher.depth == 0
+    assert dispatcher.dropped[LOG_HIGH] == 1
+
+
+def test_failed_send_requeues_unsent_messages():
+    dispatcher = LogDispatcher(100, 3)
+    lines = [f"{idx:04d} " + "x" * 900 for idx in range(6)]
+    for line in lines:
+        dispatcher.post(line, LOG_LOW)
+    channel = FlakyChannel(fail_on=2)
+    asyncio.run(dispatcher.flush(channel))
+    assert len(channel.sent) == 1
+
+    dispatcher.backoff_until = 0.0
+    while dispatcher.depth:
+        asyncio.run(dispatcher.flush(channel))
+    delivered = "\n".join(channel.sent).split("\n")
+    assert delivered == lines
+    assert dispatcher.sent_lines == len(lines)
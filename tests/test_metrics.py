@@ -0,0 +1,59 @@
+import asyncio
+
+import metrics
+
+
+def registry() -> metrics.MetricsRegistry:
+    reg = metrics.MetricsRegistry()
+    reg.counter("pax_saves_total", "Saves written").inc(2, {"guild": '1"2\\3\n'})
+    reg.gauge("pax_nations", "Nations in memory", lambda: 7)
+    latency = reg.histogram("pax_tick_seconds", "Tick duration", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, {"loop": "tick"})
+    return reg
+
+
+def test_render_uses_the_text_exposition_format():
+    assert registry().render().splitlines() == [
+        "# HELP pax_saves_total Saves written",
+        "# TYPE pax_saves_total counter",
+        'pax_saves_total{guild="1\\"2\\\\3\\n"} 2',
+        "# HELP pax_nations Nations in memory",
+        "# TYPE pax_nations gauge",
+        "pax_nations 7",
+        "# HELP pax_tick_seconds Tick duration",
+        "# TYPE pax_tick_seconds histogram",
+        'pax_tick_seconds_bucket{loop="tick",le="0.1"} 1',
+        'pax_tick_seconds_bucket{loop="tick",le="1"} 3',
+        'pax_tick_seconds_bucket{loop="tick",le="+Inf"} 4',
+        'pax_tick_seconds_sum{loop="tick"} 4.05',
+        'pax_tick_seconds_count{loop="tick"} 4',
+    ]
+
+
+def test_exporter_serves_metrics_on_an_ephemeral_port():
+    reg = registry()
+
+    async def get(port: int, path: str) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    async def scrape():
+        server = await metrics.start_exporter(reg, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await get(port, "/metrics?x=1"), await get(port, "/other")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    served, missing = asyncio.run(scrape())
+    head, body = served.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.0 200 OK")
+    assert b"Content-Type: text/plain; version=0.0.4" in head
+    assert body.decode() == reg.render()
+    assert missing.startswith(b"HTTP/1.0 404 Not Found")
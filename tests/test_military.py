@@ -0,0 +1,102 @@
+import asyncio
+import random
+
+import pytest
+
+import Discord
+from Discord import BASE_MILITARY_POWER
+from conftest import FakeInteraction, found, reopen
+
+
+def test_new_nation_power_survives_reload(world):
+    uid = found(1, "Basia")
+    assert world.nations[uid]["military_power"] == BASE_MILITARY_POWER
+    world.write_snapshot()
+    bot = reopen(world)
+    assert bot.nations[uid]["military_power"] == BASE_MILITARY_POWER
+
+
+@pytest.mark.parametrize("tactics", [False, True])
+def test_train_units_reports_ledger_gain(world, tactics):
+    uid = found(2, "Trainia")
+    if tactics:
+        world.nations[uid]["technologies"].append("Military Tactics")
+    interaction = FakeInteraction(2)
+    asyncio.run(Discord.train_units.callback(interaction, unit_type="Infantry", quantity=10))
+    content, _ = interaction.response.messages[-1]
+    gain = 10 * Discord.GROUND_UNITS["Infantry"]["power"]
+    if tactics:
+        gain = int(gain * Discord.MILITARY_TACTICS_BONUS)
+    assert f"(+{gain:,} power)" in content
+    assert world.nations[uid]["military_power"] == BASE_MILITARY_POWER + gain
+
+
+def test_change_units_without_ledger_entry_counts_delta_once(world):
+    uid = found(3, "Ledgeria")
+    del world.military[uid]
+    world.change_units(uid, "Infantry", 4)
+    assert world.military[uid] == Discord.calculate_military_by_type(world.nations[uid])
+
+
+def test_single_units_are_lost_at_the_battle_rate():
+    rng = random.Random(4)
+    trials = 20000
+    lost = sum(
+        Discord.unit_losses({"Nuclear Missile": 1}, 0.4, Discord.BATTLE_GROUND_DOMAINS, rng.random)["Nuclear Missile"]
+        for _ in range(trials)
+    )
+    assert abs(lost / trials - 0.4) < 0.02
+
+
+def test_inflict_losses_never_exceeds_roster(world):
+    uid = found(5, "Attritia")
+    world.change_units(uid, "MBT", 7)
+    for _ in range(20):
+        world.inflict_losses(uid, 0.45)
+    assert world.nations[uid]["units"]["MBT"] >= 0
+    assert world.military[uid] == Discord.calculate_military_by_type(world.nations[uid])
+
+
+def test_ledger_matches_recount_after_training_losses_and_upkeep(world, monkeypatch):
+    monkeypatch.setattr(world, "save_data", lambda: None)
+    uids = [found(user_id, f"Churnia {user_id}") for user_id in range(1, 6)]
+    rng = random.Random(16)
+    for round_idx in range(2000):
+        uid = rng.choice(uids)
+        if rng.random() < 0.6:
+            world.change_units(uid, rng.choice(list(Discord.ALL_UNITS)), rng.randint(1, 30))
+        else:
+            world.inflict_losses(uid, rng.random() * 0.5)
+        if round_idx % 400 == 0:
+            # Too poor to pay everything, so desertion runs too
+            world.nations[uid]["resources"] = 0
+            asyncio.run(Discord.PaxHistoriaBot.passive_growth_loop.coro(world))
+    for uid in uids:
+        assert world.military[uid] == Discord.calculate_military_by_type(world.nations[uid])
+
+
+def test_numpy_upkeep_matches_dict_upkeep(world, monkeypatch):
+    monkeypatch.setattr(world, "save_data", lambda: None)
+    uids = [found(user_id, f"Payia {user_id}") for user_id in range(1, 6)]
+    rng = random.Random(17)
+    for uid in uids:
+        world.change_units(uid, "Infantry", rng.randint(50, 400))
+        world.change_units(uid, "MBT", rng.randint(0, 20))
+        world.nations[uid]["resources"] = rng.randint(0, 600)
+    start = {uid: (world.nations[uid]["resources"], dict(world.nations[uid]["units"])) for uid in uids}
+    # Some nations pay in full and some lose units
+    assert {world.nations[uid]["resources"] >= world.upkeep_due(uid) for uid in uids} == {True, False}
+
+    def upkeep_results():
+        asyncio.run(Discord.PaxHistoriaBot.passive_growth_loop.coro(world))
+        world.settle_economy()
+        return {uid: (world.nations[uid]["resources"], dict(world.nations[uid]["units"])) for uid in uids}
+
+    by_dict = upkeep_results()
+    for uid, (resources, units) in start.items():
+        world.nations[uid]["resources"] = resources
+        for unit_name, qty in units.items():
+            world.change_units(uid, unit_name, qty - world.nations[uid]["units"].get(unit_name, 0))
+    world.economy = Discord.EconomyEngine(world)
+    world.economy.rebuild()
+    assert upkeep_results() == by_dict
@@ -0,0 +1,156 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import Discord
+from conftest import FakeInteraction, found
+
+NATIONS = 8
+TRAINS_PER_NATION = 40
+BUILDS_PER_NATION = 20
+WARS = 60
+
+
+def test_concurrent_train_build_and_war_lose_no_updates(world):
+    async def scenario():
+        for user_id in range(1, NATIONS + 1):
+            await Discord.create_nation.callback(FakeInteraction(user_id), nation_name=f"Stress {user_id}")
+            nation = world.nations[str(user_id)]
+            nation["resources"] = 400000
+            nation["manpower"] = 400000
+        start_resources = sum(nation["resources"] for nation in world.nations.values())
+
+        rng = random.Random(21)
+        trains = []
+        builds = []
+        calls = []
+        for user_id in range(1, NATIONS + 1):
+            for _ in range(TRAINS_PER_NATION):
+                interaction = FakeInteraction(user_id)
+                unit = rng.choice(list(Discord.GROUND_UNITS))
+                quantity = rng.randint(1, 20)
+                trains.append((interaction, unit, quantity))
+                calls.append(Discord.train_units.callback(interaction, unit_type=unit, quantity=quantity))
+            for _ in range(BUILDS_PER_NATION):
+                interaction = FakeInteraction(user_id)
+                building = rng.choice(list(Discord.BUILDINGS))
+                quantity = rng.randint(1, 20)
+                builds.append((interaction, building, quantity))
+                calls.append(Discord.construct_building.callback(interaction, building_type=building, quantity=quantity))
+        for _ in range(WARS):
+            attacker, defender = rng.sample(range(1, NATIONS + 1), 2)
+            calls.append(Discord.full_scale_war.callback(FakeInteraction(attacker), target_user=SimpleNamespace(id=defender)))
+        rng.shuffle(calls)
+        await asyncio.gather(*calls)
+        if world._save_task is not None:
+            await world._save_task
+
+        spent = sum(
+            Discord.GROUND_UNITS[unit]["cost"] * quantity
+            for interaction, unit, quantity in trains
+            if interaction.response.messages[-1][0].startswith("✅")
+        )
+        built = [
+            (str(interaction.user.id), building, quantity)
+            for interaction, building, quantity in builds
+            if interaction.response.messages[-1][0].startswith("✅")
+        ]
+        spent += sum(Discord.BUILDINGS[building]["cost"] * quantity for _, building, quantity in built)
+        return start_resources, spent, built
+
+    start_resources, spent, built = asyncio.run(scenario())
+
+    # Plunder only moves resources between nations, so every training payment must show up
+    assert sum(nation["resources"] for nation in world.nations.values()) == start_resources - spent
+    for uid, nation in world.nations.items():
+        assert world.military[uid] == Discord.calculate_military_by_type(nation)
+        assert all(qty >= 0 for qty in nation["units"].values())
+        for building in Discord.BUILDINGS:
+            expected = sum(quantity for owner, name, quantity in built if owner == uid and name == building)
+            assert nation["buildings"].get(building, 0) == expected
+    assert world.nation_locks.locks == {}
+
+
+def test_transactions_serialize_read_await_write(world):
+    # The command handlers above never await mid-update today; this one does, so it
+    # only stays correct if nation_transaction isolates the nations involved
+    @Discord.nation_transaction(Discord.target_nation)
+    async def pay(interaction, target_user, amount: int):
+        payer = world.get_nation(str(interaction.user.id))
+        payee = world.get_nation(str(target_user.id))
+        payer_balance, payee_balance = payer["resources"], payee["resources"]
+        await asyncio.sleep(0)
+        payer["resources"] = payer_balance - amount
+        payee["resources"] = payee_balance + amount
+
+    async def scenario():
+        for user_id in range(1, NATIONS + 1):
+            await Discord.create_nation.callback(FakeInteraction(user_id), nation_name=f"Payer {user_id}")
+            world.nations[str(user_id)]["resources"] = 10000
+        rng = random.Random(3)
+        payments = [rng.sample(range(1, NATIONS + 1), 2) for _ in range(500)]
+        await asyncio.gather(*(
+            pay(FakeInteraction(payer), target_user=SimpleNamespace(id=payee), amount=1) for payer, payee in payments
+        ))
+        return payments
+
+    payments = asyncio.run(scenario())
+    for user_id in range(1, NATIONS + 1):
+        sent = sum(payer == user_id for payer, _ in payments)
+        received = sum(payee == user_id for _, payee in payments)
+        assert world.nations[str(user_id)]["resources"] == 10000 - sent + received
+    assert world.nation_locks.locks == {}
+
+
+@pytest.mark.parametrize("engine", ["dict", "numpy"])
+def test_ticks_during_a_transaction_are_not_overwritten(world, monkeypatch, engine):
+    monkeypatch.setattr(world, "save_data", lambda: None)
+    uid = found(1, "Waitia")
+    world.change_units(uid, "Infantry", 40)
+    world.nations[uid]["resources"] = 10000
+    if engine == "numpy":
+        world.economy = Discord.EconomyEngine(world)
+        world.economy.rebuild()
+    income = world.get_income(uid)["resources"]
+    upkeep = world.upkeep_due(uid)
+
+    @Discord.nation_transaction()
+    async def grant(interaction, gate):
+        nation = world.get_nation(str(interaction.user.id))
+        balance = nation["resources"]
+        await gate.wait()
+        nation["resources"] = balance + 500
+
+    async def scenario():
+        gate = asyncio.Event()
+        task = asyncio.create_task(grant(FakeInteraction(1), gate))
+        await asyncio.sleep(0)
+        world.advance_economy(5)
+        await Discord.PaxHistoriaBot.passive_growth_loop.coro(world)
+        gate.set()
+        await task
+
+    asyncio.run(scenario())
+    world.settle_economy()
+    assert world.nations[uid]["resources"] == pytest.approx(10000 + 500 + 5 * income - upkeep)
+    assert world.owed_ticks == {} and world.owed_upkeep == {}
+
+
+def test_queued_transactions_count_as_contended(world):
+    found(1, "Queuia")
+    labels = world.world_labels()
+    before = world.lock_contended.get(labels)
+
+    @Discord.nation_transaction()
+    async def hold(interaction):
+        await asyncio.sleep(0)
+
+    async def scenario():
+        await asyncio.gather(*(hold(FakeInteraction(1)) for _ in range(3)))
+
+    asyncio.run(scenario())
+    # The first one runs straight away, the other two queue
+    assert world.lock_contended.get(labels) - before == 2
+    assert "# TYPE pax_nation_lock_contended_total counter" in world.metrics.render()
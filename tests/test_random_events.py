@@ -0,0 +1,53 @@
+import random
+
+import Discord
+from Discord import RANDOM_EVENTS
+
+NATIONS = 2000
+WINDOWS = 100
+# 5% critical value of chi-square with 6 degrees of freedom (6 events + "no event" - 1)
+CHI_SQUARE_CRITICAL = 12.59
+
+
+def baseline_counts(rng: random.Random) -> list:
+    # The original loop: every nation rolls the events in order each window,
+    # first hit wins
+    counts = [0] * (len(RANDOM_EVENTS) + 1)
+    for _ in range(NATIONS * WINDOWS):
+        for idx, event in enumerate(RANDOM_EVENTS):
+            if rng.random() < event["chance"]:
+                counts[idx] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+def scheduled_counts(bot) -> list:
+    bot.nations.update({str(uid): {} for uid in range(NATIONS)})
+    bot.event_window = 0
+    bot.rebuild_event_schedule()
+    counts = [0] * (len(RANDOM_EVENTS) + 1)
+    for _ in range(WINDOWS):
+        bot.event_window += 1
+        for _ in bot.pop_due_events():
+            counts[RANDOM_EVENTS.index(Discord.sample_event())] += 1
+    counts[-1] = NATIONS * WINDOWS - sum(counts)
+    return counts
+
+
+def two_sample_chi_square(first: list, second: list) -> float:
+    total_first, total_second = sum(first), sum(second)
+    statistic = 0.0
+    for a, b in zip(first, second):
+        if a + b:
+            statistic += (a * (total_second / total_first) ** 0.5 - b * (total_first / total_second) ** 0.5) ** 2 / (a + b)
+    return statistic
+
+
+def test_scheduled_events_match_per_window_rolls(world):
+    for seed in (1, 2, 3):
+        random.seed(seed)
+        scheduled = scheduled_counts(world)
+        baseline = baseline_counts(random.Random(seed + 100))
+        assert two_sample_chi_square(baseline, scheduled) < CHI_SQUARE_CRITICAL, (seed, baseline, scheduled)
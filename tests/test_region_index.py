@@ -0,0 +1,71 @@
+import asyncio
+
+import Discord
+from conftest import FakeInteraction, found, reopen
+
+NORTH = "Northern Highlands"
+EAST = "Eastern Plains"
+
+
+def test_claiming_an_unowned_region_indexes_it(world):
+    uid = found(1, "Claimia")
+    nation = world.nations[uid]
+    nation["military_power"] = 150
+    nation["resources"] = 1000
+    assert world.region_owners.get(NORTH) is None
+
+    asyncio.run(Discord.invade_region.callback(FakeInteraction(1), region_name=NORTH))
+
+    assert world.region_owners[NORTH] == uid
+    assert NORTH in nation["territories"]
+    assert world.check_region_index() == []
+
+
+def test_transfers_between_nations_move_the_region(world):
+    a, b = found(1, "Ayland"), found(2, "Beeland")
+    world.transfer_region(NORTH, a)
+    world.transfer_region(EAST, a)
+    world.transfer_region(NORTH, b)
+
+    assert world.region_owners[NORTH] == b
+    assert world.nations[a]["territories"] == [EAST]
+    assert world.nations[b]["territories"] == [NORTH]
+    assert world.check_region_index() == []
+
+    # Transferring to the current owner changes nothing
+    world.transfer_region(NORTH, b)
+    assert world.nations[b]["territories"] == [NORTH]
+
+    # The index is rebuilt from the territories lists at load
+    world.write_snapshot()
+    reopen(world)
+    assert world.region_owners == {NORTH: b, EAST: a}
+    assert world.check_region_index() == []
+
+
+def test_check_region_index_reports_drift(world):
+    a, b = found(1, "Ayland"), found(2, "Beeland")
+    world.transfer_region(NORTH, a)
+    world.transfer_region(EAST, b)
+
+    world.region_owners[NORTH] = b
+    assert world.check_region_index() == [f"{NORTH} is held by {a} but indexed to {b}"]
+
+    del world.region_owners[NORTH]
+    assert world.check_region_index() == [f"{NORTH} is held by {a} but indexed to None"]
+    world.region_owners[NORTH] = a
+
+    # A region dropped from its holder's list without going through the index
+    world.nations[b]["territories"].remove(EAST)
+    assert world.check_region_index() == [f"{EAST} is indexed to {b} but held by nobody"]
+    world.nations[b]["territories"].append(EAST)
+
+    world.nations[b]["territories"].append(NORTH)
+    assert world.check_region_index() == [f"{NORTH} is held by both {a} and {b}"]
+    world.nations[b]["territories"].remove(NORTH)
+
+    world.nations[a]["territories"].append("Atlantis")
+    assert world.check_region_index() == [
+        f"{a} holds unknown region Atlantis",
+        f"Atlantis is held by {a} but indexed to None",
+    ]
@@ -0,0 +1,38 @@
+
+import pytest
+
+import Discord
+from conftest import found, reopen
+
+
+@pytest.fixture
+def sqlite_backend(monkeypatch):
+    monkeypatch.setattr(Discord, "STORAGE_BACKEND", "sqlite")
+
+
+def test_save_upserts_only_dirty_nations(sqlite_backend, world, monkeypatch):
+    for user_id, name in ((1, "Rowia"), (2, "Tablia")):
+        found(user_id, name)
+    world.write_snapshot()
+
+    written = []
+    write = Discord.write_sqlite_changes
+
+    def recording_write(path, changes):
+        written.append(changes)
+        write(path, changes)
+
+    monkeypatch.setattr(Discord, "write_sqlite_changes", recording_write)
+    world.get_nation("2")["resources"] = 4321
+    world.write_snapshot()
+
+    assert [uid for uid, _ in written[0]["nations"]] == ["2"]
+    assert all(written[0][table] is None for table in ("alliances", "wars", "trade_offers", "meta"))
+    assert reopen(world).nations["2"]["resources"] == 4321
+
+
+def test_interrupted_save_is_written_by_the_next_one(sqlite_backend, world):
+    # found() runs create_nation under asyncio.run, which cancels the save worker it started
+    found(1, "Haltia")
+    world.write_snapshot()
+    assert "1" in reopen(world).nations
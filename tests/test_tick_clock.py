@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+import Discord
+from conftest import found
+
+
+def resources(bot) -> dict:
+    bot.settle_economy()
+    return {(uid, key): nation[key] for uid, nation in bot.nations.items() for key in Discord.RESOURCE_KEYS}
+
+
+def test_clock_accounts_for_every_second():
+    clock = Discord.FixedStepClock(1.0, 10)
+    now = 100.0
+    clock.advance(now)
+    applied = 0
+    # On time, late, early, early, then a stall past the catch-up limit
+    for elapsed in (1.0, 2.7, 0.2, 0.4, 25.3, 1.0):
+        now += elapsed
+        applied += clock.advance(now)
+    assert applied + clock.carry + clock.dropped == pytest.approx(now - 100.0)
+    assert clock.dropped == pytest.approx(25.0 - 10)
+
+
+@pytest.mark.parametrize("engine", ["dict", "numpy"])
+def test_batched_steps_match_single_ticks(world, engine):
+    for user_id in (1, 2):
+        found(user_id, f"N{user_id}")
+    # Close enough to the cap that it is reached partway through
+    world.nations["2"]["resources"] = Discord.RESOURCE_CAPS["resources"] - 3
+    if engine == "numpy":
+        world.economy = Discord.EconomyEngine(world)
+        world.economy.rebuild()
+    start = resources(world)
+
+    for _ in range(7):
+        world.advance_economy(1)
+    single = resources(world)
+
+    for (uid, key), value in start.items():
+        world.nations[uid][key] = value
+    if world.economy is not None:
+        world.economy.rebuild()
+    world.advance_economy(7)
+    assert resources(world) == pytest.approx(single)
+
+
+def test_late_loop_pays_for_measured_time(world, monkeypatch):
+    found(1, "Latia")
+    monkeypatch.setattr(world, "save_data", lambda: None)
+    income = world.get_income("1")["resources"]
+    start = world.nations["1"]["resources"]
+    # The previous iteration ran 3.5 seconds ago
+    world.economy_clock.last = time.monotonic() - 3.5
+    asyncio.run(Discord.PaxHistoriaBot.real_time_growth_loop.coro(world))
+    assert world.nations["1"]["resources"] == pytest.approx(start + 3 * income)
+    assert world.economy_clock.carry == pytest.approx(0.5, abs=0.05)
@@ -0,0 +1,42 @@
+import Discord
+from conftest import found, reopen
+
+
+def test_same_seed_generates_the_same_map():
+    assert Discord.generate_world_map(1234) == Discord.generate_world_map(1234)
+    assert Discord.generate_world_map(1234) != Discord.generate_world_map(4321)
+
+
+def test_map_survives_a_reload(world):
+    assert world.map_seed is not None
+    seed, rendered = world.map_seed, world.rendered_map()[0]
+
+    world.write_snapshot()
+    reopen(world)
+
+    assert world.map_seed == seed
+    assert world.rendered_map()[0] == rendered
+
+
+def test_rendered_map_is_cached_until_a_region_changes(world):
+    uid = found(1, "Cartia")
+    first = world.rendered_map()
+    assert world.rendered_map() is first
+
+    world.transfer_region("Northern Highlands", uid)
+    second = world.rendered_map()
+    assert second is not first
+    assert second[1] == {uid: Discord.NATION_SYMBOLS[0]}
+
+
+def test_repainting_regions_matches_a_full_render(world):
+    a, b, c = found(1, "Ayland"), found(2, "Beeland"), found(3, "Ceeland")
+    regions = list(Discord.WORLD_REGIONS)
+    # Claimed in founding order so symbols match the full renderer's
+    world.transfer_region(regions[0], a)
+    world.transfer_region(regions[1], b)
+    world.transfer_region(regions[2], c)
+    for region, uid in [(regions[3], a), (regions[4], b), (regions[1], c), (regions[3], b), (regions[5], a)]:
+        world.transfer_region(region, uid)
+        expected, symbols = Discord.render_map_with_nations(world.base_map, world.nations)
+        assert world.rendered_map() == (expected, symbols)
@@ -0,0 +1,125 @@
+import asyncio
+import random
+import time
+
+import discord
+import pytest
+
+import Discord
+from conftest import FakeInteraction, found
+
+PERIOD_TICKS = int(Discord.UPKEEP_SECONDS / Discord.TICK_SECONDS)
+
+
+def reload_after(bot, seconds: float) -> None:
+    assert asyncio.run(bot.evict_world(bot.world))
+    bot.evicted_at[Discord.GUILD_ID] -= seconds
+    Discord.current_world.set(bot.open_world(Discord.GUILD_ID))
+
+
+def test_upkeep_periods_matches_charging_round_by_round():
+    rng = random.Random(22)
+    for _ in range(2000):
+        cap = rng.choice([1000, 999999])
+        value, gain, upkeep = rng.uniform(0, cap), rng.uniform(0, 600), rng.uniform(0, 600)
+        periods = rng.randint(1, 50)
+        expected = value
+        for _ in range(periods):
+            expected = min(expected + gain, cap) - upkeep
+            if expected < 0:
+                break
+        else:
+            assert Discord.upkeep_periods(value, gain, upkeep, periods, cap) == pytest.approx(expected)
+            continue
+        assert Discord.upkeep_periods(value, gain, upkeep, periods, cap) < 0
+
+
+def test_reloaded_world_settles_like_a_loaded_one(world, monkeypatch):
+    surplus, deficit = found(1, "Surplia"), found(2, "Deficia")
+    # More upkeep than income, with savings to cover the three periods
+    world.change_units(deficit, "Infantry", 400)
+    world.nations[deficit]["resources"] = 5000
+    start = {uid: {key: world.nations[uid][key] for key in Discord.RESOURCE_KEYS} for uid in (surplus, deficit)}
+
+    monkeypatch.setattr(world, "save_data", lambda: None)
+    for _ in range(3):
+        world.advance_economy(PERIOD_TICKS)
+        asyncio.run(Discord.PaxHistoriaBot.passive_growth_loop.coro(world))
+    loaded = {uid: {key: world.nations[uid][key] for key in Discord.RESOURCE_KEYS} for uid in start}
+    assert loaded[deficit]["resources"] < start[deficit]["resources"]
+
+    for uid, values in start.items():
+        world.nations[uid].update(values)
+    reload_after(world, 3 * Discord.UPKEEP_SECONDS)
+    for uid, values in loaded.items():
+        for key, value in values.items():
+            assert world.nations[uid][key] == pytest.approx(value)
+    assert world.nations[deficit]["units"]["Infantry"] == 400
+
+
+def test_lazy_reload_pays_the_unloaded_time_once(world, monkeypatch):
+    monkeypatch.setattr(world, "lazy_accrual", True)
+    surplus, deficit = found(1, "Surplia"), found(2, "Deficia")
+    world.change_units(deficit, "Infantry", 400)
+    world.nations[deficit]["resources"] = 5000
+    start = {uid: world.peek_resource(uid, "resources") for uid in (surplus, deficit)}
+    income = {uid: world.get_income(uid)["resources"] for uid in start}
+    upkeep = world.upkeep_due(deficit)
+    unloaded = 3 * Discord.UPKEEP_SECONDS + 100
+
+    assert asyncio.run(world.evict_world(world.world))
+    monkeypatch.setattr(Discord.time, "time", lambda real=time.time: real() + unloaded)
+    world.evicted_at[Discord.GUILD_ID] -= unloaded
+    Discord.current_world.set(world.open_world(Discord.GUILD_ID))
+
+    cap = Discord.RESOURCE_CAPS["resources"]
+    assert world.peek_resource(surplus, "resources") == pytest.approx(start[surplus] + income[surplus] * unloaded, rel=1e-3)
+    expected = Discord.upkeep_periods(start[deficit], income[deficit] * PERIOD_TICKS, upkeep, 3, cap)
+    assert world.peek_resource(deficit, "resources") == pytest.approx(expected + income[deficit] * 100, rel=1e-3)
+
+
+def test_units_leave_when_a_reloaded_world_could_not_pay_upkeep(world):
+    uid = found(1, "Bankruptia")
+    world.change_units(uid, "Infantry", 400)
+    reload_after(world, 24 * 3600)
+    assert world.nations[uid]["resources"] == pytest.approx(0, abs=5)
+    assert world.nations[uid]["units"]["Infantry"] < 400
+    assert world.military[uid]["upkeep"] == world.nations[uid]["units"]["Infantry"]
+
+
+def test_bot_metrics_only_shows_the_callers_guild(world, monkeypatch):
+    monkeypatch.setattr(Discord, "MULTI_GUILD", True)
+    for guild_id, users in ((111, (1, 2)), (222, (3,))):
+        with world.use_world(world.open_world(guild_id)):
+            for user_id in users:
+                interaction = FakeInteraction(user_id, guild_id=guild_id)
+                asyncio.run(Discord.create_nation.callback(interaction, nation_name=f"Nation{user_id}"))
+            world.write_snapshot()
+    asyncio.run(Discord.PaxHistoriaBot.world_maintenance_loop.coro(world))
+
+    interaction = FakeInteraction(3, guild_id=222)
+    interaction.user.guild_permissions = discord.Permissions(administrator=True)
+    asyncio.run(Discord.bot_metrics.callback(interaction))
+    lines = interaction.response.messages[-1][1]["embed"].description.strip("`\n").splitlines()
+    assert 'pax_nations{guild="222"} 1' in lines
+    assert 'pax_world_nations{guild="222"} 1' in lines
+    # Nothing from guild 111 and nothing summed over every loaded world
+    assert all('guild="222"' in line for line in lines)
+
+
+def test_world_stays_loaded_when_its_final_save_fails(world, monkeypatch):
+    found(1, "Unsavia")
+
+    def disk_full(*args):
+        raise OSError("disk full")
+
+    failed = world.world_labels(result="failed")
+    failures = world.saves.get(failed)
+    with monkeypatch.context() as patch:
+        patch.setattr(Discord, "write_history_archive", disk_full)
+        assert not asyncio.run(world.evict_world(world.world))
+    assert world.worlds[Discord.GUILD_ID] is world.world
+    assert world.saves.get(failed) == failures + 1
+
+    assert asyncio.run(world.evict_world(world.world))
+    assert Discord.GUILD_ID not in world.worlds